@@ -0,0 +1,81 @@
+"""full-text and trigram search indexes
+
+Revision ID: 5d1f0c7b2e94
+Revises: a98c337cafa5
+Create Date: 2026-10-18 09:12:40.512913
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '5d1f0c7b2e94'
+down_revision = 'a98c337cafa5'
+branch_labels = None
+depends_on = None
+
+# The searchable columns at this revision, by table
+SEARCH_FIELDS = {
+    'tours': ('title', 'overview'),
+    'destinations': ('name', 'description'),
+    'hotels': ('name', 'description'),
+    'cities': ('name',),
+}
+
+# Postgres: the expressions must stay exactly those the search backend
+# queries with (app.models.search.search_document) for the planner to use
+# the tsvector indexes
+POSTGRES_INDEXES = {
+    'ix_tours_search': "CREATE INDEX ix_tours_search ON tours USING gin (to_tsvector('simple'::regconfig, (coalesce(title, '') || ' ') || coalesce(overview, '')))",
+    'ix_tours_title_trgm': 'CREATE INDEX ix_tours_title_trgm ON tours USING gin (title gin_trgm_ops)',
+    'ix_tours_overview_trgm': 'CREATE INDEX ix_tours_overview_trgm ON tours USING gin (overview gin_trgm_ops)',
+    'ix_destinations_search': "CREATE INDEX ix_destinations_search ON destinations USING gin (to_tsvector('simple'::regconfig, (coalesce(name, '') || ' ') || coalesce(description, '')))",
+    'ix_destinations_name_trgm': 'CREATE INDEX ix_destinations_name_trgm ON destinations USING gin (name gin_trgm_ops)',
+    'ix_destinations_description_trgm': 'CREATE INDEX ix_destinations_description_trgm ON destinations USING gin (description gin_trgm_ops)',
+    'ix_hotels_search': "CREATE INDEX ix_hotels_search ON hotels USING gin (to_tsvector('simple'::regconfig, (coalesce(name, '') || ' ') || coalesce(description, '')))",
+    'ix_hotels_name_trgm': 'CREATE INDEX ix_hotels_name_trgm ON hotels USING gin (name gin_trgm_ops)',
+    'ix_hotels_description_trgm': 'CREATE INDEX ix_hotels_description_trgm ON hotels USING gin (description gin_trgm_ops)',
+    'ix_cities_search': "CREATE INDEX ix_cities_search ON cities USING gin (to_tsvector('simple'::regconfig, coalesce(name, '')))",
+    'ix_cities_name_trgm': 'CREATE INDEX ix_cities_name_trgm ON cities USING gin (name gin_trgm_ops)',
+}
+
+
+def sqlite_fts(table: str, fields) -> list:
+    """The external content FTS5 table of ``table`` and its sync triggers"""
+    fts = f'{table}_fts'
+    columns = ', '.join(fields)
+    new = ', '.join(f'new.{f}' for f in fields)
+    old = ', '.join(f'old.{f}' for f in fields)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({columns}, content='{table}', content_rowid='id')",
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new}); END',
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {table} BEGIN INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old}); INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new}); END",
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def dialect() -> str:
+    return op.get_bind().dialect.name
+
+
+def upgrade() -> None:
+    if dialect() == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for statement in POSTGRES_INDEXES.values():
+            op.execute(statement)
+    elif dialect() == 'sqlite':
+        for table, fields in SEARCH_FIELDS.items():
+            for statement in sqlite_fts(table, fields):
+                op.execute(statement)
+
+
+def downgrade() -> None:
+    if dialect() == 'postgresql':
+        for name in POSTGRES_INDEXES:
+            op.execute(f'DROP INDEX IF EXISTS {name}')
+    elif dialect() == 'sqlite':
+        for table in SEARCH_FIELDS:
+            for trigger in ('ai', 'ad', 'au'):
+                op.execute(f'DROP TRIGGER IF EXISTS {table}_fts_{trigger}')
+            op.execute(f'DROP TABLE IF EXISTS {table}_fts')
@@ -0,0 +1,67 @@
+"""content-addressed media blobs and their references
+
+Revision ID: 8b3e6a41f0d2
+Revises: 5d1f0c7b2e94
+Create Date: 2026-10-18 16:40:05.227391
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b3e6a41f0d2'
+down_revision = '5d1f0c7b2e94'
+branch_labels = None
+depends_on = None
+
+
+def base_columns():
+    return [
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('updated_by', sa.Integer(), nullable=True),
+        sa.Column('deleted_by', sa.Integer(), nullable=True),
+    ]
+
+
+def upgrade() -> None:
+    op.create_table('media_blobs',
+    sa.Column('key', sa.String(length=255), nullable=False),
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('size', sa.Integer(), nullable=False),
+    sa.Column('content_type', sa.String(length=255), nullable=True),
+    *base_columns(),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('key')
+    )
+    with op.batch_alter_table('media_blobs', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_media_blobs_id'), ['id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_media_blobs_sha256'), ['sha256'], unique=False)
+
+    op.create_table('media_references',
+    sa.Column('blob_id', sa.Integer(), nullable=False),
+    sa.Column('owner_table', sa.String(length=100), nullable=False),
+    sa.Column('owner_id', sa.Integer(), nullable=False),
+    *base_columns(),
+    sa.ForeignKeyConstraint(['blob_id'], ['media_blobs.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('blob_id', 'owner_table', 'owner_id')
+    )
+    with op.batch_alter_table('media_references', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_media_references_blob_id'), ['blob_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_media_references_id'), ['id'], unique=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('media_references', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_media_references_id'))
+        batch_op.drop_index(batch_op.f('ix_media_references_blob_id'))
+    op.drop_table('media_references')
+
+    with op.batch_alter_table('media_blobs', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_media_blobs_sha256'))
+        batch_op.drop_index(batch_op.f('ix_media_blobs_id'))
+    op.drop_table('media_blobs')
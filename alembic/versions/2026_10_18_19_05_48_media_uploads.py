@@ -0,0 +1,47 @@
+"""chunked media uploads
+
+Revision ID: c47d2e9a1b56
+Revises: 8b3e6a41f0d2
+Create Date: 2026-10-18 19:05:48.603174
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c47d2e9a1b56'
+down_revision = '8b3e6a41f0d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('media_uploads',
+    sa.Column('filename', sa.String(length=255), nullable=False),
+    sa.Column('content_type', sa.String(length=255), nullable=True),
+    sa.Column('size', sa.BigInteger(), nullable=False),
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('chunk_size', sa.Integer(), nullable=False),
+    sa.Column('received', sa.Integer(), nullable=False),
+    sa.Column('part_checksums', sa.JSON(), nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('blob_id', sa.Integer(), nullable=True),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('updated_by', sa.Integer(), nullable=True),
+    sa.Column('deleted_by', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['blob_id'], ['media_blobs.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('media_uploads', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_media_uploads_id'), ['id'], unique=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('media_uploads', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_media_uploads_id'))
+    op.drop_table('media_uploads')
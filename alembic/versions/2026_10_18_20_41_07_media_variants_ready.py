@@ -0,0 +1,26 @@
+"""media blob variants_ready
+
+Revision ID: 5e0b9d7c31a4
+Revises: c47d2e9a1b56
+Create Date: 2026-10-18 20:41:07.218391
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e0b9d7c31a4'
+down_revision = 'c47d2e9a1b56'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('media_blobs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('variants_ready', sa.Boolean(), server_default=sa.false(), nullable=False))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('media_blobs', schema=None) as batch_op:
+        batch_op.drop_column('variants_ready')
@@ -0,0 +1,29 @@
+"""media blob variant_widths
+
+Revision ID: 9a4c2f61d8e3
+Revises: 5e0b9d7c31a4
+Create Date: 2026-10-19 08:14:22.508816
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a4c2f61d8e3'
+down_revision = '5e0b9d7c31a4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('media_blobs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('variant_widths', sa.JSON(), nullable=True))
+    # Rendered before widths were recorded, possibly wider than the image:
+    # render them again (python -m app.render_variants)
+    op.execute('UPDATE media_blobs SET variants_ready = false')
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('media_blobs', schema=None) as batch_op:
+        batch_op.drop_column('variant_widths')
@@ -0,0 +1,106 @@
+"""
+Login throughput, and what a burst of logins does to unrelated requests.
+
+Runs the same load twice, hashing inline (HASHING_WORKERS=0, as before the
+process pool) and in the hashing pool: ``--concurrency`` clients log in
+back to back while a probe client times GET /setups/countries/.
+
+    python -m app.benchmarks.login --seconds 10 --concurrency 8
+
+Uses DATABASE_URI and adds a benchmark user to it; do not point it at
+production.
+"""
+import argparse
+import statistics
+import threading
+import time
+from collections import Counter
+from typing import Dict, List
+
+from fastapi.testclient import TestClient
+
+from app.core.database import SessionLocal
+from app.core.hashing import password_hasher
+from app.core.security import hash_password
+from app.main import app
+from app.models import User
+from app.models.base import BaseDBModel
+
+EMAIL = "benchmark@risevale.com"
+PASSWORD = "benchmark-password"
+
+
+def ensure_user():
+    BaseDBModel.metadata.create_all(bind=SessionLocal.kw["bind"])
+    with SessionLocal() as db:
+        if not db.query(User).filter_by(email=EMAIL).first():
+            password = hash_password(PASSWORD)
+            db.add(User(full_name="Benchmark", email=EMAIL, password=password))
+            db.commit()
+
+
+def percentile(values: List[float], q: float) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1]
+
+
+def run(client: TestClient, seconds: float, concurrency: int) -> Dict:
+    deadline = time.monotonic() + seconds
+    statuses = Counter()
+    probe_ms: List[float] = []
+
+    def login():
+        while time.monotonic() < deadline:
+            response = client.post(
+                "/auth/login/", json={"email": EMAIL, "password": PASSWORD}
+            )
+            statuses[response.status_code] += 1
+
+    def probe():
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            client.get("/setups/countries/", headers={"X-Read-Primary": "1"})
+            probe_ms.append((time.perf_counter() - started) * 1000)
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=login) for _ in range(concurrency)]
+    threads.append(threading.Thread(target=probe))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return {
+        "logins/s": statuses[200] / seconds,
+        "429s": statuses[429],
+        "probe p50 ms": percentile(probe_ms, 50),
+        "probe p99 ms": percentile(probe_ms, 99),
+        "probe max ms": max(probe_ms, default=0.0),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    ensure_user()
+    workers = password_hasher.workers
+    results = {}
+    with TestClient(app) as client:
+        for name, mode in (("inline", 0), (f"pool ({workers} workers)", workers)):
+            password_hasher.workers = mode
+            client.post("/auth/login/", json={"email": EMAIL, "password": PASSWORD})
+            results[name] = run(client, args.seconds, args.concurrency)
+    password_hasher.workers = workers
+
+    columns = list(next(iter(results.values())))
+    print(f"{'':<20}" + "".join(f"{c:>14}" for c in columns))
+    for name, result in results.items():
+        print(f"{name:<20}" + "".join(f"{result[c]:>14.1f}" for c in columns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Admission control in front of the connection pool.
+
+Requests are sorted into route classes: ``bookings`` (creating a booking),
+``admin`` (every other write) and ``public`` (reads). Pressure is the
+pool's saturation: connections checked out plus checkouts waiting for one,
+as a share of its capacity (``pool_size + max_overflow``), for the busiest
+pool. Each class may only start while pressure is below its share in
+``ADMISSION_SHARES``, so a storm of catalog reads is shed with a 503 long
+before it can take the connections that bookings need. Requests that
+don't hold a connection (reads served from the cache, requests waiting on
+other I/O) don't add pressure, however many are in flight.
+
+Uploads (multipart forms and chunked upload parts) are not admitted: most
+of their time goes to receiving the body, before the route opens a
+session. The connections they do check out still count towards pressure.
+"""
+from typing import Callable, Dict, Iterable, Optional
+
+from sqlalchemy.pool import Pool, QueuePool
+
+from app.core import database
+from app.core.config import get_settings
+from app.core.metrics import Counter, Gauge, TimedQueuePool
+
+PUBLIC = "public"
+ADMIN = "admin"
+BOOKINGS = "bookings"
+
+# No database work, and must answer while the API is overloaded
+_EXEMPT_PREFIXES = ("/metrics", "/media/", "/docs", "/openapi.json")
+_READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+# Request bodies streamed in before the route touches the database
+_UPLOAD_CONTENT_TYPES = ("multipart/form-data", "application/octet-stream")
+
+
+def route_class(
+    method: str, path: str, content_type: Optional[str] = None
+) -> Optional[str]:
+    """The class a request is admitted under, None when it is not limited"""
+    if path.startswith(_EXEMPT_PREFIXES):
+        return None
+    if content_type and content_type.startswith(_UPLOAD_CONTENT_TYPES):
+        return None
+    if method in _READ_METHODS:
+        return PUBLIC
+    if method == "POST" and path.rstrip("/") == "/bookings":
+        return BOOKINGS
+    return ADMIN
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        capacity: int,
+        shares: Dict[str, float],
+        pools: Callable[[], Iterable[Pool]] = lambda: (),
+    ):
+        self.capacity = capacity
+        self.shares = shares
+        self.pools = pools
+        self.in_flight: Dict[str, int] = {name: 0 for name in shares}
+
+    def pressure(self) -> float:
+        """Share of the busiest pool's capacity in use or waited for"""
+        used = 0
+        for pool in self.pools():
+            if isinstance(pool, QueuePool):
+                waiting = pool.waiting if isinstance(pool, TimedQueuePool) else 0
+                used = max(used, pool.checkedout() + waiting)
+        return used / self.capacity
+
+    def admit(self, name: str) -> bool:
+        # Only called on the event loop, the counts need no lock
+        if self.pressure() >= self.shares.get(name, 1.0):
+            admission_rejected_total.inc(route_class=name)
+            return False
+        self.in_flight[name] = self.in_flight.get(name, 0) + 1
+        return True
+
+    def release(self, name: str):
+        self.in_flight[name] -= 1
+
+
+def _pools() -> Iterable[Pool]:
+    return (database.engine.pool, database.async_engine.sync_engine.pool)
+
+
+settings = get_settings()
+
+admission = AdmissionController(
+    settings.DATABASE_POOL_SIZE + settings.DATABASE_MAX_OVERFLOW,
+    settings.ADMISSION_SHARES,
+    _pools,
+)
+
+admission_in_flight = Gauge(
+    "admission_in_flight",
+    "Admitted requests in flight, by route class",
+    ["route_class"],
+    callback=lambda: (
+        ({"route_class": name}, count) for name, count in admission.in_flight.items()
+    ),
+)
+admission_rejected_total = Counter(
+    "admission_rejected_total",
+    "Requests shed with a 503 by admission control, by route class",
+    ["route_class"],
+)
+
+
+__all__ = [
+    "PUBLIC",
+    "ADMIN",
+    "BOOKINGS",
+    "route_class",
+    "AdmissionController",
+    "admission",
+    "admission_in_flight",
+    "admission_rejected_total",
+]
@@ -1,6 +1,6 @@
 from enum import Enum
 from functools import lru_cache
-from typing import Optional, Union
+from typing import Dict, List, Literal, Optional, Union
 
 from pydantic import PostgresDsn
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -38,19 +38,76 @@ class Settings(BaseSettings):
     ENVIRONMENT: Environment = Environment.local
     TIME_ZONE: str = "Africa/Nairobi"
     DATABASE_URI: Optional[Union[PostgresDsn, str]] = "sqlite:///./test.db"
+    # Read-only replicas of DATABASE_URI for GET requests, as a JSON list
+    DATABASE_REPLICA_URIS: List[str] = []
+    DATABASE_REPLICA_RETRY_SECONDS: int = 30
+    # Connection pool, and how long a checkout may wait before a 503
+    DATABASE_POOL_SIZE: int = 20
+    DATABASE_MAX_OVERFLOW: int = 30
+    DATABASE_POOL_TIMEOUT_SECONDS: float = 3
 
     # Security & Authentication
     ACCESS_TOKEN_EXP_MINUTES: int = 7 * 24 * 60
     REFRESH_TOKEN_EXP_DAYS: int = 30
     PASSWORD_RESET_TOKEN_EXP_HOURS: int = 1
+    # Authenticated users, and decoded access tokens (until they expire)
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60
+    TOKEN_CACHE_MAX_ENTRIES: int = 4096
 
     # Test User Credentials
     TEST_USER_EMAIL: str = "test@risevale.com"
     TEST_USER_PASSWORD: str = "@pass_123"
 
+    # Pagination counts
+    COUNT_CACHE_TTL_SECONDS: int = 60
+    COUNT_ESTIMATE_THRESHOLD: int = 10_000
+
     # Redis Configuration
     REDIS_HOST: Optional[str] = None
+    REDIS_PORT: int = 6379
     REDIS_DB: int = 0
+    REDIS_TIMEOUT_SECONDS: float = 0.5
+
+    # Query cache (Redis, or an in-process LRU without Redis); 0 disables it
+    CACHE_TTL_SECONDS: int = 300
+    CACHE_MAX_ENTRIES: int = 2048
+
+    # SQL instrumentation: per-request statement budget, repeats of the same
+    # statement that count as N+1, and the slow statement threshold
+    SQL_QUERY_BUDGET: int = 30
+    SQL_REPEAT_THRESHOLD: int = 5
+    SQL_SLOW_QUERY_MS: int = 200
+    # Statement counts and DB time in a Server-Timing header on every
+    # response; for local runs and tests, not the public site
+    SERVER_TIMING_ENABLED: bool = False
+
+    # Prometheus metrics at /metrics; nginx keeps it off the public site
+    METRICS_ENABLED: bool = True
+
+    # Users (by id) allowed to profile a request with the X-Profile header
+    PROFILER_USER_IDS: List[int] = []
+    PROFILER_INTERVAL_MS: float = 1
+
+    # Event loop watchdog: heartbeat interval and the lag reported as a stall
+    LOOP_MONITOR_ENABLED: bool = True
+    LOOP_MONITOR_INTERVAL_MS: int = 20
+    LOOP_BLOCK_THRESHOLD_MS: int = 100
+
+    # Admission control: the share of the pool's capacity in use
+    # (connections checked out or waited for) past which each route class
+    # is turned away with a 503, see app.core.admission
+    ADMISSION_CONTROL_ENABLED: bool = True
+    ADMISSION_SHARES: Dict[str, float] = {"public": 0.6, "admin": 0.8, "bookings": 1.0}
+    ADMISSION_RETRY_AFTER_SECONDS: int = 1
+
+    # Password hashing processes (0 hashes inline) and the most hashes
+    # running or queued before logins get a 429
+    HASHING_WORKERS: int = 2
+    HASHING_MAX_PENDING: int = 16
+
+    # Cache-Control for public catalog GETs (browsers and the nginx cache)
+    HTTP_CACHE_MAX_AGE: int = 30
+    HTTP_CACHE_STALE_WHILE_REVALIDATE: int = 300
 
     # Email Configuration
     EMAIL_SMTP_SERVER: str = "smtp.gmail.com"
@@ -60,7 +117,28 @@ class Settings(BaseSettings):
     ADMIN_EMAIL: str = "admin@risevale.com"
     GCP_PRIVATE_BUCKET: str
     GCP_PUBLIC_BUCKET: str
+    # Mounted into the container, never kept in the source tree
+    GCP_SERVICE_ACCOUNT_FILE: str = "/run/secrets/gcp-service-account.json"
     MEDIA_BASE: str = "media"
+    # Private objects of the local backend, e.g. staged upload parts; not served
+    MEDIA_PRIVATE_BASE: str = "media_private"
+    # Where uploads go: "gcs", "local" (MEDIA_BASE) or "memory"; by default
+    # memory in tests, local in local development and gcs elsewhere
+    STORAGE_BACKEND: Optional[Literal["gcs", "local", "memory"]] = None
+    # Files of one request uploaded to storage at the same time
+    MEDIA_UPLOAD_CONCURRENCY: int = 4
+    # Chunked uploads (/uploads): the size of every part but the last, kept
+    # small enough to get through on a poor mobile connection, and the
+    # largest file accepted
+    UPLOAD_CHUNK_SIZE: int = 2 * 1024 * 1024
+    UPLOAD_MAX_SIZE: int = 200 * 1024 * 1024
+    # Derivatives rendered for uploaded images (app.utils.images): widths,
+    # quality, placeholder size and the processes rendering them
+    IMAGE_VARIANT_WIDTHS: List[int] = [320, 640, 1024, 1600]
+    IMAGE_VARIANT_QUALITY: int = 80
+    IMAGE_PLACEHOLDER_WIDTH: int = 24
+    IMAGE_WORKERS: int = 1
+    IMAGE_MAX_PENDING: int = 32
 
     model_config = SettingsConfigDict(
         extra="allow", env_file=".env", env_file_encoding="utf-8", case_sensitive=True
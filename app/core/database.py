@@ -1,23 +1,29 @@
 import logging
-from typing import Generator
+from typing import AsyncGenerator, Callable, Generator
 
-from fastapi import HTTPException
-from sqlalchemy import create_engine
-from sqlalchemy.exc import SQLAlchemyError
+from fastapi import HTTPException, Request
+from sqlalchemy import create_engine, make_url
+from sqlalchemy.exc import SQLAlchemyError, TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, Session
 
 from app.core.config import get_settings
+from app.core.metrics import TimedAsyncQueuePool, TimedQueuePool, instrument_pool
+from app.core.routing import DatabaseRouter, ReplicaSet, RoutingSession, route_reads
+from app.core.sql_metrics import instrument_engine
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
 engine_kwargs = {
-    "pool_size": 20,
-    "max_overflow": 30,
+    "pool_size": settings.DATABASE_POOL_SIZE,
+    "max_overflow": settings.DATABASE_MAX_OVERFLOW,
+    "pool_timeout": settings.DATABASE_POOL_TIMEOUT_SECONDS,
     "echo": settings.ENVIRONMENT in ["local", "test"],
     "pool_reset_on_return": "rollback",
     "pool_recycle": 3600,
+    "poolclass": TimedQueuePool,
 }
 
 # Add connection args only for non-SQLite databases
@@ -31,19 +37,107 @@ if "postgresql" in str(settings.DATABASE_URI):
 engine = create_engine(settings.DATABASE_URI, **engine_kwargs)
 logger.info(f"Database engine created for environment: {settings.ENVIRONMENT}")
 
+# Async drivers for the same databases
+async_drivers = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+
+def async_database_uri(uri) -> str:
+    url = make_url(str(uri))
+    return url.set(drivername=async_drivers[url.get_backend_name()]).render_as_string(
+        hide_password=False
+    )
+
+
+# aiosqlite uses a NullPool, which takes no pool arguments
+async_engine_kwargs = {"echo": engine_kwargs["echo"]}
+if "postgresql" in str(settings.DATABASE_URI):
+    async_engine_kwargs = {
+        **engine_kwargs,
+        "poolclass": TimedAsyncQueuePool,
+        "connect_args": {
+            "timeout": 10,
+            "server_settings": {
+                "application_name": "RISEVALE_TOUR_API",
+                "timezone": "Africa/Nairobi",
+            },
+        },
+    }
+
+async_engine = create_async_engine(
+    async_database_uri(settings.DATABASE_URI), **async_engine_kwargs
+)
+
+# Read replicas, see app.core.routing
+replica_engines = [
+    create_engine(uri, pool_pre_ping=True, **engine_kwargs)
+    for uri in settings.DATABASE_REPLICA_URIS
+]
+async_replica_engines = [
+    create_async_engine(async_database_uri(uri), **async_engine_kwargs)
+    for uri in settings.DATABASE_REPLICA_URIS
+]
+retry_after = settings.DATABASE_REPLICA_RETRY_SECONDS
+
+for _engine in [engine, async_engine, *replica_engines, *async_replica_engines]:
+    instrument_engine(getattr(_engine, "sync_engine", _engine))
+
+instrument_pool(engine, "primary")
+instrument_pool(async_engine.sync_engine, "primary_async")
+for _i, _engine in enumerate(replica_engines):
+    instrument_pool(_engine, f"replica_{_i}")
+for _i, _engine in enumerate(async_replica_engines):
+    instrument_pool(_engine.sync_engine, f"replica_{_i}_async")
+
+router = DatabaseRouter(engine, ReplicaSet(replica_engines, retry_after))
+async_router = DatabaseRouter(
+    async_engine.sync_engine,
+    ReplicaSet([e.sync_engine for e in async_replica_engines], retry_after),
+)
+
 SessionLocal = sessionmaker(
     bind=engine,
     autocommit=False,
     autoflush=False,
     expire_on_commit=False,
-    class_=Session,
+    class_=RoutingSession,
+    router=router,
+)
+
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    autoflush=False,
+    expire_on_commit=False,
+    class_=AsyncSession,
+    sync_session_class=RoutingSession,
+    router=async_router,
 )
 
 
-def get_db() -> Generator[Session, None, None]:
+def pool_exhausted() -> HTTPException:
+    """503 for a request the pool has no connection to spare for"""
+    return HTTPException(
+        status_code=503,
+        detail={"message": "The service is busy, please try again shortly."},
+        headers={"Retry-After": str(settings.ADMISSION_RETRY_AFTER_SECONDS)},
+    )
+
+
+def get_db(request: Request = None) -> Generator[Session, None, None]:
+    """
+    The request's session. FastAPI resolves it once per request, so every
+    dependency and the route share it; it is kept on ``request.state.db``
+    for the exception handlers. A connection is only checked out on first
+    use and goes back to the pool at commit/rollback and at close.
+    """
     db: Session = SessionLocal()
+    route_reads(db, request)
+    if request is not None:
+        request.state.db = db
     try:
         yield db
+    except PoolTimeoutError as e:
+        raise pool_exhausted() from e
     except SQLAlchemyError as e:
         db.rollback()
         logger.error("Database error occurred", exc_info=e)
@@ -55,4 +149,44 @@ def get_db() -> Generator[Session, None, None]:
         db.close()
 
 
-__all__ = ["engine", "SessionLocal", "get_db"]
+def get_session_factory() -> Callable[[], Session]:
+    """Opens sessions for work outliving the request, e.g. background tasks"""
+    return SessionLocal
+
+
+async def get_async_db(request: Request = None) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Session for async routes. Queries await the connection instead of
+    holding a threadpool slot; read-only so far, see BaseRepository.aget*.
+    """
+    db = AsyncSessionLocal()
+    route_reads(db.sync_session, request)
+    if request is not None:
+        request.state.async_db = db
+    try:
+        yield db
+    except PoolTimeoutError as e:
+        raise pool_exhausted() from e
+    except SQLAlchemyError as e:
+        await db.rollback()
+        logger.error("Database error occurred", exc_info=e)
+        raise HTTPException(
+            status_code=500,
+            detail="A database error occurred. Please try again later.",
+        )
+    finally:
+        await db.close()
+
+
+__all__ = [
+    "engine",
+    "SessionLocal",
+    "pool_exhausted",
+    "get_db",
+    "get_session_factory",
+    "async_engine",
+    "router",
+    "async_router",
+    "AsyncSessionLocal",
+    "get_async_db",
+]
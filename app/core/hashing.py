@@ -0,0 +1,97 @@
+"""
+Password hashing in a bounded process pool.
+
+sha256_crypt is slow on purpose, and passlib's os_crypt backend holds the
+GIL for the whole hash, so hashing in a thread still freezes the event
+loop and every other request. The hashes run in worker processes instead;
+callers block (without the GIL) on the result. At most
+``HASHING_MAX_PENDING`` hashes are running or queued, beyond that
+``HashingPoolSaturated`` is raised rather than letting logins pile up.
+"""
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Optional
+
+from passlib import context
+
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+pwd_context = context.CryptContext(schemes=["sha256_crypt"])
+
+
+class HashingPoolSaturated(Exception):
+    pass
+
+
+def _hash(plain_password: str) -> str:
+    return pwd_context.hash(plain_password)
+
+
+def _verify(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+class PasswordHasher:
+    """
+    Runs hashes in ``workers`` processes, or inline when ``workers`` is 0.
+    The pool is started on first use.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # Not fork: the parent has threads (threadpool, watchdogs)
+                self._pool = ProcessPoolExecutor(
+                    self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._pool
+
+    def _run(self, fn: Callable, *args):
+        if not self.workers:
+            return fn(*args)
+
+        if not self._slots.acquire(blocking=False):
+            raise HashingPoolSaturated()
+        try:
+            future: Future = self._executor().submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result()
+
+    def hash(self, plain_password: str) -> str:
+        return self._run(_hash, plain_password)
+
+    def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return self._run(_verify, plain_password, hashed_password)
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(cancel_futures=True)
+                self._pool = None
+
+
+password_hasher = PasswordHasher(
+    get_settings().HASHING_WORKERS, get_settings().HASHING_MAX_PENDING
+)
+
+
+__all__ = [
+    "pwd_context",
+    "HashingPoolSaturated",
+    "PasswordHasher",
+    "password_hasher",
+]
@@ -0,0 +1,235 @@
+"""
+Event loop blocking detector.
+
+A heartbeat task on the loop sleeps for ``LOOP_MONITOR_INTERVAL_MS`` and
+records how late it wakes up as ``event_loop_lag_seconds``. A watchdog
+thread checks the heartbeat: once the loop has not come round for
+``LOOP_BLOCK_THRESHOLD_MS`` it captures the loop thread's stack and the
+route of the task that is running. When the loop comes back the stall is
+logged, counted in ``event_loop_stalls_total`` and kept in
+``loop_monitor.stalls``; the test suite fails on any that are blocking.
+
+Not every stall is a blocking route: a loop caught idle in ``select()``
+was starved of the GIL by another thread (e.g. C code in the threadpool
+that does not release it) and carries the busy workers' stacks instead,
+and a stall spent mostly in the collector is reported as a GC pause.
+"""
+import asyncio
+import gc
+import logging
+import selectors
+import sys
+import threading
+import time
+import traceback
+import weakref
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional, Tuple
+
+from app.core.config import get_settings
+from app.core.metrics import Counter, Histogram, route_label
+from app.core.profiling import WORKER_THREAD_NAME
+
+logger = logging.getLogger(__name__)
+
+event_loop_lag_seconds = Histogram(
+    "event_loop_lag_seconds",
+    "How late the event loop heartbeat woke up",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5),
+)
+event_loop_stalls_total = Counter(
+    "event_loop_stalls_total",
+    "Times the event loop was blocked past the threshold, by route",
+    ["route"],
+)
+
+# Request scope of each task handling a request, for attributing stalls
+_task_scopes: "weakref.WeakKeyDictionary[asyncio.Task, dict]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+@dataclass
+class Stall:
+    route: str
+    stack: List[str] = field(default_factory=list)
+    duration: float = 0.0
+    # "code" when the loop ran something slow, "gc" for a garbage collection
+    # pause, "gil" when it sat in select() while another thread held the GIL
+    # and "unknown" when the watchdog could not get the GIL to look either
+    cause: str = "code"
+    other_stacks: Dict[str, List[str]] = field(default_factory=dict)
+
+    @property
+    def blocking(self) -> bool:
+        """Whether code running on the loop itself caused the stall"""
+        return self.cause == "code" and bool(self.stack)
+
+    @property
+    def label(self) -> str:
+        return self.route if self.cause == "code" else self.cause
+
+    def __str__(self) -> str:
+        duration = f"{self.duration * 1000:.0f}ms"
+        if self.cause == "gil":
+            lines = [f"Event loop starved for {duration}, GIL held by another thread"]
+            for name, stack in self.other_stacks.items():
+                lines.append(f"{name}:\n{''.join(stack)}")
+            return "\n".join(lines)
+        if self.cause == "gc":
+            return f"Event loop paused {duration} by garbage collection"
+        if self.cause == "unknown":
+            return (
+                f"Event loop stalled for {duration}, no stack captured: "
+                f"a thread held the GIL in C code"
+            )
+        stack = "".join(self.stack)
+        return f"Event loop blocked for {duration} by {self.route}\n{stack}"
+
+
+def _is_busy_worker(frame) -> bool:
+    while frame is not None:
+        if frame.f_code.co_qualname == "Queue.get":
+            return False
+        frame = frame.f_back
+    return True
+
+
+class LoopMonitor:
+    def __init__(self):
+        self.stalls: Deque[Stall] = deque(maxlen=100)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._due = 0.0
+        self._pending: Optional[Tuple[float, Stall]] = None
+        self._gc_started = 0.0
+        self._gc_seconds = 0.0
+        self._stop = threading.Event()
+
+    def _current_route(self) -> str:
+        # Read from the watchdog thread while the loop is stuck in this task
+        task = asyncio.current_task(self._loop)
+        if task is None or (scope := _task_scopes.get(task)) is None:
+            return "unknown"
+        return f"{scope['method']} {route_label(scope)}"
+
+    def _capture(self) -> Stall:
+        frames = sys._current_frames()
+        frame = frames.get(self._loop_thread_id)
+        if frame is None:
+            return Stall(route="unknown", cause="unknown")
+
+        stack = traceback.format_stack(frame)
+        stall = Stall(route=self._current_route(), stack=stack)
+        if frame.f_code.co_filename == selectors.__file__:
+            stall.cause = "gil"
+            for thread in threading.enumerate():
+                if thread.name == WORKER_THREAD_NAME and _is_busy_worker(
+                    worker := frames.get(thread.ident)
+                ):
+                    name = f"{thread.name} {thread.ident}"
+                    stall.other_stacks[name] = traceback.format_stack(worker)
+        return stall
+
+    def _on_gc(self, phase: str, info: dict):
+        # gc runs in whichever thread triggered it; only the loop's matter
+        if threading.get_ident() != self._loop_thread_id:
+            return
+        if phase == "start":
+            self._gc_started = time.monotonic()
+        else:
+            self._gc_seconds += time.monotonic() - self._gc_started
+
+    def _watch(self, interval: float, threshold: float):
+        while not self._stop.wait(interval):
+            due = self._due
+            if time.monotonic() - due >= threshold and self._pending is None:
+                # Tagged with the beat it belongs to, the loop may have
+                # moved on while the stack was being captured
+                self._pending = (due, self._capture())
+
+    async def _heartbeat(self, interval: float, threshold: float):
+        while True:
+            due = self._due = time.monotonic() + interval
+            self._gc_seconds = 0.0
+            await asyncio.sleep(interval)
+            lag = max(0.0, time.monotonic() - due)
+            event_loop_lag_seconds.observe(lag)
+
+            pending, self._pending = self._pending, None
+            if lag >= threshold:
+                if pending is not None and pending[0] == due:
+                    stall = pending[1]
+                else:
+                    stall = Stall(route="unknown", cause="unknown")
+                stall.duration = lag
+                if self._gc_seconds >= lag / 2:
+                    stall.cause = "gc"
+                self._report(stall)
+
+    def _report(self, stall: Stall):
+        self.stalls.append(stall)
+        event_loop_stalls_total.inc(route=stall.label)
+        logger.warning(str(stall))
+
+    @asynccontextmanager
+    async def watch(self):
+        """Monitor the running loop for the duration of the block"""
+        settings = get_settings()
+        if not settings.LOOP_MONITOR_ENABLED:
+            yield
+            return
+
+        interval = settings.LOOP_MONITOR_INTERVAL_MS / 1000
+        threshold = settings.LOOP_BLOCK_THRESHOLD_MS / 1000
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._due = time.monotonic() + interval
+        self._stop.clear()
+
+        heartbeat = asyncio.create_task(self._heartbeat(interval, threshold))
+        watchdog = threading.Thread(
+            target=self._watch,
+            args=(interval, threshold),
+            name="event loop watchdog",
+            daemon=True,
+        )
+        watchdog.start()
+        gc.callbacks.append(self._on_gc)
+        try:
+            yield
+        finally:
+            gc.callbacks.remove(self._on_gc)
+            self._stop.set()
+            heartbeat.cancel()
+            watchdog.join()
+
+
+loop_monitor = LoopMonitor()
+
+
+class LoopMonitorMiddleware:
+    """
+    Remember which request each task is serving. Pure ASGI, and added
+    innermost, so it runs in the same task as the route handler.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and (task := asyncio.current_task()):
+            _task_scopes[task] = scope
+        await self.app(scope, receive, send)
+
+
+__all__ = [
+    "Stall",
+    "LoopMonitor",
+    "loop_monitor",
+    "LoopMonitorMiddleware",
+    "event_loop_lag_seconds",
+    "event_loop_stalls_total",
+]
@@ -0,0 +1,354 @@
+"""
+Process metrics in the Prometheus text format, served at ``/metrics``.
+
+Counters and histograms are sharded per thread: each thread updates its
+own dict without locking and the shards are summed when scraped, so
+recording a sample stays cheap on the request path. Values that already
+live elsewhere (connection pools, the threadpool limiter) are read by
+callback gauges at scrape time.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import anyio.to_thread
+from sqlalchemy import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+LabelValues = Tuple[str, ...]
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List["Metric"] = []
+
+    def register(self, metric: "Metric"):
+        self.metrics.append(metric)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != float("inf") else "+Inf"
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        registry: Optional[Registry] = REGISTRY,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: List[dict] = []
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def _shard(self) -> dict:
+        """This thread's shard; only the lookup of a new thread takes the lock"""
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append(shard)
+            return shard
+
+    def _key(self, labels: Dict[str, object]) -> LabelValues:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _merged(self, merge: Callable) -> dict:
+        merged = {}
+        with self._lock:
+            shards = list(self._shards)
+        for shard in shards:
+            # dict.copy() is atomic under the GIL, iterating a live dict is not
+            for key, value in shard.copy().items():
+                merged[key] = merge(merged[key], value) if key in merged else value
+        return merged
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        shard = self._shard()
+        key = self._key(labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    def values(self) -> Dict[LabelValues, float]:
+        return self._merged(lambda a, b: a + b)
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(self.values().items())
+        ]
+
+
+class Gauge(Counter):
+    """
+    A counter that can go down, optionally extended with a callback that
+    yields ``(labels, value)`` pairs read at scrape time.
+    """
+
+    type = "gauge"
+
+    def __init__(self, *args, callback: Optional[Callable] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.callback = callback
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def values(self) -> Dict[LabelValues, float]:
+        values = super().values()
+        if self.callback is not None:
+            for labels, value in self.callback():
+                values[self._key(labels)] = value
+        return values
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, *args, buckets: Iterable[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        shard = self._shard()
+        key = self._key(labels)
+        # Per-bucket counts (not cumulative), the +Inf bucket, then the sum
+        if (counts := shard.get(key)) is None:
+            counts = shard[key] = [0] * (len(self.buckets) + 2)
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self) -> List[str]:
+        merged = self._merged(lambda a, b: [x + y for x, y in zip(a, b)])
+        names = (*self.labelnames, "le")
+        lines = []
+        for key, counts in sorted(merged.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                labels = _format_labels(names, (*key, _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(counts[-1])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+# HTTP
+
+http_requests_total = Counter(
+    "http_requests_total",
+    "Requests handled, by route template and status code",
+    ["method", "route", "status"],
+)
+http_request_duration_seconds = Histogram(
+    "http_request_duration_seconds",
+    "Request latency, by route template",
+    ["method", "route"],
+)
+http_requests_in_flight = Gauge(
+    "http_requests_in_flight", "Requests currently being handled"
+)
+
+
+def route_label(scope: dict) -> str:
+    """The matched route's path template, so ids do not blow up cardinality"""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+# Connection pools
+
+_pool_engines: Dict[str, Engine] = {}
+
+
+class TimedQueuePool(QueuePool):
+    """
+    A QueuePool that records how long each checkout waited for a connection,
+    and counts the checkouts in progress (``waiting``)
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.waiting = 0
+        self._waiting_lock = threading.Lock()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        with self._waiting_lock:
+            self.waiting += 1
+        try:
+            return super()._do_get()
+        finally:
+            with self._waiting_lock:
+                self.waiting -= 1
+            db_pool_wait_seconds.observe(
+                time.perf_counter() - started, pool=self._metrics_name
+            )
+
+    @property
+    def _metrics_name(self) -> str:
+        for name, engine in _pool_engines.items():
+            if engine.pool is self:
+                return name
+        return "unregistered"
+
+
+class TimedAsyncQueuePool(TimedQueuePool, AsyncAdaptedQueuePool):
+    pass
+
+
+def instrument_pool(engine: Engine, name: str):
+    """Report ``engine``'s pool as ``pool="<name>"`` if it is a QueuePool"""
+    if isinstance(engine.pool, QueuePool):
+        _pool_engines[name] = engine
+
+
+def _pool_states():
+    for name, engine in list(_pool_engines.items()):
+        pool = engine.pool
+        yield {"pool": name, "state": "checked_out"}, pool.checkedout()
+        yield {"pool": name, "state": "checked_in"}, pool.checkedin()
+        # Negative until the pool has opened pool_size connections
+        yield {"pool": name, "state": "overflow"}, pool.overflow()
+        yield {"pool": name, "state": "size"}, pool.size()
+        if isinstance(pool, TimedQueuePool):
+            yield {"pool": name, "state": "waiting"}, pool.waiting
+
+
+db_pool_connections = Gauge(
+    "db_pool_connections",
+    "Connection pool state: checked_out, checked_in, overflow, size and waiting",
+    ["pool", "state"],
+    callback=_pool_states,
+)
+db_pool_wait_seconds = Histogram(
+    "db_pool_wait_seconds",
+    "Time spent waiting to check a connection out of the pool",
+    ["pool"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30),
+)
+db_pool_checkouts_per_request = Histogram(
+    "db_pool_checkouts_per_request",
+    "Connections a request checked out of the pools",
+    buckets=(0, 1, 2, 3, 5, 10),
+)
+
+
+# Threadpool running sync routes and dependencies
+
+
+def _threadpool_states():
+    # Only callable from the event loop, i.e. while rendering /metrics
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    statistics = limiter.statistics()
+    yield {"state": "busy"}, statistics.borrowed_tokens
+    yield {"state": "limit"}, statistics.total_tokens
+    yield {"state": "waiting"}, statistics.tasks_waiting
+
+
+threadpool_threads = Gauge(
+    "threadpool_threads",
+    "Worker threads for sync endpoints: busy, limit and tasks waiting for one",
+    ["state"],
+    callback=_threadpool_states,
+)
+
+
+# Outbound calls
+
+outbound_request_duration_seconds = Histogram(
+    "outbound_request_duration_seconds",
+    "Duration of calls to external services (gcs, smtp, sms)",
+    ["service", "outcome"],
+)
+
+
+@contextmanager
+def track_outbound(service: str) -> Iterator[None]:
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        outbound_request_duration_seconds.observe(
+            time.perf_counter() - started, service=service, outcome=outcome
+        )
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+__all__ = [
+    "CONTENT_TYPE",
+    "REGISTRY",
+    "Registry",
+    "Counter",
+    "Gauge",
+    "Histogram",
+    "http_requests_total",
+    "http_request_duration_seconds",
+    "http_requests_in_flight",
+    "route_label",
+    "TimedQueuePool",
+    "TimedAsyncQueuePool",
+    "instrument_pool",
+    "db_pool_connections",
+    "db_pool_wait_seconds",
+    "db_pool_checkouts_per_request",
+    "threadpool_threads",
+    "outbound_request_duration_seconds",
+    "track_outbound",
+    "render",
+]
@@ -0,0 +1,169 @@
+"""
+On-demand request profiling.
+
+A request carrying ``X-Profile`` from a user listed in
+``PROFILER_USER_IDS`` runs under a sampling profiler and gets a call graph
+report back instead of its normal body. Without the header nothing is
+sampled.
+
+Sync routes run in the threadpool, so a tracing profiler on the event loop
+thread would not see them. The sampler instead walks the stacks of the
+event loop thread and of every busy threadpool worker, which makes the
+report wall-clock time: DB and other I/O waits show up under the frame
+that is blocked. Workers busy with other requests are sampled too; the
+report says how many requests were in flight alongside the profiled one.
+"""
+import os
+import sys
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from app.core import metrics
+from app.core.config import get_settings
+from app.core.security import decode_access_token
+from app.core.sql_metrics import QueryStats
+
+PROFILE_HEADER = "X-Profile"
+
+# Name anyio gives the threads running sync routes and dependencies
+WORKER_THREAD_NAME = "AnyIO worker thread"
+
+_roots = sorted({os.getcwd(), *sys.path}, key=len, reverse=True)
+
+
+def _frame_label(code) -> str:
+    filename = code.co_filename
+    for root in _roots:
+        if root and filename.startswith(root + os.sep):
+            filename = filename[len(root) + 1 :]
+            break
+    return f"{code.co_qualname} ({filename}:{code.co_firstlineno})"
+
+
+def _stack(frame) -> Tuple[str, ...]:
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    return tuple(reversed(labels))
+
+
+def _is_idle_worker(stack: Tuple[str, ...]) -> bool:
+    # An idle worker is blocked in Queue.get() waiting for its next job
+    for caller, callee in zip(stack, stack[1:]):
+        if caller.startswith("WorkerThread.run "):
+            return callee.startswith("Queue.get ")
+    return True
+
+
+class SamplingProfiler:
+    def __init__(self, loop_thread_id: int, interval: float = 0.001, in_flight=1):
+        self.loop_thread_id = loop_thread_id
+        self.interval = interval
+        self.in_flight = in_flight
+        self.samples: Dict[str, Counter] = {
+            "event loop": Counter(),
+            "workers": Counter(),
+        }
+        self.sample_count = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="request profiler", daemon=True
+        )
+
+    def _worker_ids(self) -> List[int]:
+        return [t.ident for t in threading.enumerate() if t.name == WORKER_THREAD_NAME]
+
+    def _sample(self):
+        frames = sys._current_frames()
+        if (frame := frames.get(self.loop_thread_id)) is not None:
+            self.samples["event loop"][_stack(frame)] += 1
+
+        for thread_id in self._worker_ids():
+            if (frame := frames.get(thread_id)) is not None:
+                stack = _stack(frame)
+                if not _is_idle_worker(stack):
+                    self.samples["workers"][stack] += 1
+        self.sample_count += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self) -> "SamplingProfiler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def top_functions(self, n: int = 30) -> List[Tuple[str, int, int]]:
+        """``(frame, self samples, total samples)`` ordered by total"""
+        own, total = Counter(), Counter()
+        for stacks in self.samples.values():
+            for stack, count in stacks.items():
+                own[stack[-1]] += count
+                for label in set(stack):
+                    total[label] += count
+        ranked = sorted(total.items(), key=lambda t: t[1], reverse=True)[:n]
+        return [(label, own[label], count) for label, count in ranked]
+
+    def folded(self) -> List[str]:
+        """Stacks in the folded format read by flamegraph.pl and speedscope"""
+        return [
+            ";".join((thread, *stack)) + f" {count}"
+            for thread, stacks in self.samples.items()
+            for stack, count in stacks.most_common()
+        ]
+
+    def report(
+        self, title: str, elapsed: float, queries: Optional[QueryStats] = None
+    ) -> str:
+        interval_ms = self.interval * 1000
+        lines = [
+            f"{title} in {elapsed * 1000:.1f}ms",
+            f"{self.sample_count} samples every {interval_ms:g}ms, wall clock",
+            f"{self.in_flight - 1} other requests in flight at the start",
+        ]
+        if queries is not None:
+            lines.append(f"SQL: {queries.report()}")
+
+        lines += ["", f"{'self':>8} {'total':>8}  function (samples)"]
+        for label, own, total in self.top_functions():
+            lines.append(f"{own:>8} {total:>8}  {label}")
+
+        lines += ["", "Call graph (folded stacks)", *self.folded()]
+        return "\n".join(lines) + "\n"
+
+
+def profiling_requested(headers) -> bool:
+    """Whether the request asks for a profile and may have one"""
+    if PROFILE_HEADER.lower() not in headers:
+        return False
+
+    settings = get_settings()
+    scheme, _, token = headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not settings.PROFILER_USER_IDS:
+        return False
+    if access_token := decode_access_token(token, settings=settings):
+        return int(access_token.sub) in settings.PROFILER_USER_IDS
+    return False
+
+
+def request_profiler() -> SamplingProfiler:
+    """A profiler for the request being handled on the calling event loop"""
+    return SamplingProfiler(
+        threading.get_ident(),
+        get_settings().PROFILER_INTERVAL_MS / 1000,
+        in_flight=int(sum(metrics.http_requests_in_flight.values().values())),
+    )
+
+
+__all__ = [
+    "PROFILE_HEADER",
+    "SamplingProfiler",
+    "profiling_requested",
+    "request_profiler",
+]
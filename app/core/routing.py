@@ -0,0 +1,148 @@
+"""
+Read-replica routing.
+
+Sessions start on the primary. Sessions opened for GET/HEAD requests are
+marked with ``READ_REPLICA`` and send their SELECTs to a replica, picked
+round robin on the session's first read and kept for the rest of it, so
+its reads see one consistent replica. Writes, ``SELECT ... FOR UPDATE`` and
+every statement after the first write or flush go to the primary, so a
+session always reads its own writes.
+Clients can pin a GET to the primary with the ``X-Read-Primary`` header.
+
+Results cached under the current table versions are loaded with
+``read_primary``: a lagging replica would otherwise store rows from before
+the write that bumped them, and serve them to everyone until the next one.
+"""
+import itertools
+import logging
+import time
+from typing import Dict, List, Optional
+
+from fastapi import Request
+from sqlalchemy import Engine, event
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.dml import UpdateBase
+
+logger = logging.getLogger(__name__)
+
+READ_REPLICA = "read_replica"
+READ_PRIMARY_HEADER = "X-Read-Primary"
+# The replica a session reads from, chosen on its first read
+_PINNED_REPLICA = "pinned_replica"
+
+
+class ReplicaSet:
+    """
+    Round-robin over replica engines with passive health checks: a replica
+    that fails to connect or drops a connection is skipped for
+    ``retry_after`` seconds, after which the next read probes it again.
+    """
+
+    def __init__(self, engines: List[Engine], retry_after: float = 30):
+        self.engines = engines
+        self.retry_after = retry_after
+        self._next = itertools.count()
+        self._down_until: Dict[Engine, float] = {}
+
+        for engine in engines:
+            event.listen(engine, "handle_error", self._on_error)
+
+    def _on_error(self, context):
+        # No connection means the connect itself failed
+        if context.is_disconnect or context.connection is None:
+            self.mark_down(context.engine)
+
+    def mark_down(self, engine: Engine):
+        logger.warning(f"Replica {engine.url!r} is unavailable")
+        self._down_until[engine] = time.monotonic() + self.retry_after
+
+    def is_up(self, engine: Engine) -> bool:
+        return self._down_until.get(engine, 0) <= time.monotonic()
+
+    def next(self) -> Optional[Engine]:
+        """The next healthy replica, or None when all of them are down"""
+        for _ in range(len(self.engines)):
+            engine = self.engines[next(self._next) % len(self.engines)]
+            if self.is_up(engine):
+                return engine
+        return None
+
+
+class DatabaseRouter:
+    def __init__(self, primary: Engine, replicas: Optional[ReplicaSet] = None):
+        self.primary = primary
+        self.replicas = replicas
+
+    def bind_for(self, session: Session, clause=None) -> Engine:
+        if not (self.replicas and session.info.get(READ_REPLICA)):
+            return self.primary
+
+        is_write = (
+            isinstance(clause, UpdateBase)
+            or getattr(clause, "_for_update_arg", None) is not None
+        )
+        if is_write:
+            # Sticky: later reads in this session must see the write
+            session.info[READ_REPLICA] = False
+            return self.primary
+
+        replica = session.info.get(_PINNED_REPLICA)
+        if replica is None or not self.replicas.is_up(replica):
+            replica = session.info[_PINNED_REPLICA] = self.replicas.next()
+        return replica or self.primary
+
+
+class RoutingSession(Session):
+    def __init__(self, router: Optional[DatabaseRouter] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.router = router
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self.router is None:
+            return super().get_bind(mapper=mapper, clause=clause, **kwargs)
+        return self.router.bind_for(self, clause)
+
+
+@event.listens_for(RoutingSession, "before_flush")
+def _flush_to_primary(session: Session, _flush_context, _instances):
+    # Only called when there is something to write; the flush and every
+    # later statement of the session go to the primary
+    session.info[READ_REPLICA] = False
+
+
+def read_primary(session: Session):
+    """Send the session's later reads to the primary"""
+    session.info[READ_REPLICA] = False
+
+
+def reads_replica(session: Session) -> bool:
+    """Whether the session's next read may be served by a replica"""
+    router = getattr(session, "router", None)
+    return bool(
+        router
+        and router.replicas
+        and router.replicas.engines
+        and session.info.get(READ_REPLICA)
+    )
+
+
+def route_reads(session: Session, request: Optional[Request] = None):
+    """Let ``session`` read from replicas when ``request`` is a plain GET"""
+    session.info[READ_REPLICA] = (
+        request is not None
+        and request.method in ("GET", "HEAD")
+        and request.headers.get(READ_PRIMARY_HEADER, "").lower()
+        not in ("1", "true", "yes")
+    )
+
+
+__all__ = [
+    "READ_REPLICA",
+    "READ_PRIMARY_HEADER",
+    "ReplicaSet",
+    "DatabaseRouter",
+    "RoutingSession",
+    "read_primary",
+    "reads_replica",
+    "route_reads",
+]
@@ -1,16 +1,65 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
+from typing import Optional
 
+from fastapi import HTTPException, status
 from jose import jwt
-from passlib import context
 
 from app import schema
 from app.core.config import Settings, get_settings
+from app.core.hashing import HashingPoolSaturated, password_hasher
 from app.schema import AccessTokenData
 
-pwd_context = context.CryptContext(schemes=["sha256_crypt"])
 ALGORITHM = "HS256"
 
 
+class TokenCache:
+    """
+    Decoded access tokens keyed by a hash of the token, so repeat requests
+    skip the signature check and JSON parsing. An entry is only good until
+    the token's own ``exp``.
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, AccessTokenData] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[AccessTokenData]:
+        with self._lock:
+            token_data = self._entries.get(key)
+            if token_data is None:
+                return None
+
+            if token_data.exp <= time.time():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return token_data
+
+    def set(self, key: str, token_data: AccessTokenData):
+        with self._lock:
+            self._entries[key] = token_data
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache(get_settings().TOKEN_CACHE_MAX_ENTRIES)
+
+
 def create_access_token(
     subject,
     settings: Settings = get_settings(),
@@ -33,26 +82,45 @@ def decode_access_token(
     token: str | None,
     settings: Settings = get_settings(),
 ) -> AccessTokenData | None:
-    try:
-        if token:
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM])
+    if not token:
+        return None
+
+    key = token_cache.key(token)
+    if token_data := token_cache.get(key):
+        return token_data
 
-            return schema.AccessTokenData(
-                exp=payload["exp"], sub=payload["sub"], payload=payload
-            )
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM])
+        token_data = schema.AccessTokenData(
+            exp=payload["exp"], sub=payload["sub"], payload=payload
+        )
     except Exception:
         return None
 
+    token_cache.set(key, token_data)
+    return token_data
+
+
+def _hashing_saturated() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail={"message": "Too many sign in attempts, please try again shortly"},
+        headers={"Retry-After": "1"},
+    )
+
 
 def hash_password(plain_password: str) -> str:
-    return pwd_context.hash(plain_password)
+    try:
+        return password_hasher.hash(plain_password)
+    except HashingPoolSaturated:
+        raise _hashing_saturated()
 
 
 def verify_password(plain_password, hashed_password) -> bool:
-    return pwd_context.verify(
-        plain_password,
-        hashed_password,
-    )
+    try:
+        return password_hasher.verify(plain_password, hashed_password)
+    except HashingPoolSaturated:
+        raise _hashing_saturated()
 
 
 def create_refresh_token(
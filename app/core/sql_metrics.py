@@ -0,0 +1,148 @@
+"""
+Per-request SQL instrumentation.
+
+``instrument_engine`` hooks an engine's cursor events. While a request is
+tracked (``track_queries``), every statement it runs is recorded with its
+duration and normalized shape, so the request can report its statement
+count, total DB time, slowest statements and statements repeated N times
+(N+1 queries), and how many pooled connections it checked out.
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional, Tuple
+
+from sqlalchemy import Engine, event
+
+from app.core.config import get_settings
+
+logger = logging.getLogger("sql")
+
+_current: ContextVar[Optional["QueryStats"]] = ContextVar("query_stats", default=None)
+
+_WHITESPACE = re.compile(r"\s+")
+# Expanded IN lists and VALUES rows differ in length between calls
+_PARAM_LIST = re.compile(r"\((?:\s*(?:\?|%\(\w+\)s|\$\d+)\s*,?)+\)")
+_LITERAL = re.compile(r"\b\d+\b|'[^']*'")
+
+
+def statement_shape(statement: str) -> str:
+    statement = _WHITESPACE.sub(" ", statement).strip()
+    statement = _PARAM_LIST.sub("(?)", statement)
+    return _LITERAL.sub("?", statement)
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    total_ms: float = 0.0
+    # Connections checked out of a pool, i.e. transactions begun
+    checkouts: int = 0
+    timings: List[Tuple[float, str]] = field(default_factory=list)
+    shapes: Counter = field(default_factory=Counter)
+
+    def record(self, statement: str, elapsed_ms: float):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.timings.append((elapsed_ms, statement))
+        self.shapes[statement_shape(statement)] += 1
+
+    def slowest(self, n: int = 3) -> List[Tuple[float, str]]:
+        return sorted(self.timings, key=lambda t: t[0], reverse=True)[:n]
+
+    @property
+    def max_repeats(self) -> int:
+        return max(self.shapes.values(), default=0)
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """Statement shapes run at least ``threshold`` times, e.g. N+1 loads"""
+        return [(s, n) for s, n in self.shapes.most_common() if n >= threshold]
+
+    def server_timing(self) -> str:
+        return (
+            f'db;dur={self.total_ms:.2f};desc="{self.count} queries", '
+            f'db-repeats;desc="{self.max_repeats}", '
+            f'db-checkouts;desc="{self.checkouts}"'
+        )
+
+    def report(self) -> str:
+        lines = [f"{self.count} statements in {self.total_ms:.1f}ms"]
+        lines += [f"  {n}x {shape[:200]}" for shape, n in self.shapes.most_common()]
+        return "\n".join(lines)
+
+
+def current_stats() -> Optional[QueryStats]:
+    return _current.get()
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    stats = QueryStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+def check_budgets(stats: QueryStats, label: str):
+    """Log statements over the configured count, time and N+1 budgets"""
+    settings = get_settings()
+
+    if stats.count > settings.SQL_QUERY_BUDGET:
+        logger.warning(
+            f"{label}: {stats.count} statements, budget is "
+            f"{settings.SQL_QUERY_BUDGET}\n{stats.report()}"
+        )
+
+    for shape, n in stats.repeated(settings.SQL_REPEAT_THRESHOLD):
+        logger.warning(f"{label}: possible N+1, ran {n}x: {shape[:200]}")
+
+    for elapsed_ms, statement in stats.slowest():
+        if elapsed_ms < settings.SQL_SLOW_QUERY_MS:
+            break
+        logger.warning(f"{label}: slow statement {elapsed_ms:.1f}ms: {statement}")
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_start"].pop()
+    if (stats := _current.get()) is not None:
+        stats.record(statement, (time.perf_counter() - started) * 1000)
+
+
+def _checkout(dbapi_connection, connection_record, connection_proxy):
+    if (stats := _current.get()) is not None:
+        stats.checkouts += 1
+
+
+def _handle_error(context):
+    # after_cursor_execute never runs for a failed statement
+    if context.connection is not None and context.execution_context is not None:
+        if starts := context.connection.info.get("query_start"):
+            starts.pop()
+
+
+def instrument_engine(engine: Engine):
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+        event.listen(engine, "checkout", _checkout)
+
+
+__all__ = [
+    "QueryStats",
+    "statement_shape",
+    "current_stats",
+    "track_queries",
+    "check_budgets",
+    "instrument_engine",
+]
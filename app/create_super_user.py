@@ -1,12 +1,12 @@
 from getpass import getpass
 
-from app.core.database import get_db
+from app.core.database import SessionLocal
 from app.models.user import User
 from app.core.security import hash_password
 
 
 def create_super_user():
-    db = next(get_db())
+    db = SessionLocal()
 
     try:
         email = input("Enter email: ").strip()
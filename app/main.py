@@ -1,6 +1,7 @@
 import logging
 import os
 import time
+from contextlib import asynccontextmanager
 
 from fastapi import (
     FastAPI,
@@ -13,16 +14,23 @@ from fastapi import (
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.utils import get_openapi
-from fastapi.responses import JSONResponse, RedirectResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, RedirectResponse
 from psycopg2 import errors as psycopg2_errors
 from pydantic import ValidationError
 from sqlalchemy.exc import SQLAlchemyError
-from starlette.staticfiles import StaticFiles
+from starlette.concurrency import run_in_threadpool
 
 from app import schema
 from app.core.config import get_settings
-from app.core.database import get_db
+from app.core import metrics, profiling
+from app.core.admission import admission, route_class
+from app.core.database import pool_exhausted
+from app.core.hashing import password_hasher
+from app.core.loop_monitor import LoopMonitorMiddleware, loop_monitor
+from app.core.sql_metrics import check_budgets, current_stats, track_queries
 from app.routes.deps import validate_auth_cookie
+from app.routes.http_cache import MediaFiles
+from app.utils.images import image_processor
 from app.routes.main import router
 from app.routes.swagger import swagger_router
 
@@ -32,7 +40,17 @@ settings = get_settings()
 os.environ["TZ"] = "Africa/Nairobi"
 time.tzset()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    async with loop_monitor.watch():
+        yield
+    password_hasher.shutdown()
+    image_processor.shutdown()
+
+
 app = FastAPI(
+    lifespan=lifespan,
     docs_url=None,
     redoc_url=None,
     openapi_url=None,
@@ -52,7 +70,20 @@ async def openapi(
     if not user:
         return RedirectResponse(url="/docs/login?next_url=/openapi.json")
 
-    return get_openapi(title="FastAPI", version="0.1.0", routes=app.routes)
+    if app.openapi_schema is None:
+        # Walks every route and model, far too slow to run on the event loop
+        app.openapi_schema = await run_in_threadpool(
+            get_openapi, title="FastAPI", version="0.1.0", routes=app.routes
+        )
+    return app.openapi_schema
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail={"message": "Not found"})
+
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
 
 
 @app.exception_handler(RequestValidationError)
@@ -111,19 +142,24 @@ async def http_exception_handler(request: object, exc: HTTPException):
                 detail=exc.detail.get("detail"),
             ),
             status_code=exc.status_code,
+            headers=exc.headers,
         )
 
     return JSONResponse(
         {"detail": {}, "message": exc.detail},
         status_code=exc.status_code,
+        headers=exc.headers,
     )
 
 
 @app.exception_handler(Exception)
 async def generic_exception_handler(request: Request, exc: Exception):
     if isinstance(exc, (SQLAlchemyError, psycopg2_errors.DatabaseError)):
-        db = get_db().__next__()
-        db.rollback()
+        # The request's own sessions, see get_db; not new ones
+        if (db := getattr(request.state, "db", None)) is not None:
+            db.rollback()
+        if (async_db := getattr(request.state, "async_db", None)) is not None:
+            await async_db.rollback()
 
     logging.error(exc, exc_info=exc)
     return JSONResponse(
@@ -135,13 +171,84 @@ async def generic_exception_handler(request: Request, exc: Exception):
     )
 
 
+# Innermost, see LoopMonitorMiddleware
+app.add_middleware(LoopMonitorMiddleware)
+
+
+@app.middleware("http")
+async def request_profiler(request: Request, call_next):
+    if not profiling.profiling_requested(request.headers):
+        return await call_next(request)
+
+    started = time.perf_counter()
+    with profiling.request_profiler() as profiler:
+        response = await call_next(request)
+        # Drain the body so its rendering is part of the profile
+        body = b"".join([chunk async for chunk in response.body_iterator])
+
+    title = (
+        f"{request.method} {metrics.route_label(request.scope)} "
+        f"-> {response.status_code} ({len(body)} bytes)"
+    )
+    report = profiler.report(title, time.perf_counter() - started, current_stats())
+    return PlainTextResponse(report, headers={"X-Profiled": "1"})
+
+
+@app.middleware("http")
+async def sql_metrics(request: Request, call_next):
+    with track_queries() as stats:
+        response = await call_next(request)
+
+    check_budgets(stats, f"{request.method} {request.url.path}")
+    metrics.db_pool_checkouts_per_request.observe(stats.checkouts)
+    if settings.SERVER_TIMING_ENABLED:
+        response.headers.append("Server-Timing", stats.server_timing())
+    return response
+
+
+@app.middleware("http")
+async def admission_control(request: Request, call_next):
+    name = route_class(
+        request.method, request.url.path, request.headers.get("content-type")
+    )
+    if name is None or not settings.ADMISSION_CONTROL_ENABLED:
+        return await call_next(request)
+
+    if not admission.admit(name):
+        return await http_exception_handler(request, pool_exhausted())
+    try:
+        return await call_next(request)
+    finally:
+        admission.release(name)
+
+
+@app.middleware("http")
+async def request_metrics(request: Request, call_next):
+    metrics.http_requests_in_flight.inc()
+    started = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        metrics.http_requests_in_flight.dec()
+        route = metrics.route_label(request.scope)
+        metrics.http_request_duration_seconds.observe(
+            time.perf_counter() - started, method=request.method, route=route
+        )
+        metrics.http_requests_total.inc(
+            method=request.method, route=route, status=status_code
+        )
+
+
 media_dir = os.path.join(os.getcwd(), settings.MEDIA_BASE)
 if not os.path.exists(media_dir):
     os.mkdir(media_dir)
 
 app.mount(
     "/media",
-    StaticFiles(directory=media_dir),
+    MediaFiles(directory=media_dir),
     name="media",
 )
 
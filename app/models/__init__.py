@@ -4,6 +4,7 @@ from .activity import Activity
 from .blog import Blog
 from .destination import Destination, destination_hotels
 from .hotel import HotelReview, Hotel
+from .media import MediaBlob, MediaReference, MediaUpload
 from .setups import Country, City
 from .user import User
 from .tour_booking import  TourBooking
@@ -21,4 +22,7 @@ __all__ = [
     "TourDay",
     "tour_day_activities",
     "Blog",
+    "MediaBlob",
+    "MediaReference",
+    "MediaUpload",
 ]
@@ -4,19 +4,22 @@ from sqlalchemy import String, Text, Boolean
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.models.base import BaseDBModel
+from app.models.media import media_relationship
 from . import TourDay
 
 if TYPE_CHECKING:
-    pass
+    from .media import MediaBlob
 
 
 class Activity(BaseDBModel):
     __tablename__ = "activities"
+    __media_fields__ = ("image",)
 
     title: Mapped[str] = mapped_column(String(255), nullable=False)
     type: Mapped[str] = mapped_column(String(100), nullable=False)
     description: Mapped[str] = mapped_column(Text, nullable=True)
     image: Mapped[str] = mapped_column(String(500), nullable=True)
+    media: Mapped[list["MediaBlob"]] = media_relationship("Activity", "activities")
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
 
     tour_days: Mapped[list["TourDay"]] = relationship(
@@ -6,6 +6,7 @@ from app.models.base import BaseDBModel
 
 class Blog(BaseDBModel):
     __tablename__ = "blogs"
+    __media_fields__ = ("image",)
 
     title: Mapped[str] = mapped_column(String(255), nullable=False, index=True)
     slug: Mapped[str] = mapped_column(
@@ -4,19 +4,27 @@ from sqlalchemy import String, Text, JSON, ForeignKey, Table, Column
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.models.base import BaseDBModel, metadata
+from app.models.media import media_relationship
+from app.models.search import register_search_index
 from .hotel import Hotel
 
 if TYPE_CHECKING:
+    from .media import MediaBlob
     from .setups import City
     from .tour import Tour
 
 
 class Destination(BaseDBModel):
     __tablename__ = "destinations"
+    __search_fields__ = ("name", "description")
+    __media_fields__ = ("image",)
 
     name: Mapped[str] = mapped_column(String(255), nullable=False, index=True)
     description: Mapped[str] = mapped_column(Text, nullable=True)
     image: Mapped[str] = mapped_column(String(500), nullable=True)
+    media: Mapped[list["MediaBlob"]] = media_relationship(
+        "Destination", "destinations"
+    )
     slug: Mapped[str] = mapped_column(String(255), nullable=False, index=True)
     highlights: Mapped[list[str]] = mapped_column(JSON, nullable=True)
     visitor_info: Mapped[dict] = mapped_column(JSON, nullable=True)
@@ -36,6 +44,9 @@ class Destination(BaseDBModel):
         return f"<Destination(id={self.id}, name='{self.name}')>"
 
 
+register_search_index(Destination)
+
+
 destination_hotels = Table(
     "destination_hotels",
     metadata,
@@ -5,13 +5,18 @@ from sqlalchemy import String, Integer, Float, Text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.models.base import BaseDBModel
+from app.models.media import media_relationship
+from app.models.search import register_search_index
 
 if TYPE_CHECKING:
+    from .media import MediaBlob
     from .setups import City
 
 
 class Hotel(BaseDBModel):
     __tablename__ = "hotels"
+    __search_fields__ = ("name", "description")
+    __media_fields__ = ("images",)
     name: Mapped[str] = mapped_column(String(255), nullable=False, index=True)
 
     category: Mapped[str] = mapped_column(String(100), nullable=True, index=True)
@@ -23,6 +28,7 @@ class Hotel(BaseDBModel):
     max_guests: Mapped[int] = mapped_column(Integer, default=2, nullable=True)
     amenities: Mapped[list[str]] = mapped_column(JSON, nullable=True)
     images: Mapped[list[str]] = mapped_column(JSON, nullable=True)
+    media: Mapped[list["MediaBlob"]] = media_relationship("Hotel", "hotels")
     is_active: Mapped[bool] = mapped_column(
         default=True, index=True, server_default="True"
     )
@@ -40,6 +46,9 @@ class Hotel(BaseDBModel):
         return f"<Hotel(id={self.id}, name='{self.name}')>"
 
 
+register_search_index(Hotel)
+
+
 class HotelReview(BaseDBModel):
     __tablename__ = "hotel_reviews"
 
@@ -0,0 +1,110 @@
+"""
+Uploaded media and what uses it.
+
+A ``MediaBlob`` is one stored object, keyed by its content hash. Models
+list the columns holding media URLs in ``__media_fields__``; a
+``MediaReference`` row is kept per blob and owning row, so blobs nothing
+refers to any more can be found and garbage-collected. Through those
+references ``media_relationship`` maps the blobs a row uses; repositories
+load it with the rows their load profiles render, so schemas know whether
+an image's derivatives exist without a lookup. A
+``MediaUpload`` tracks a chunked upload, from its first part until it is
+stored as a blob.
+"""
+import math
+from typing import Optional
+
+from sqlalchemy import (
+    JSON,
+    BigInteger,
+    Boolean,
+    ForeignKey,
+    Integer,
+    String,
+    UniqueConstraint,
+    false,
+)
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+
+from app.models.base import BaseDBModel
+
+
+class MediaBlob(BaseDBModel):
+    __tablename__ = "media_blobs"
+
+    key: Mapped[str] = mapped_column(String(255), nullable=False, unique=True)
+    sha256: Mapped[str] = mapped_column(String(64), nullable=False, index=True)
+    size: Mapped[int] = mapped_column(Integer, nullable=False)
+    content_type: Mapped[str] = mapped_column(String(255), nullable=True)
+    # Set once every derivative of the image is stored (app.utils.images),
+    # with the widths they were rendered at: never wider than the original
+    variants_ready: Mapped[bool] = mapped_column(
+        Boolean, default=False, server_default=false(), nullable=False
+    )
+    variant_widths: Mapped[Optional[list[int]]] = mapped_column(JSON, nullable=True)
+
+    def __repr__(self):
+        return f"<MediaBlob(id={self.id}, key='{self.key}')>"
+
+
+class MediaReference(BaseDBModel):
+    __tablename__ = "media_references"
+    __table_args__ = (UniqueConstraint("blob_id", "owner_table", "owner_id"),)
+
+    blob_id: Mapped[int] = mapped_column(
+        ForeignKey("media_blobs.id"), nullable=False, index=True
+    )
+    owner_table: Mapped[str] = mapped_column(String(100), nullable=False)
+    owner_id: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    def __repr__(self):
+        return (
+            f"<MediaReference(blob_id={self.blob_id}, "
+            f"owner='{self.owner_table}:{self.owner_id}')>"
+        )
+
+
+def media_relationship(owner: str, table: str):
+    """The blobs the ``__media_fields__`` of ``owner`` refer to, read-only"""
+    return relationship(
+        "MediaBlob",
+        secondary="media_references",
+        primaryjoin=(
+            f"and_({owner}.id == foreign(media_references.c.owner_id), "
+            f"media_references.c.owner_table == '{table}')"
+        ),
+        secondaryjoin="MediaBlob.id == foreign(media_references.c.blob_id)",
+        viewonly=True,
+        # Only loaded through load profiles, where a handful of blobs per
+        # row are cheaper joined than fetched with a statement of their own
+        info={"eager": "joined"},
+    )
+
+
+class MediaUpload(BaseDBModel):
+    __tablename__ = "media_uploads"
+
+    filename: Mapped[str] = mapped_column(String(255), nullable=False)
+    content_type: Mapped[str] = mapped_column(String(255), nullable=True)
+    size: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    # Of the whole file, checked once the parts are assembled
+    sha256: Mapped[str] = mapped_column(String(64), nullable=False)
+    chunk_size: Mapped[int] = mapped_column(Integer, nullable=False)
+    # Parts acknowledged so far, always a prefix: the client resumes here
+    received: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    part_checksums: Mapped[list[str]] = mapped_column(JSON, default=list)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
+    blob_id: Mapped[Optional[int]] = mapped_column(
+        ForeignKey("media_blobs.id"), nullable=True
+    )
+    blob: Mapped[Optional["MediaBlob"]] = relationship("MediaBlob")
+
+    @property
+    def parts(self) -> int:
+        return math.ceil(self.size / self.chunk_size)
+
+    def __repr__(self):
+        return f"<MediaUpload(id={self.id}, filename='{self.filename}')>"
+
+
+__all__ = ["MediaBlob", "MediaReference", "media_relationship", "MediaUpload"]
@@ -0,0 +1,96 @@
+"""
+Full-text search indexes.
+
+On Postgres every searchable model gets a GIN index over a ``tsvector``
+expression of its ``__search_fields__`` plus a ``pg_trgm`` GIN index per
+field for fuzzy/substring matching. On SQLite (local/test) an external
+content FTS5 table ``<table>_fts`` is kept in sync with triggers.
+"""
+from typing import Sequence, Type
+
+from sqlalchemy import DDL, Index, event, func, text as sql_text
+from sqlalchemy.dialects import postgresql  # noqa: F401 registers to_tsvector()
+from sqlalchemy.sql.elements import ColumnElement
+
+from app.models.base import BaseDBModel
+
+TS_CONFIG = "simple"
+
+
+def search_document(model: Type[BaseDBModel], fields: Sequence[str]) -> ColumnElement:
+    """
+    The tsvector expression for ``fields``. Queries must build it exactly
+    like the index does for Postgres to use the GIN index.
+    """
+    # Literals are text() rather than literal_column() so that Index() can
+    # still resolve the table from the columns in the expression
+    text = None
+    for field in fields:
+        column = func.coalesce(model.__table__.c[field], sql_text("''"))
+        if text is not None:
+            column = text.op("||")(sql_text("' '")).op("||")(column)
+        text = column
+
+    return func.to_tsvector(sql_text(f"'{TS_CONFIG}'::regconfig"), text)
+
+
+def fts_table(model: Type[BaseDBModel]) -> str:
+    return f"{model.__tablename__}_fts"
+
+
+def register_search_index(model: Type[BaseDBModel]):
+    table = model.__tablename__
+    fields = model.__search_fields__
+
+    # Postgres: tsvector + trigram GIN indexes
+    Index(
+        f"ix_{table}_search",
+        search_document(model, fields),
+        postgresql_using="gin",
+    ).ddl_if(dialect="postgresql")
+    for field in fields:
+        Index(
+            f"ix_{table}_{field}_trgm",
+            getattr(model, field),
+            postgresql_using="gin",
+            postgresql_ops={field: "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql")
+
+    # SQLite: FTS5 external content table synced by triggers
+    fts = fts_table(model)
+    columns = ", ".join(fields)
+    new_values = ", ".join(f"new.{f}" for f in fields)
+    old_values = ", ".join(f"old.{f}" for f in fields)
+    statements = [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} "
+        f"USING fts5({columns}, content='{table}', content_rowid='id')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {columns}) "
+        f"VALUES ('delete', old.id, {old_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {columns}) "
+        f"VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new_values}); END",
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+    for statement in statements:
+        event.listen(
+            model.__table__,
+            "after_create",
+            DDL(statement).execute_if(dialect="sqlite"),
+        )
+    event.listen(
+        model.__table__,
+        "before_drop",
+        DDL(f"DROP TABLE IF EXISTS {fts}").execute_if(dialect="sqlite"),
+    )
+
+
+__all__ = [
+    "search_document",
+    "fts_table",
+    "register_search_index",
+    "TS_CONFIG",
+]
@@ -4,6 +4,7 @@ from sqlalchemy import String, ForeignKey
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.models.base import BaseDBModel
+from app.models.search import register_search_index
 
 if TYPE_CHECKING:
     from .destination import Destination
@@ -25,6 +26,7 @@ class Country(BaseDBModel):
 
 class City(BaseDBModel):
     __tablename__ = "cities"
+    __search_fields__ = ("name",)
 
     name: Mapped[str] = mapped_column(String(255), nullable=False, index=True)
     country_id: Mapped[int] = mapped_column(ForeignKey("countries.id"), nullable=False)
@@ -36,3 +38,6 @@ class City(BaseDBModel):
 
     def __repr__(self):
         return f"<City(id={self.id}, name='{self.name}')>"
+
+
+register_search_index(City)
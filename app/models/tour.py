@@ -13,11 +13,14 @@ from sqlalchemy import (
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.models.base import BaseDBModel, metadata
+from app.models.media import media_relationship
+from app.models.search import register_search_index
 
 if TYPE_CHECKING:
     from .destination import Destination
     from .hotel import Hotel
     from .activity import Activity
+    from .media import MediaBlob
 
 
 # Many-to-many association table between TourDay and Activity
@@ -39,6 +42,8 @@ tour_day_activities = Table(
 
 class Tour(BaseDBModel):
     __tablename__ = "tours"
+    __search_fields__ = ("title", "overview")
+    __media_fields__ = ("image_url",)
 
     title: Mapped[str] = mapped_column(String(255), nullable=False, index=True)
     overview: Mapped[str] = mapped_column(Text, nullable=True)
@@ -48,6 +53,7 @@ class Tour(BaseDBModel):
     reviews: Mapped[int] = mapped_column(Integer, default=0)
     max_participants: Mapped[int] = mapped_column(Integer, default=20)
     image_url: Mapped[str] = mapped_column(String(500), nullable=True)
+    media: Mapped[list["MediaBlob"]] = media_relationship("Tour", "tours")
     slug: Mapped[str] = mapped_column(String(255), nullable=False, index=True)
 
     # JSON fields
@@ -80,6 +86,9 @@ class Tour(BaseDBModel):
         super().__init__(*args, **kwargs)
 
 
+register_search_index(Tour)
+
+
 class TourDay(BaseDBModel):
     __tablename__ = "tour_days"
 
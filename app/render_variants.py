@@ -0,0 +1,39 @@
+import asyncio
+import logging
+import sys
+
+from app.core.database import SessionLocal
+from app.repository.media import media_repository
+from app.utils.images import image_processor
+from app.utils.storage import get_storage
+
+logger = logging.getLogger(__name__)
+
+
+def render_variants() -> bool:
+    """
+    Render the derivatives of images whose rendering failed or never ran.
+    False when some of them failed again.
+    """
+    db = SessionLocal()
+    try:
+        blobs = media_repository.missing_variants(db)
+    finally:
+        db.close()
+
+    urls = [get_storage().url(blob.key, True) for blob in blobs]
+    try:
+        ready = asyncio.run(media_repository.generate_variants(urls, SessionLocal))
+    finally:
+        image_processor.shutdown()
+
+    logger.info(f"Rendered the derivatives of {len(ready)} of {len(urls)} images")
+    if failed := [blob.key for blob in blobs if blob.key not in ready]:
+        logger.error(f"Failed to render the derivatives of: {', '.join(failed)}")
+        return False
+    return True
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(0 if render_variants() else 1)
@@ -1,9 +1,11 @@
 from app.models.activity import Activity
-from app.repository.base import BaseRepository
+from app.repository.base import BaseRepository, LoadProfile
 from app.schema.activity import ActivityCreate, ActivityUpdate
 
 
 class ActivityRepository(BaseRepository[Activity, ActivityCreate, ActivityUpdate]):
+    # schema.Activity
+    load_profiles = {profile: ((Activity.media,),) for profile in LoadProfile}
 
     def __init__(self):
         super().__init__(Activity)
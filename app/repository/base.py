@@ -1,15 +1,56 @@
+import base64
+import json
 import logging
-from datetime import datetime
+from datetime import date, datetime
+from decimal import Decimal
 from enum import Enum
-from typing import Any, Dict, Generic, Optional, Type, TypeVar, List
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Generic,
+    Optional,
+    Type,
+    TypeVar,
+    List,
+    Sequence,
+    Tuple,
+)
 
 from fastapi import HTTPException, status
 from pydantic import BaseModel, ValidationError
-from sqlalchemy import or_
+from sqlalchemy import and_, or_, func, insert, select, union_all, update
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import (
+    QueryableAttribute,
+    RelationshipProperty,
+    Session,
+    Query,
+    aliased,
+    joinedload,
+    selectinload,
+)
+from sqlalchemy.orm.interfaces import LoaderOption
 
+from app.core.routing import read_primary, reads_replica
 from app.models.base import BaseDBModel
+from app.repository.cache import (
+    aget_or_render,
+    get_query_cache,
+    query_cache_key,
+)
+from app.repository.counts import (
+    CountStrategy,
+    count_cache,
+    count_cache_key,
+    query_tables,
+    estimate_count,
+)
+from app.repository.references import sync_media_references
+from app.repository.search import get_search_backend
 from app.schema import SortModel, SortOrder
 from app.utils.utils import calculate_total_pages
 
@@ -17,12 +58,54 @@ Model = TypeVar("Model", bound=BaseDBModel)
 CreateSchema = TypeVar("CreateSchema", bound=BaseModel)
 UpdateSchema = TypeVar("UpdateSchema", bound=BaseModel)
 
+BULK_MAX_ITEMS = 5000
+
+# Dialect INSERT constructs that support ON CONFLICT
+upsert_inserts = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
 
 class AuditAction(str, Enum):
     CREATE = "CREATE"
     UPDATE = "UPDATE"
     DELETE = "DELETE"
     READ = "READ"
+    BULK_CREATE = "BULK_CREATE"
+    BULK_UPDATE = "BULK_UPDATE"
+    BULK_UPSERT = "BULK_UPSERT"
+
+
+class LoadProfile(str, Enum):
+    """
+    Named eager-loading profiles. Each one matches the response schema a
+    route renders, e.g. ``LIST`` for ``Pagination[schema.Tour]`` and
+    ``DETAIL`` for ``schema.TourDetailed``.
+    """
+
+    LIST = "list"
+    DETAIL = "detail"
+
+
+# Relationships followed from the model, e.g. (Tour.destination, Destination.city)
+LoadPath = Tuple[QueryableAttribute, ...]
+
+
+def path_options(paths: Sequence[LoadPath]) -> Tuple[LoaderOption, ...]:
+    """
+    Eager loads for ``paths``: collections with selectinload unless they
+    ask to be joined (``info={"eager": "joined"}``), the rest joined
+    """
+    options = []
+    for path in paths:
+        option = None
+        for attribute in path:
+            prop = attribute.property
+            joined = not prop.uselist or prop.info.get("eager") == "joined"
+            load = joinedload if joined else selectinload
+            if option is not None:
+                load = getattr(option, load.__name__)
+            option = load(attribute)
+        options.append(option)
+    return tuple(options)
 
 
 class SearchModel:
@@ -31,22 +114,390 @@ class SearchModel:
         self.search_fields = search_fields
 
 
-def get_object_or_404(db: Session, model: Type[Model], **kwargs) -> Model:
-    obj = db.query(model).filter_by(**kwargs).first()
-    if obj:
-        return obj
-
-    raise HTTPException(
+def not_found(model: Type[Model]) -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_404_NOT_FOUND,
         detail={"message": f"{model.__name__} not found"},
     )
 
 
+def get_object_or_404(
+    db: Session,
+    model: Type[Model],
+    options: Sequence[LoaderOption] = (),
+    **kwargs,
+) -> Model:
+    obj = db.query(model).options(*options).filter_by(**kwargs).first()
+    if obj:
+        return obj
+
+    raise not_found(model)
+
+
 class BaseRepository(Generic[Model, CreateSchema, UpdateSchema]):
+    # Relationship paths per profile, eager loaded on reads so that rendering
+    # the response schema does not lazy load relationships row by row. They
+    # are also the tables a cached read depends on.
+    load_profiles: Dict[LoadProfile, Sequence[LoadPath]] = {}
+
+    # Columns with a unique constraint that bulk_upsert conflicts on
+    upsert_keys: Sequence[str] = ()
+
     def __init__(self, model: Type[Model]):
         self.model = model
         self.logger = logging.getLogger(f"{model.__name__}Repository")
 
+    def loader_options(
+        self, profile: Optional[LoadProfile | str] = None
+    ) -> Sequence[LoaderOption]:
+        if not profile:
+            return ()
+        return path_options(self.load_profiles.get(LoadProfile(profile), ()))
+
+    def profile_paths(
+        self, profile: Optional[LoadProfile | str] = None
+    ) -> List[Tuple[RelationshipProperty, ...]]:
+        """Every relationship path, from the model, that ``profile`` loads"""
+        paths = set()
+        for path in self.load_profiles.get(LoadProfile(profile), ()) if profile else ():
+            props = tuple(attribute.property for attribute in path)
+            paths.update(props[:i] for i in range(1, len(props) + 1))
+        return sorted(paths, key=lambda path: [prop.key for prop in path])
+
+    def cache_tables(self, profile: Optional[LoadProfile | str] = None) -> List[str]:
+        """Tables a read with ``profile`` depends on, for cache invalidation"""
+        tables = {self.model.__tablename__}
+        for path in self.profile_paths(profile):
+            prop = path[-1]
+            tables.add(prop.mapper.local_table.name)
+            if prop.secondary is not None:
+                tables.add(prop.secondary.name)
+        return sorted(tables)
+
+    def graph_stamp(
+        self,
+        db: Session,
+        profile: Optional[LoadProfile | str] = LoadProfile.DETAIL,
+        **kwargs,
+    ) -> Optional[Tuple[int, Any, int]]:
+        """
+        ``(id, max updated_at, member count)`` of the object matching
+        ``kwargs`` and everything ``profile`` loads with it, in one query.
+        Editing any member moves updated_at; adding or removing a member or
+        a link moves the count. None when the object does not exist.
+        """
+        root = self.model
+        where = [getattr(root, k) == v for k, v in kwargs.items()]
+
+        branches = [select(root.id, root.updated_at).where(*where)]
+        for path in self.profile_paths(profile):
+            parent, joins = root, []
+            for prop in path:
+                target = aliased(prop.mapper.class_)
+                joins.append(getattr(parent, prop.key).of_type(target))
+                parent = target
+
+            branch = select(root.id, parent.updated_at)
+            for join in joins:
+                branch = branch.join(join)
+            branches.append(branch.where(*where))
+
+        members = union_all(*branches).subquery()
+        columns = list(members.c)
+        id, updated_at, count = db.execute(
+            select(func.max(columns[0]), func.max(columns[1]), func.count())
+        ).one()
+        if not count:
+            return None
+        return id, updated_at, count
+
+    def _detail_version(
+        self,
+        schema: Type[BaseModel],
+        stamp: Optional[Tuple[int, Any, int]],
+        versions: List[int],
+    ) -> Tuple[int, str]:
+        if stamp is None:
+            raise not_found(self.model)
+
+        id, updated_at, count = stamp
+        parts = [self.model.__tablename__, schema.__name__, id, updated_at, count]
+        return id, ":".join(map(str, parts + versions))
+
+    def _list_version(self, parts: List[Any], versions: List[int]) -> str:
+        return ":".join(map(str, parts + versions))
+
+    def _list_stamp(
+        self,
+        db: Session,
+        limit: Optional[int] = None,
+        page: Optional[int] = None,
+        search: Optional[SearchModel] = None,
+        sort: Optional[SortModel] = None,
+        after: Optional[str] = None,
+        with_count: bool = True,
+        **filters,
+    ) -> List[Any]:
+        """The parts of alist_version that come from the request and database"""
+        table = self.model.__tablename__
+        query = self._filter_search_query(db, search=search, **filters)
+        query = query.order_by(None)
+        counted = with_count and not after
+
+        if known := self._known_count(db, query, counted, search, **filters):
+            count, _ = known
+            updated_at = query.with_entities(func.max(self.model.updated_at)).scalar()
+        else:
+            # Counted with the same aggregate, and cached for the page that
+            # follows so it is not counted twice
+            versions = count_cache.versions(query_tables(query))
+            updated_at, count = query.with_entities(
+                func.max(self.model.updated_at), func.count(self.model.id)
+            ).one()
+            if not reads_replica(db):
+                key = count_cache_key(table, search, filters)
+                count_cache.set(key, count, versions)
+
+        params = json.dumps(
+            self._page_params(limit, page, search, sort, after, with_count, **filters),
+            sort_keys=True,
+            default=str,
+        )
+        return [table, params, updated_at, count]
+
+    # Async reads. The sync implementations run over the AsyncSession's
+    # connection with run_sync, so the event loop is never blocked on the
+    # database and both paths share one implementation. Results must be
+    # fully loaded by the load profile: lazy loads fail outside run_sync.
+    # Only ORM work goes through run_sync, which runs on the loop: cache and
+    # version lookups are awaited around it, from a worker thread.
+
+    async def aget(
+        self,
+        db: AsyncSession,
+        id: int,
+        profile: Optional[LoadProfile | str] = None,
+        cached: bool = False,
+    ) -> Optional[Model]:
+        def load():
+            return db.run_sync(self.get, id, profile=profile)
+
+        if cached:
+            return await self._acached(db, "get", profile, {"id": id}, load)
+        return await load()
+
+    async def aget_object_or_404(
+        self,
+        db: AsyncSession,
+        profile: Optional[LoadProfile | str] = None,
+        cached: bool = False,
+        **kwargs,
+    ) -> Model:
+        if not cached:
+            return await db.run_sync(self.get_object_or_404, profile=profile, **kwargs)
+
+        obj = await self._acached(
+            db,
+            "get_object_or_404",
+            profile,
+            kwargs,
+            lambda: db.run_sync(self._first, profile, **kwargs),
+        )
+        if obj is None:
+            raise not_found(self.model)
+        return obj
+
+    async def aget_all(self, db: AsyncSession, **kwargs) -> list:
+        return await db.run_sync(self.get_all, **kwargs)
+
+    async def aget_all_paginated(
+        self,
+        db: AsyncSession,
+        limit: Optional[int] = 20,
+        page: Optional[int] = 1,
+        search: Optional[SearchModel] = None,
+        sort: Optional[SortModel] = None,
+        profile: Optional[LoadProfile | str] = LoadProfile.LIST,
+        after: Optional[str] = None,
+        with_count: bool = True,
+        cached: bool = False,
+        **filters,
+    ) -> dict:
+        loaded = []
+
+        def load():
+            loaded.append(True)
+            return db.run_sync(
+                self.get_all_paginated,
+                limit=limit,
+                page=page,
+                search=search,
+                sort=sort,
+                profile=profile,
+                after=after,
+                with_count=with_count,
+                **filters,
+            )
+
+        if not cached:
+            return await load()
+
+        params = self._page_params(
+            limit, page, search, sort, after, with_count, **filters
+        )
+        result = await self._acached(
+            db, "get_all_paginated", profile, params, load
+        )
+        if not loaded and result["count"] is not None:
+            result["count_strategy"] = CountStrategy.CACHED
+        return result
+
+    async def alist_version(
+        self,
+        db: AsyncSession,
+        profile: Optional[LoadProfile | str] = LoadProfile.LIST,
+        **kwargs,
+    ) -> str:
+        """
+        Version of the page ``aget_all_paginated`` renders for the same
+        arguments: the paging parameters, max updated_at of the matching
+        rows, their total as the page reports it (cached, estimated or
+        skipped) and the versions of the tables ``profile`` renders.
+        """
+        parts = await db.run_sync(self._list_stamp, **kwargs)
+        versions = await get_query_cache().aversions(self.cache_tables(profile))
+        return self._list_version(parts, versions)
+
+    async def adetail_version(
+        self,
+        db: AsyncSession,
+        schema: Type[BaseModel],
+        profile: Optional[LoadProfile | str] = LoadProfile.DETAIL,
+        **kwargs,
+    ) -> Tuple[int, str]:
+        """
+        ``(id, version)`` of the ``schema`` rendering of the object matching
+        ``kwargs``, without loading it. The version changes whenever the
+        graph_stamp or a table version does (the latter catches writes
+        within the same second on SQLite).
+        """
+        stamp = await db.run_sync(self.graph_stamp, profile, **kwargs)
+        versions = await get_query_cache().aversions(self.cache_tables(profile))
+        return self._detail_version(schema, stamp, versions)
+
+    async def arender_detail(
+        self,
+        db: AsyncSession,
+        schema: Type[BaseModel],
+        id: int,
+        version: str,
+        profile: Optional[LoadProfile | str] = LoadProfile.DETAIL,
+    ) -> bytes:
+        """
+        The JSON body of ``schema`` for object ``id`` at ``version``. Bodies
+        are cached until the version changes; concurrent misses for the same
+        body in this process share a single build.
+        """
+
+        async def render() -> bytes:
+            read_primary(db)
+            obj = await self.aget_object_or_404(db, profile=profile, id=id)
+            return schema.model_validate(obj).model_dump_json().encode()
+
+        return await aget_or_render(version, render)
+
+    def _cached(
+        self,
+        db: Session,
+        method: str,
+        profile: Optional[LoadProfile | str],
+        params: Dict[str, Any],
+        load: Callable[[], Any],
+    ):
+        """
+        Serve ``load()`` from the query cache. Results are detached copies,
+        so only use it for reads that are rendered, never for objects that
+        are about to be modified. Misses are loaded from the primary.
+        """
+
+        def load_primary():
+            read_primary(db)
+            return load()
+
+        key = self._cache_key(method, profile, params)
+        return get_query_cache().get_or_load(
+            key, self.cache_tables(profile), load_primary
+        )
+
+    async def _acached(
+        self,
+        db: AsyncSession,
+        method: str,
+        profile: Optional[LoadProfile | str],
+        params: Dict[str, Any],
+        load: Callable[[], Awaitable[Any]],
+    ):
+        """_cached() for async reads"""
+
+        def load_primary():
+            read_primary(db)
+            return load()
+
+        key = self._cache_key(method, profile, params)
+        return await get_query_cache().aget_or_load(
+            key, self.cache_tables(profile), load_primary
+        )
+
+    def _cache_key(
+        self,
+        method: str,
+        profile: Optional[LoadProfile | str],
+        params: Dict[str, Any],
+    ) -> str:
+        profile = LoadProfile(profile).value if profile else None
+        return query_cache_key(
+            self.model.__tablename__, method, {**params, "profile": profile}
+        )
+
+    @staticmethod
+    def _cache_params(
+        search: Optional[SearchModel] = None,
+        sort: Optional[SortModel] = None,
+        **filters,
+    ) -> Dict[str, Any]:
+        return {
+            "search": (
+                [search.search_query, sorted(search.search_fields)]
+                if search and search.search_query
+                else None
+            ),
+            "sort": [sort.sort, str(sort.direction)] if sort else None,
+            "filters": {
+                k: sorted(v, key=str) if isinstance(v, list) else v
+                for k, v in filters.items()
+            },
+        }
+
+    @classmethod
+    def _page_params(
+        cls,
+        limit: Optional[int],
+        page: Optional[int],
+        search: Optional[SearchModel],
+        sort: Optional[SortModel],
+        after: Optional[str],
+        with_count: bool,
+        **filters,
+    ) -> Dict[str, Any]:
+        """Everything a page of ``get_all_paginated`` depends on"""
+        return {
+            **cls._cache_params(search, sort, **filters),
+            "limit": limit,
+            "page": page,
+            "after": after,
+            "with_count": with_count,
+        }
+
     def log_audit(
         self,
         action: AuditAction | str,
@@ -59,11 +510,52 @@ class BaseRepository(Generic[Model, CreateSchema, UpdateSchema]):
             f"User={audit_user_id} Details={details}"
         )
 
-    def get(self, db: Session, id: int) -> Optional[Model]:
-        return db.query(self.model).filter_by(id=id).first()
+    def get(
+        self,
+        db: Session,
+        id: int,
+        profile: Optional[LoadProfile | str] = None,
+        cached: bool = False,
+    ) -> Optional[Model]:
+        def load():
+            return (
+                db.query(self.model)
+                .options(*self.loader_options(profile))
+                .filter_by(id=id)
+                .first()
+            )
+
+        if cached:
+            return self._cached(db, "get", profile, {"id": id}, load)
+        return load()
 
-    def get_object_or_404(self, db: Session, **kwargs) -> Model:
-        return get_object_or_404(db, self.model, **kwargs)
+    def get_object_or_404(
+        self,
+        db: Session,
+        profile: Optional[LoadProfile | str] = None,
+        cached: bool = False,
+        **kwargs,
+    ) -> Model:
+        options = self.loader_options(profile)
+        if not cached:
+            return get_object_or_404(db, self.model, options=options, **kwargs)
+
+        obj = self._cached(
+            db,
+            "get_object_or_404",
+            profile,
+            kwargs,
+            lambda: self._first(db, profile, **kwargs),
+        )
+        if obj is None:
+            raise not_found(self.model)
+        return obj
+
+    def _first(
+        self, db: Session, profile: Optional[LoadProfile | str] = None, **kwargs
+    ) -> Optional[Model]:
+        options = self.loader_options(profile)
+        return self.filter_by(db, **kwargs).options(*options).first()
 
     def filter_by(self, db: Session, **kwargs) -> Query:
         return db.query(self.model).filter_by(**kwargs)
@@ -98,27 +590,130 @@ class BaseRepository(Generic[Model, CreateSchema, UpdateSchema]):
                 )
 
         # Apply search query
-        if search and search.search_query:
-            search_filters = []
-            for field in search.search_fields:
-                if hasattr(self.model, field):
-                    col = getattr(self.model, field)
-                    search_filters.append(col.ilike(f"%{search.search_query}%"))
-            if search_filters:
-                conditions.append(or_(*search_filters))
+        search_condition, relevance = self._search(db, search)
+        if search_condition is not None:
+            conditions.append(search_condition)
 
         query = query.filter(*conditions)
 
-        # Apply sorting
+        return self._apply_sort(query, sort, relevance)
+
+    def _sort_column(self, sort: Optional[SortModel] = None):
         if sort and hasattr(self.model, sort.sort):
-            column = getattr(self.model, sort.sort)
-            query = query.order_by(
-                column.desc() if sort.direction == SortOrder.desc else column.asc()
+            return getattr(self.model, sort.sort), sort.direction == SortOrder.desc
+        return None, True
+
+    def _search(self, db: Session, search: Optional[SearchModel] = None):
+        """Search condition and relevance ordering from the dialect's backend"""
+        if not (search and search.search_query):
+            return None, None
+        return get_search_backend(db).match(self.model, search)
+
+    def _apply_sort(
+        self, query: Query, sort: Optional[SortModel] = None, relevance=None
+    ) -> Query:
+        column, descending = self._sort_column(sort)
+
+        # id is always the tie-breaker so that the order is total and
+        # keyset cursors can resume from an exact row. NULLs sort last in
+        # either direction, as _keyset_condition expects
+        order = [self.model.id.desc() if descending else self.model.id.asc()]
+        if column is not None:
+            ordered = column.desc() if descending else column.asc()
+            order.insert(0, ordered.nulls_last())
+
+        # Search results are ranked by relevance first
+        if relevance is not None:
+            order.insert(0, relevance)
+
+        return query.order_by(*order)
+
+    def _encode_cursor(self, obj: Model, sort: Optional[SortModel] = None) -> str:
+        column, _ = self._sort_column(sort)
+        value = getattr(obj, column.key) if column is not None else None
+        if isinstance(value, (date, datetime)):
+            value = value.isoformat()
+
+        # Decimals and other non-JSON values are written as strings and
+        # converted back with the column's type in _keyset_condition
+        raw = json.dumps([value, obj.id], default=str).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    def _keyset_condition(self, after: str, sort: Optional[SortModel] = None):
+        column, descending = self._sort_column(sort)
+
+        try:
+            raw = base64.urlsafe_b64decode(after + "=" * (-len(after) % 4))
+            payload = json.loads(raw)
+            if not (isinstance(payload, list) and len(payload) == 2):
+                raise ValueError(payload)
+            value, last_id = payload
+            if not isinstance(last_id, int):
+                raise ValueError(last_id)
+            if column is not None and value is not None:
+                python_type = column.type.python_type
+                if python_type in (date, datetime):
+                    value = python_type.fromisoformat(value)
+                elif python_type is Decimal:
+                    value = Decimal(value)
+        except (ValueError, TypeError, ArithmeticError, NotImplementedError):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail={"message": "Invalid pagination cursor"},
             )
-        else:
-            query = query.order_by(self.model.id.desc())
 
-        return query
+        id_col = self.model.id
+        after_id = id_col < last_id if descending else id_col > last_id
+        if column is None:
+            return after_id
+
+        # NULLs come last: past a NULL only NULLs follow, and before one
+        # every NULL is still to come
+        if value is None:
+            return and_(column.is_(None), after_id)
+        after_value = column < value if descending else column > value
+        return or_(after_value, column.is_(None), and_(column == value, after_id))
+
+    def _known_count(
+        self,
+        db: Session,
+        query: Query,
+        with_count: bool = True,
+        search: Optional[SearchModel] = None,
+        **filters,
+    ) -> Optional[tuple[Optional[int], CountStrategy]]:
+        """The total without counting rows, None when it must be counted"""
+        if not with_count:
+            return None, CountStrategy.SKIPPED
+
+        table = self.model.__tablename__
+        if not filters and not (search and search.search_query):
+            if (estimate := estimate_count(db, self.model)) is not None:
+                return estimate, CountStrategy.ESTIMATED
+
+        key = count_cache_key(table, search, filters)
+        if (cached := count_cache.get(query_tables(query), key)) is not None:
+            return cached, CountStrategy.CACHED
+        return None
+
+    def _count(
+        self,
+        db: Session,
+        query: Query,
+        with_count: bool = True,
+        search: Optional[SearchModel] = None,
+        **filters,
+    ) -> tuple[Optional[int], CountStrategy]:
+        if known := self._known_count(db, query, with_count, search, **filters):
+            return known
+
+        versions = count_cache.versions(query_tables(query))
+        count = query.count()
+        # A lagging replica's count would be cached under the new versions
+        if not reads_replica(db):
+            key = count_cache_key(self.model.__tablename__, search, filters)
+            count_cache.set(key, count, versions)
+        return count, CountStrategy.EXACT
 
     def get_all_paginated(
         self,
@@ -127,24 +722,90 @@ class BaseRepository(Generic[Model, CreateSchema, UpdateSchema]):
         page: Optional[int] = 1,
         search: Optional[SearchModel] = None,
         sort: Optional[SortModel] = None,
+        profile: Optional[LoadProfile | str] = LoadProfile.LIST,
+        after: Optional[str] = None,
+        with_count: bool = True,
+        cached: bool = False,
         **filters,
     ) -> dict:
+        """
+        Page through the filtered query.
+
+        By default pages are addressed with ``page`` (LIMIT/OFFSET). Passing
+        the ``next_cursor`` of a previous page as ``after`` switches to keyset
+        pagination on (sort column, id), so deep pages cost the same as the
+        first one.
+
+        The total count is served from the count cache or a Postgres
+        estimate where possible, and skipped entirely with
+        ``with_count=False`` or a cursor, whose pages are not numbered;
+        ``count_strategy`` reports which was used.
+
+        With ``cached=True`` the whole page is served from the query cache.
+        """
+        if cached:
+            params = self._page_params(
+                limit, page, search, sort, after, with_count, **filters
+            )
+            loaded = []
+
+            def load():
+                loaded.append(True)
+                return self.get_all_paginated(
+                    db,
+                    limit=limit,
+                    page=page,
+                    search=search,
+                    sort=sort,
+                    profile=profile,
+                    after=after,
+                    with_count=with_count,
+                    **filters,
+                )
+
+            result = self._cached(db, "get_all_paginated", profile, params, load)
+            if not loaded and result["count"] is not None:
+                result["count_strategy"] = CountStrategy.CACHED
+            return result
+
         page = max(page or 1, 1)
         offset = (page - 1) * limit if limit else 0
 
         query = self._filter_search_query(db, sort=sort, search=search, **filters)
-        count = query.count()
+        count, count_strategy = self._count(
+            db, query, with_count=with_count and not after, search=search, **filters
+        )
 
-        if limit:
-            query = query.limit(limit)
-        if offset:
+        # Eager loads are attached after counting so they stay out of COUNT(*)
+        query = query.options(*self.loader_options(profile))
+
+        if after:
+            if search and search.search_query:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail={"message": "Cursor pagination can't be used with search"},
+                )
+            query = query.filter(self._keyset_condition(after, sort))
+        elif offset:
             query = query.offset(offset)
 
+        if limit:
+            # One extra row tells whether there is a next page
+            query = query.limit(limit + 1)
+
+        data = query.all()
+        next_cursor = None
+        if limit and len(data) > limit:
+            data = data[:limit]
+            next_cursor = self._encode_cursor(data[-1], sort)
+
         return {
             "page": page,
-            "data": query.all(),
+            "data": data,
             "count": count,
-            "pages": calculate_total_pages(count, limit),
+            "pages": calculate_total_pages(count, limit) if count is not None else None,
+            "count_strategy": count_strategy,
+            "next_cursor": next_cursor,
         }
 
     def get_all(
@@ -152,11 +813,12 @@ class BaseRepository(Generic[Model, CreateSchema, UpdateSchema]):
         db: Session,
         search: Optional[SearchModel] = None,
         sort: Optional[SortModel] = None,
+        profile: Optional[LoadProfile | str] = LoadProfile.LIST,
         **filters,
     ) -> list:
 
         query = self._filter_search_query(db, sort=sort, search=search, **filters)
-        return query.all()
+        return query.options(*self.loader_options(profile)).all()
 
     def create(
         self,
@@ -210,6 +872,160 @@ class BaseRepository(Generic[Model, CreateSchema, UpdateSchema]):
             db.rollback()
             self._handle_error(e)
 
+    def _bulk_row(
+        self,
+        item: BaseModel,
+        audit_user_id: Optional[int] = None,
+        exclude_unset: bool = False,
+    ) -> Dict[str, Any]:
+        columns = self.model.__table__.columns
+        row = {
+            field: value
+            for field, value in item.model_dump(exclude_unset=exclude_unset).items()
+            if field in columns and not (exclude_unset and value is None)
+        }
+        if audit_user_id:
+            row["updated_by"] = audit_user_id
+        return row
+
+    def _check_batch_size(self, items: Sequence):
+        if len(items) > BULK_MAX_ITEMS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail={"message": f"A batch can have at most {BULK_MAX_ITEMS} items"},
+            )
+
+    def bulk_create(
+        self,
+        db: Session,
+        items: Sequence[CreateSchema],
+        audit_user_id: Optional[int] = None,
+    ) -> List[int]:
+        """
+        Insert all items with a single executemany in one transaction and
+        return their ids in input order.
+        """
+        self._check_batch_size(items)
+        if not items:
+            return []
+
+        try:
+            rows = [self._bulk_row(item, audit_user_id) for item in items]
+            ids = db.scalars(
+                insert(self.model).returning(
+                    self.model.id, sort_by_parameter_order=True
+                ),
+                rows,
+            ).all()
+            sync_media_references(db, self.model, ids)
+            db.commit()
+
+            self.log_audit(
+                AuditAction.BULK_CREATE, ids, audit_user_id, {"count": len(ids)}
+            )
+            return list(ids)
+
+        except Exception as e:
+            db.rollback()
+            self._handle_error(e)
+
+    def bulk_update(
+        self,
+        db: Session,
+        items: Dict[int, UpdateSchema],
+        audit_user_id: Optional[int] = None,
+    ) -> List[int]:
+        """
+        Apply partial updates keyed by id with one executemany UPDATE. Like
+        update(), unset and None fields are left untouched.
+        """
+        self._check_batch_size(list(items))
+        if not items:
+            return []
+
+        try:
+            found = set(
+                db.scalars(select(self.model.id).where(self.model.id.in_(items)))
+            )
+            if missing := [id for id in items if id not in found]:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail={
+                        "message": f"{self.model.__name__} not found",
+                        "detail": {"ids": ",".join(map(str, missing))},
+                    },
+                )
+
+            rows = [
+                {"id": id, **self._bulk_row(item, audit_user_id, exclude_unset=True)}
+                for id, item in items.items()
+            ]
+            rows = [row for row in rows if len(row) > 1]
+            if rows:
+                db.execute(update(self.model), rows)
+                sync_media_references(db, self.model, [row["id"] for row in rows])
+            db.commit()
+
+            ids = list(items)
+            self.log_audit(
+                AuditAction.BULK_UPDATE, ids, audit_user_id, {"count": len(ids)}
+            )
+            return ids
+
+        except Exception as e:
+            db.rollback()
+            self._handle_error(e)
+
+    def bulk_upsert(
+        self,
+        db: Session,
+        items: Sequence[CreateSchema],
+        audit_user_id: Optional[int] = None,
+        conflict_keys: Optional[Sequence[str]] = None,
+    ) -> List[int]:
+        """
+        INSERT ... ON CONFLICT (conflict_keys) DO UPDATE for all items in one
+        statement batch. conflict_keys defaults to the repository's
+        upsert_keys and must be covered by a unique constraint.
+        """
+        self._check_batch_size(items)
+        conflict_keys = list(conflict_keys or self.upsert_keys)
+        dialect = db.get_bind().dialect.name
+
+        if not conflict_keys or dialect not in upsert_inserts:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail={"message": f"{self.model.__name__} does not support upsert"},
+            )
+        if not items:
+            return []
+
+        try:
+            rows = [self._bulk_row(item, audit_user_id) for item in items]
+            statement = upsert_inserts[dialect](self.model)
+            updated = {
+                column: statement.excluded[column]
+                for column in rows[0]
+                if column not in conflict_keys
+            }
+            statement = statement.on_conflict_do_update(
+                index_elements=conflict_keys,
+                set_={**updated, "updated_at": func.now()},
+            ).returning(self.model.id, sort_by_parameter_order=True)
+
+            ids = db.scalars(statement, rows).all()
+            sync_media_references(db, self.model, ids)
+            db.commit()
+
+            self.log_audit(
+                AuditAction.BULK_UPSERT, ids, audit_user_id, {"count": len(ids)}
+            )
+            return list(ids)
+
+        except Exception as e:
+            db.rollback()
+            self._handle_error(e)
+
     def delete(
         self,
         db: Session,
@@ -0,0 +1,365 @@
+"""
+Query result cache for repository reads.
+
+Entries are keyed by model, method and normalized arguments, and suffixed
+with the version of every table the read depends on. Committed writes bump
+those versions (see ``app.repository.versions``), so stale entries are never
+read again and simply age out. Results are pickled with an HMAC of the
+app's ``SECRET_KEY`` in front, and only unpickled when it verifies: whoever
+can write to Redis still can't make a worker unpickle their data.
+
+The backend is Redis when ``REDIS_HOST`` is set and the client is installed,
+an in-process LRU otherwise, and an in-memory fake under test. The same
+backend holds rendered JSON bodies of detail endpoints (``aget_or_render``).
+
+The async variants run cache calls and unpickling in a worker thread: the
+Redis client blocks, and the event loop must not wait on it.
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+import anyio
+
+from app.core.config import Environment, get_settings
+from app.repository.versions import on_version_bump, table_version
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - redis is optional
+    redis = None
+
+logger = logging.getLogger("QueryCache")
+
+KEY_PREFIX = "risevale:query"
+RESPONSE_PREFIX = "risevale:response"
+
+_MAC_SIZE = hashlib.sha256().digest_size
+
+# What lookup() returns on a miss; None is a value that can be cached
+MISS = object()
+
+
+@lru_cache()
+def _signing_key() -> bytes:
+    # Derived, so the cache never signs with the key that signs tokens
+    return hashlib.sha256(b"query-cache:" + get_settings().SECRET_KEY.encode()).digest()
+
+
+def sign(payload: bytes) -> bytes:
+    return hmac.digest(_signing_key(), payload, "sha256") + payload
+
+
+def verify(value: bytes) -> Optional[bytes]:
+    """The payload of a ``sign``ed value, None when it was not signed by us"""
+    mac, payload = value[:_MAC_SIZE], value[_MAC_SIZE:]
+    if hmac.compare_digest(mac, hmac.digest(_signing_key(), payload, "sha256")):
+        return payload
+    logger.error("Query cache entry with an invalid signature, ignored")
+    return None
+
+
+class QueryCache:
+    """Backend interface; values are signed pickles, every hit a fresh copy"""
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes, ttl: int):
+        raise NotImplementedError
+
+    def versions(self, tables: Iterable[str]) -> List[int]:
+        return [table_version(table) for table in tables]
+
+    def bump(self, tables: Set[str]):
+        """Versions are process-local unless the backend shares them"""
+
+    def clear(self):
+        raise NotImplementedError
+
+    def lookup(self, key: str, tables: Iterable[str]) -> Tuple[str, Any]:
+        """The versioned key for ``key``, and its cached value or MISS"""
+        # Versions are read before loading: if a write commits meanwhile the
+        # result is stored under the old versions and never served again
+        versions = ".".join(map(str, self.versions(tables)))
+        key = f"{KEY_PREFIX}:{key}:{versions}"
+
+        if (raw := self.get(key)) is not None and (raw := verify(raw)) is not None:
+            return key, pickle.loads(raw)
+        return key, MISS
+
+    def store(self, key: str, value: Any):
+        """Cache ``value`` under a key from ``lookup``"""
+        if ttl := get_settings().CACHE_TTL_SECONDS:
+            self.set(key, sign(pickle.dumps(value, pickle.HIGHEST_PROTOCOL)), ttl)
+
+    def get_or_load(self, key: str, tables: Iterable[str], load: Callable[[], Any]):
+        key, value = self.lookup(key, tables)
+        if value is MISS:
+            value = load()
+            self.store(key, value)
+        return value
+
+    async def aget_or_load(
+        self, key: str, tables: Iterable[str], load: Callable[[], Awaitable[Any]]
+    ):
+        """get_or_load() for async reads; only ``load`` runs on the loop"""
+        key, value = await anyio.to_thread.run_sync(self.lookup, key, list(tables))
+        if value is MISS:
+            value = await load()
+            await anyio.to_thread.run_sync(self.store, key, value)
+        return value
+
+    async def aversions(self, tables: Iterable[str]) -> List[int]:
+        return await anyio.to_thread.run_sync(self.versions, list(tables))
+
+
+class LRUQueryCache(QueryCache):
+    """
+    Per-process fallback. Versions only see this process' writes, so the
+    TTL bounds staleness from writes made by other workers.
+    """
+
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, Tuple[float, bytes]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if not entry:
+                return None
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: int):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisQueryCache(QueryCache):
+    """
+    Shared cache with version tags kept in Redis, so a write in one worker
+    invalidates the entries of all of them. Redis errors degrade to misses.
+
+    Version keys have no TTL and so survive ``volatile-lru``; should one be
+    lost anyway (another policy, a flush), it is re-seeded from the clock
+    rather than restarting at 0, so a version never goes back to a value
+    entries or ETags were stored under.
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    @staticmethod
+    def version_key(table: str) -> str:
+        return f"{KEY_PREFIX}:version:{table}"
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            return self.client.get(key)
+        except redis.RedisError as e:
+            logger.warning(f"Query cache read failed: {e}")
+            return None
+
+    def set(self, key: str, value: bytes, ttl: int):
+        try:
+            self.client.set(key, value, ex=ttl)
+        except redis.RedisError as e:
+            logger.warning(f"Query cache write failed: {e}")
+
+    def _seed(self, pipe, key: str):
+        # Above any version the key had: bumps are far rarer than nanoseconds
+        pipe.set(key, time.time_ns(), nx=True)
+
+    def versions(self, tables: Iterable[str]) -> List[int]:
+        tables = list(tables)
+        try:
+            with self.client.pipeline(transaction=False) as pipe:
+                for table in tables:
+                    self._seed(pipe, self.version_key(table))
+                    pipe.get(self.version_key(table))
+                values = pipe.execute()[1::2]
+        except redis.RedisError as e:
+            logger.warning(f"Query cache version read failed: {e}")
+            # A key nobody stored under, i.e. a miss
+            return [-1] * len(tables)
+        return [int(v) for v in values]
+
+    def bump(self, tables: Set[str]):
+        try:
+            with self.client.pipeline(transaction=False) as pipe:
+                for table in tables:
+                    self._seed(pipe, self.version_key(table))
+                    pipe.incr(self.version_key(table))
+                pipe.execute()
+        except redis.RedisError as e:
+            logger.error(f"Query cache invalidation failed for {tables}: {e}")
+
+    def clear(self):
+        for prefix in (KEY_PREFIX, RESPONSE_PREFIX):
+            for key in self.client.scan_iter(f"{prefix}:*"):
+                self.client.delete(key)
+
+
+class FakeQueryCache(QueryCache):
+    """
+    In-memory stand-in for Redis used by the test suite: shared version
+    tags, no expiry, and hit/miss counters to assert on.
+    """
+
+    def __init__(self):
+        self.entries: Dict[str, bytes] = {}
+        self.tags: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: bytes, ttl: int):
+        self.entries[key] = value
+
+    def versions(self, tables: Iterable[str]) -> List[int]:
+        return [self.tags.get(table, 0) for table in tables]
+
+    def bump(self, tables: Set[str]):
+        for table in tables:
+            self.tags[table] = self.tags.get(table, 0) + 1
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = self.misses = 0
+
+
+@lru_cache()
+def get_query_cache() -> QueryCache:
+    settings = get_settings()
+    if settings.ENVIRONMENT == Environment.test:
+        return FakeQueryCache()
+
+    if settings.REDIS_HOST and redis is not None:
+        client = redis.Redis(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            db=settings.REDIS_DB,
+            socket_timeout=settings.REDIS_TIMEOUT_SECONDS,
+            socket_connect_timeout=settings.REDIS_TIMEOUT_SECONDS,
+        )
+        return RedisQueryCache(client)
+
+    if settings.REDIS_HOST:
+        logger.warning("REDIS_HOST is set but redis is not installed")
+    return LRUQueryCache(settings.CACHE_MAX_ENTRIES)
+
+
+@on_version_bump
+def _bump_cache_versions(tables: Set[str]):
+    get_query_cache().bump(tables)
+
+
+class AsyncSingleFlight:
+    """
+    Coalesces concurrent calls for the same key in this process: the first
+    caller runs the coroutine, the others await and share its result.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Future] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]):
+        if (future := self._calls.get(key)) is not None:
+            return await asyncio.shield(future)
+
+        future = self._calls[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await fn()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            # Don't warn about an exception nobody waited for
+            future.exception()
+            raise
+        finally:
+            del self._calls[key]
+
+
+async_single_flight = AsyncSingleFlight()
+
+
+async def aget_or_render(key: str, render: Callable[[], Awaitable[bytes]]) -> bytes:
+    """Cached response body for ``key``, rendered at most once at a time"""
+    cache = get_query_cache()
+    key = f"{RESPONSE_PREFIX}:{key}"
+    if (body := await anyio.to_thread.run_sync(cache.get, key)) is not None:
+        return body
+
+    async def build() -> bytes:
+        if (body := await anyio.to_thread.run_sync(cache.get, key)) is not None:
+            return body
+
+        body = await render()
+        if ttl := get_settings().CACHE_TTL_SECONDS:
+            await anyio.to_thread.run_sync(cache.set, key, body, ttl)
+        return body
+
+    return await async_single_flight.do(key, build)
+
+
+def query_cache_key(table: str, method: str, params: Dict[str, Any]) -> str:
+    raw = json.dumps(params, sort_keys=True, default=str)
+    return f"{table}:{method}:{hashlib.sha1(raw.encode()).hexdigest()}"
+
+
+__all__ = [
+    "MISS",
+    "QueryCache",
+    "LRUQueryCache",
+    "RedisQueryCache",
+    "FakeQueryCache",
+    "get_query_cache",
+    "query_cache_key",
+    "sign",
+    "verify",
+    "AsyncSingleFlight",
+    "async_single_flight",
+    "aget_or_render",
+]
@@ -0,0 +1,123 @@
+"""Total counts for paginated lists without a COUNT(*) on every request"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from enum import Enum
+from typing import Optional, Type, Tuple, Dict, Any, Sequence
+
+from sqlalchemy import text
+from sqlalchemy.orm import Query, Session
+from sqlalchemy.sql.util import find_tables
+
+from app.core.config import get_settings
+from app.models.base import BaseDBModel
+from app.repository.versions import table_version
+
+
+class CountStrategy(str, Enum):
+    EXACT = "exact"
+    CACHED = "cached"
+    ESTIMATED = "estimated"
+    SKIPPED = "skipped"
+
+    def __str__(self):
+        return self.value
+
+
+class CountCache:
+    """
+    Exact counts keyed by (table, filter hash). Entries are tied to the
+    write versions of every table the count read, joined tables included,
+    so any committed write to one of them invalidates them. The TTL bounds
+    staleness from writes made by other workers.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, Tuple[Tuple[int, ...], float, int]] = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def versions(self, tables: Sequence[str]) -> Tuple[int, ...]:
+        """Versions to store a count under; taken before counting"""
+        return tuple(table_version(table) for table in tables)
+
+    def get(self, tables: Sequence[str], key: str) -> Optional[int]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if not entry:
+                return None
+
+            versions, expires_at, value = entry
+            if versions != self.versions(tables) or expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: int, versions: Tuple[int, ...]):
+        ttl = get_settings().COUNT_CACHE_TTL_SECONDS
+        with self._lock:
+            self._entries[key] = (versions, time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+count_cache = CountCache()
+
+
+def count_cache_key(table: str, search, filters: Dict[str, Any]) -> str:
+    raw = json.dumps(
+        {
+            "filters": filters,
+            "search": [search.search_query, search.search_fields] if search else None,
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return f"{table}:{hashlib.sha1(raw.encode()).hexdigest()}"
+
+
+def query_tables(query: Query) -> Tuple[str, ...]:
+    """Names of the tables ``query`` reads, joined tables included"""
+    tables = find_tables(query.statement, include_joins=True)
+    return tuple(sorted({table.name for table in tables}))
+
+
+def estimate_count(db: Session, model: Type[BaseDBModel]) -> Optional[int]:
+    """
+    Planner row estimate from pg_class. Only used when the table is large
+    enough for COUNT(*) to hurt; returns None otherwise or off Postgres.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return None
+
+    estimate = db.execute(
+        text("SELECT reltuples::bigint FROM pg_class WHERE oid = CAST(:t AS regclass)"),
+        {"t": model.__tablename__},
+    ).scalar()
+
+    # reltuples is -1 for tables that have never been vacuumed/analyzed
+    if estimate is None or estimate < get_settings().COUNT_ESTIMATE_THRESHOLD:
+        return None
+
+    return int(estimate)
+
+
+__all__ = [
+    "CountStrategy",
+    "CountCache",
+    "count_cache",
+    "count_cache_key",
+    "query_tables",
+    "estimate_count",
+]
@@ -1,12 +1,17 @@
 from typing import Optional
 
-from sqlalchemy import or_
 from sqlalchemy.orm import Session, Query
 
 from app import models
 from app.models.destination import Destination
-from app.repository.base import BaseRepository, Model, AuditAction, SearchModel
-from app.schema import SortOrder, SortModel
+from app.repository.base import (
+    BaseRepository,
+    Model,
+    AuditAction,
+    SearchModel,
+    LoadProfile,
+)
+from app.schema import SortModel
 from app.schema.destination import DestinationCreate, DestinationUpdate
 from app.utils.utils import slugify
 
@@ -14,6 +19,16 @@ from app.utils.utils import slugify
 class DestinationRepository(
     BaseRepository[Destination, DestinationCreate, DestinationUpdate]
 ):
+    # schema.Destination and schema.DestinationDetailed render the same graph
+    load_profiles = {
+        profile: (
+            (Destination.city, models.City.country),
+            (Destination.media,),
+            (Destination.hotels, models.Hotel.city, models.City.country),
+            (Destination.hotels, models.Hotel.media),
+        )
+        for profile in LoadProfile
+    }
 
     def __init__(self):
         super().__init__(Destination)
@@ -119,27 +134,13 @@ class DestinationRepository(
                     conditions.append(column == v)
 
         # Apply search query
-        if search and search.search_query:
-            search_filters = []
-            for field in search.search_fields:
-                if hasattr(self.model, field):
-                    col = getattr(self.model, field)
-                    search_filters.append(col.ilike(f"%{search.search_query}%"))
-            if search_filters:
-                conditions.append(or_(*search_filters))
+        search_condition, relevance = self._search(db, search)
+        if search_condition is not None:
+            conditions.append(search_condition)
 
         query = query.filter(*conditions)
 
-        # Apply sorting
-        if sort and hasattr(self.model, sort.sort):
-            column = getattr(self.model, sort.sort)
-            query = query.order_by(
-                column.desc() if sort.direction == SortOrder.desc else column.asc()
-            )
-        else:
-            query = query.order_by(self.model.id.desc())
-
-        return query
+        return self._apply_sort(query, sort, relevance)
 
 
 destination_repository = DestinationRepository()
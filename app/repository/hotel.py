@@ -1,9 +1,20 @@
 from app.models.hotel import Hotel
-from app.repository.base import BaseRepository
+from app.models.setups import City
+from app.repository.base import BaseRepository, LoadProfile
 from app.schema.hotel import HotelCreate, HotelUpdate
 
 
 class HotelRepository(BaseRepository[Hotel, HotelCreate, HotelUpdate]):
+    load_profiles = {
+        # schema.Hotel
+        LoadProfile.LIST: ((Hotel.city, City.country), (Hotel.media,)),
+        # schema.HotelDetailed
+        LoadProfile.DETAIL: (
+            (Hotel.city, City.country),
+            (Hotel.media,),
+            (Hotel.reviews,),
+        ),
+    }
 
     def __init__(self):
         super().__init__(Hotel)
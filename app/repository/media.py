@@ -0,0 +1,300 @@
+"""
+Media blobs and their references.
+
+``upload``/``upload_many`` store files content-addressed (see
+``app.utils.storage``) and record a ``MediaBlob`` per object. References
+are not written by the routes, see ``app.repository.references``. The
+routes then queue ``generate_variants``, which marks an image's blob
+``variants_ready`` with the widths rendered once its derivatives are
+stored; ``missing_variants`` finds those to render again
+(``python -m app.render_variants``).
+
+``UploadRepository`` runs chunked uploads: parts are acknowledged strictly
+in order, each checked against its SHA-256, so an interrupted client asks
+for the upload and resumes at ``received``. Completing it streams the
+staged parts into the blob.
+"""
+import hashlib
+import io
+import logging
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+import anyio
+from fastapi import HTTPException, UploadFile, status
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.models.media import MediaBlob, MediaReference, MediaUpload
+from app.repository.base import BaseRepository
+from app.schema.media import MediaUploadCreate
+from app.utils import images, storage
+from app.utils.storage import (
+    UPLOAD_PREFIX,
+    ChecksumMismatch,
+    StoredFile,
+    content_key,
+    get_storage,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class MediaRepository:
+    def record(self, db: Session, stored: StoredFile) -> MediaBlob:
+        """The blob row for ``stored``, created on its first upload"""
+        query = select(MediaBlob).where(MediaBlob.key == stored.key)
+        if blob := db.scalar(query):
+            return blob
+
+        blob = MediaBlob(
+            key=stored.key,
+            sha256=stored.sha256,
+            size=stored.size,
+            content_type=stored.content_type,
+        )
+        # A savepoint, committed with the route; if the route fails the
+        # object is left without a row and re-recorded when uploaded again
+        try:
+            with db.begin_nested():
+                db.add(blob)
+        except IntegrityError:
+            # The same content uploaded concurrently
+            blob = db.scalar(query)
+        return blob
+
+    def upload(
+        self, db: Session, file: Optional[UploadFile], is_public: bool = True
+    ) -> Optional[str]:
+        """Store ``file``; call from a sync route, i.e. a worker thread"""
+        if not file:
+            return None
+
+        stored = anyio.from_thread.run(storage.upload, get_storage(), file, is_public)
+        self.record(db, stored)
+        return stored.url
+
+    def upload_many(
+        self, db: Session, files: Sequence[UploadFile], is_public: bool = True
+    ) -> List[str]:
+        """Like ``upload``, for several files uploaded concurrently"""
+        stored = anyio.from_thread.run(
+            storage.upload_many, get_storage(), files, is_public
+        )
+        for item in stored:
+            self.record(db, item)
+        return [item.url for item in stored]
+
+    def unreferenced(self, db: Session, older_than: datetime) -> List[MediaBlob]:
+        """Blobs nothing refers to, uploaded before ``older_than``"""
+        referenced = select(MediaReference.blob_id)
+        query = select(MediaBlob).where(
+            MediaBlob.id.not_in(referenced), MediaBlob.created_at < older_than
+        )
+        return list(db.scalars(query))
+
+    def missing_variants(self, db: Session) -> List[MediaBlob]:
+        """Images whose derivatives failed or were never rendered"""
+        query = select(MediaBlob).where(MediaBlob.variants_ready.is_(False))
+        return [blob for blob in db.scalars(query) if images.is_image(blob.key)]
+
+    def ready_keys(self, db: Session, keys: Sequence[str]) -> List[str]:
+        """Those of ``keys`` whose derivatives are stored"""
+        query = select(MediaBlob.key).where(
+            MediaBlob.key.in_(keys), MediaBlob.variants_ready.is_(True)
+        )
+        return list(db.scalars(query))
+
+    def mark_variants_ready(self, db: Session, widths: Dict[str, List[int]]):
+        """Advertise the derivatives rendered at ``widths``, by blob key"""
+        for key, key_widths in widths.items():
+            db.execute(
+                update(MediaBlob)
+                .where(MediaBlob.key == key)
+                .values(variants_ready=True, variant_widths=key_widths)
+            )
+        db.commit()
+
+    async def generate_variants(
+        self, urls: Iterable[Optional[str]], session: Callable[[], Session]
+    ) -> List[str]:
+        """
+        Background task: render the derivatives of the images at ``urls``,
+        then advertise them; sessions come from ``session``. The keys of
+        the images whose derivatives are stored now.
+        """
+
+        def in_session(method: Callable, *args):
+            with session() as db:
+                return method(db, *args)
+
+        if not (keys := images.image_keys(urls)):
+            return []
+        # The same content uploaded again is not rendered twice
+        ready = await anyio.to_thread.run_sync(in_session, self.ready_keys, keys)
+        rendered = await images.generate_variants(k for k in keys if k not in ready)
+        if rendered:
+            await anyio.to_thread.run_sync(
+                in_session, self.mark_variants_ready, rendered
+            )
+        return list(rendered)
+
+
+media_repository = MediaRepository()
+
+
+def part_key(upload: MediaUpload, index: int, checksum: str) -> str:
+    # Named by checksum too: a late retry can never replace an acknowledged part
+    return f"{UPLOAD_PREFIX}/{upload.id}/{index}-{checksum}"
+
+
+def _conflict(message: str, upload: MediaUpload) -> HTTPException:
+    return HTTPException(
+        status.HTTP_409_CONFLICT,
+        detail={"message": message, "detail": {"received": upload.received}},
+    )
+
+
+def _unprocessable(message: str) -> HTTPException:
+    return HTTPException(
+        status.HTTP_422_UNPROCESSABLE_ENTITY, detail={"message": message}
+    )
+
+
+async def _delete_parts(keys: Sequence[str]):
+    backend = get_storage()
+    for key in keys:
+        try:
+            await storage.delete(backend, key, False)
+        except Exception as e:
+            logger.warning(f"Could not delete upload part {key}: {e}")
+
+
+class UploadRepository(
+    BaseRepository[MediaUpload, MediaUploadCreate, MediaUploadCreate]
+):
+    def __init__(self):
+        super().__init__(MediaUpload)
+
+    def start(self, db: Session, item: MediaUploadCreate, user_id: int) -> MediaUpload:
+        settings = get_settings()
+        if item.size > settings.UPLOAD_MAX_SIZE:
+            raise HTTPException(
+                status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail={"message": "File is too large"},
+            )
+
+        upload = MediaUpload(
+            **item.model_dump(),
+            chunk_size=settings.UPLOAD_CHUNK_SIZE,
+            part_checksums=[],
+            user_id=user_id,
+        )
+        # Stored before: there is nothing to send
+        key = content_key(item.sha256, item.filename)
+        if blob := db.scalar(select(MediaBlob).where(MediaBlob.key == key)):
+            upload.blob = blob
+            upload.received = upload.parts
+
+        db.add(upload)
+        db.commit()
+        db.refresh(upload)
+        return upload
+
+    def put_part(
+        self, db: Session, upload: MediaUpload, index: int, data: bytes, checksum: str
+    ) -> MediaUpload:
+        # Complete, possibly without a part sent: the content was stored before
+        if upload.blob is not None:
+            return upload
+        if not 0 <= index < upload.parts:
+            raise _unprocessable(f"The upload has parts 0 to {upload.parts - 1}")
+        expected = min(upload.chunk_size, upload.size - index * upload.chunk_size)
+        if len(data) != expected:
+            raise _unprocessable(f"Part {index} must be {expected} bytes")
+        if hashlib.sha256(data).hexdigest() != checksum:
+            raise _unprocessable(f"Checksum mismatch for part {index}, send it again")
+
+        if index < upload.received:
+            # Acknowledged before, the client did not get the response
+            if upload.part_checksums[index] == checksum:
+                return upload
+            raise _conflict(f"Part {index} was already received", upload)
+        if index > upload.received:
+            raise _conflict(f"Send part {upload.received} first", upload)
+
+        key = part_key(upload, index, checksum)
+        anyio.from_thread.run(
+            storage.save, get_storage(), key, io.BytesIO(data), None, False
+        )
+        result = db.execute(
+            update(MediaUpload)
+            .where(MediaUpload.id == upload.id, MediaUpload.received == index)
+            .values(
+                received=index + 1,
+                part_checksums=[*upload.part_checksums, checksum],
+            )
+        )
+        db.commit()
+        db.refresh(upload)
+        if not result.rowcount:
+            raise _conflict(f"Part {index} was already received", upload)
+        return upload
+
+    def complete(self, db: Session, upload: MediaUpload) -> MediaUpload:
+        """Store the parts as one blob; completing twice is harmless"""
+        if upload.blob is not None:
+            return upload
+        if upload.received < upload.parts:
+            raise _conflict(f"Send part {upload.received} first", upload)
+
+        keys = [part_key(upload, i, c) for i, c in enumerate(upload.part_checksums)]
+        try:
+            stored = anyio.from_thread.run(
+                storage.assemble,
+                get_storage(),
+                keys,
+                upload.sha256,
+                upload.size,
+                upload.filename,
+                upload.content_type,
+            )
+        except ChecksumMismatch:
+            # Every part matched its checksum, but not the announced file
+            upload.received = 0
+            upload.part_checksums = []
+            db.commit()
+            anyio.from_thread.run(_delete_parts, keys)
+            raise _unprocessable("Checksum mismatch for the file, upload it again")
+
+        upload.blob = media_repository.record(db, stored)
+        db.commit()
+        db.refresh(upload)
+        anyio.from_thread.run(_delete_parts, keys)
+        return upload
+
+    def completed_urls(
+        self, db: Session, ids: Iterable[int], user_id: int
+    ) -> List[str]:
+        """URLs of the user's completed uploads, to attach to a record"""
+        urls = []
+        for id in ids:
+            upload = self.get_object_or_404(db, id=id, user_id=user_id)
+            if upload.blob is None:
+                raise _conflict(f"Upload {id} is not complete", upload)
+            urls.append(get_storage().url(upload.blob.key, True))
+        return urls
+
+
+upload_repository = UploadRepository()
+
+
+__all__ = [
+    "MediaRepository",
+    "media_repository",
+    "UploadRepository",
+    "upload_repository",
+    "part_key",
+]
@@ -0,0 +1,96 @@
+"""
+``media_references``: which rows use which blob.
+
+Models list the columns holding media URLs in ``__media_fields__``. After
+every flush the media fields of new, changed and deleted rows are diffed
+into ``media_references``; bulk statements, which bypass the flush, call
+``sync_media_references`` with the ids they wrote.
+"""
+from itertools import chain
+from typing import Dict, Iterable, Optional, Sequence, Set, Type
+
+from sqlalchemy import Connection, delete, event, insert, inspect, literal, select
+from sqlalchemy.orm import Session
+
+from app.models.base import BaseDBModel
+from app.models.media import MediaBlob, MediaReference
+from app.utils.storage import get_storage, is_blob
+
+
+def _blob_keys(urls: Iterable[Optional[str]]) -> Set[str]:
+    backend = get_storage()
+    keys = set()
+    for url in filter(None, urls):
+        key = backend.key_for(url)
+        if key is not None and is_blob(key):
+            keys.add(key)
+    return keys
+
+
+def _urls(values: Iterable) -> Iterable[Optional[str]]:
+    for value in values:
+        yield from value if isinstance(value, list) else [value]
+
+
+def _replace_references(
+    connection: Connection, table: str, owners: Dict[int, Iterable[Optional[str]]]
+):
+    """Point each owner's references at the blobs of its URLs"""
+    connection.execute(
+        delete(MediaReference).where(
+            MediaReference.owner_table == table,
+            MediaReference.owner_id.in_(list(owners)),
+        )
+    )
+    for owner_id, urls in owners.items():
+        if not (keys := _blob_keys(urls)):
+            continue
+        connection.execute(
+            insert(MediaReference).from_select(
+                ["blob_id", "owner_table", "owner_id"],
+                select(MediaBlob.id, literal(table), literal(owner_id)).where(
+                    MediaBlob.key.in_(keys)
+                ),
+            )
+        )
+
+
+def sync_media_references(
+    db: Session, model: Type[BaseDBModel], ids: Sequence[int]
+):
+    """Rewrite the references of rows written without the ORM unit of work"""
+    fields = getattr(model, "__media_fields__", ())
+    if not fields or not ids:
+        return
+
+    columns = [model.__table__.c[field] for field in fields]
+    rows = db.execute(select(model.id, *columns).where(model.id.in_(ids)))
+    owners = {row[0]: list(_urls(row[1:])) for row in rows}
+    _replace_references(db.connection(), model.__tablename__, owners)
+
+
+@event.listens_for(Session, "after_flush")
+def _sync_flushed_references(session: Session, _flush_context):
+    # new/dirty/deleted and attribute history still describe the flush here
+    changed: Dict[str, Dict[int, Iterable[Optional[str]]]] = {}
+    for obj in chain(session.new, session.dirty, session.deleted):
+        fields = getattr(obj, "__media_fields__", None)
+        if not fields:
+            continue
+        if obj in session.dirty and not any(
+            inspect(obj).attrs[field].history.has_changes() for field in fields
+        ):
+            continue
+
+        urls = [] if obj in session.deleted else list(
+            _urls(getattr(obj, field) for field in fields)
+        )
+        changed.setdefault(obj.__tablename__, {})[obj.id] = urls
+
+    if changed:
+        connection = session.connection()
+        for table, owners in changed.items():
+            _replace_references(connection, table, owners)
+
+
+__all__ = ["sync_media_references"]
@@ -0,0 +1,137 @@
+"""Search backends behind SearchModel, selected by the session's dialect"""
+import re
+from abc import ABC, abstractmethod
+from typing import List, Optional, Tuple, Type
+
+from sqlalchemy import (
+    column,
+    func,
+    literal,
+    and_,
+    literal_column,
+    or_,
+    select,
+    table,
+    text as sql_text,
+)
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.elements import ColumnElement
+
+from app.models.base import BaseDBModel
+from app.models.search import TS_CONFIG, fts_table, search_document
+
+WORD = re.compile(r"\w+")
+
+Match = Tuple[Optional[ColumnElement], Optional[ColumnElement]]
+
+
+def search_terms(search_query: str) -> List[str]:
+    return WORD.findall(search_query.lower())
+
+
+class SearchBackend(ABC):
+    """
+    Turns a SearchModel into a WHERE condition and an optional relevance
+    ORDER BY expression (best match first).
+    """
+
+    @abstractmethod
+    def match(self, model: Type[BaseDBModel], search) -> Match:
+        ...
+
+    @staticmethod
+    def fields(model: Type[BaseDBModel], search) -> List[str]:
+        return [f for f in search.search_fields if hasattr(model, f)]
+
+
+class LikeSearchBackend(SearchBackend):
+    def match(self, model: Type[BaseDBModel], search) -> Match:
+        filters = [
+            getattr(model, field).ilike(f"%{search.search_query}%")
+            for field in self.fields(model, search)
+        ]
+        return (or_(*filters) if filters else None), None
+
+
+class PostgresSearchBackend(SearchBackend):
+    """
+    tsvector prefix matching plus pg_trgm word similarity for typos.
+
+    Matches always go through the indexed document of all
+    ``__search_fields__``; a search over some of them is narrowed down to
+    those fields on the rows the index found.
+    """
+
+    def match(self, model: Type[BaseDBModel], search) -> Match:
+        indexed = getattr(model, "__search_fields__", ())
+        fields = self.fields(model, search)
+        terms = search_terms(search.search_query)
+        if not fields or not set(fields) <= set(indexed) or not terms:
+            return like_backend.match(model, search)
+
+        document = search_document(model, fields)
+        tsquery = func.to_tsquery(
+            sql_text(f"'{TS_CONFIG}'::regconfig"),
+            " & ".join(f"{term}:*" for term in terms),
+        )
+        query = literal(search.search_query)
+        columns = [getattr(model, field) for field in fields]
+
+        matches = search_document(model, indexed).op("@@")(tsquery)
+        if set(fields) != set(indexed):
+            matches = and_(matches, document.op("@@")(tsquery))
+        condition = or_(matches, *[query.op("<%")(col) for col in columns])
+        similarity = func.greatest(*[func.word_similarity(query, c) for c in columns])
+        rank = func.ts_rank(document, tsquery) + func.coalesce(similarity, 0)
+
+        return condition, rank.desc()
+
+
+class SqliteSearchBackend(SearchBackend):
+    """FTS5 prefix matching ranked by bm25, used in local/test"""
+
+    def match(self, model: Type[BaseDBModel], search) -> Match:
+        indexed = getattr(model, "__search_fields__", ())
+        fields = self.fields(model, search)
+        terms = search_terms(search.search_query)
+        if not fields or not set(fields) <= set(indexed) or not terms:
+            return like_backend.match(model, search)
+
+        name = fts_table(model)
+        fts = table(name, column("rowid"), column("rank"))
+
+        expression = " ".join(f'"{term}"*' for term in terms)
+        if set(fields) != set(indexed):
+            expression = f"{{{' '.join(fields)}}}: ({expression})"
+        matches = literal_column(name).op("MATCH")(expression)
+
+        condition = model.id.in_(select(fts.c.rowid).where(matches))
+        rank = (
+            select(fts.c.rank)
+            .where(matches, fts.c.rowid == model.id)
+            .scalar_subquery()
+        )
+
+        return condition, rank.asc()
+
+
+like_backend = LikeSearchBackend()
+
+backends = {
+    "postgresql": PostgresSearchBackend(),
+    "sqlite": SqliteSearchBackend(),
+}
+
+
+def get_search_backend(db: Session) -> SearchBackend:
+    return backends.get(db.get_bind().dialect.name, like_backend)
+
+
+__all__ = [
+    "SearchBackend",
+    "LikeSearchBackend",
+    "PostgresSearchBackend",
+    "SqliteSearchBackend",
+    "get_search_backend",
+    "search_terms",
+]
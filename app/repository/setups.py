@@ -1,9 +1,10 @@
 from app.models.setups import Country, City
-from app.repository.base import BaseRepository
+from app.repository.base import BaseRepository, LoadProfile
 from app.schema.setups import CountryCreate, CountryUpdate, CityCreate, CityUpdate
 
 
 class CountryRepository(BaseRepository[Country, CountryCreate, CountryUpdate]):
+    upsert_keys = ("name",)
 
     def __init__(self):
         super().__init__(Country)
@@ -13,6 +14,7 @@ country_repository = CountryRepository()
 
 
 class CityRepository(BaseRepository[City, CityCreate, CityUpdate]):
+    load_profiles = {profile: ((City.country,),) for profile in LoadProfile}
 
     def __init__(self):
         super().__init__(City)
@@ -1,18 +1,54 @@
 from datetime import datetime
-from operator import or_
-from typing import Optional
+from typing import Optional, List, Dict
 
+from fastapi import HTTPException, status
+from sqlalchemy import delete, insert, select, tuple_, update
 from sqlalchemy.orm import Session, Query
 
 from app import models
-from app.models.tour import Tour
-from app.repository.base import BaseRepository, SearchModel
-from app.repository.tour_day_repository import tour_day_repository
-from app.schema import TourCreate, TourUpdate, SortModel, SortOrder
+from app.models.tour import Tour, tour_day_activities
+from app.repository.base import BaseRepository, SearchModel, LoadProfile, AuditAction
+from app.schema import TourCreate, TourUpdate, TourDayCreate, TourDayUpdate, SortModel
 from app.utils.utils import slugify
 
 
+def _invalid_itinerary(errors: Dict[str, dict]) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        detail={"message": "Invalid itinerary", "detail": errors},
+    )
+
+
 class TourRepository(BaseRepository[Tour, TourCreate, TourUpdate]):
+    load_profiles = {
+        # schema.Tour
+        LoadProfile.LIST: (
+            (Tour.media,),
+            (Tour.destination, models.Destination.city, models.City.country),
+            (Tour.destination, models.Destination.media),
+        ),
+        # schema.TourDetailed
+        LoadProfile.DETAIL: (
+            (Tour.media,),
+            (Tour.destination, models.Destination.city, models.City.country),
+            (Tour.destination, models.Destination.media),
+            (
+                Tour.destination,
+                models.Destination.hotels,
+                models.Hotel.city,
+                models.City.country,
+            ),
+            (Tour.destination, models.Destination.hotels, models.Hotel.media),
+            (
+                Tour.itinerary,
+                models.TourDay.hotel,
+                models.Hotel.city,
+                models.City.country,
+            ),
+            (Tour.itinerary, models.TourDay.hotel, models.Hotel.media),
+            (Tour.itinerary, models.TourDay.activities, models.Activity.media),
+        ),
+    }
 
     def __init__(self):
         super().__init__(Tour)
@@ -37,36 +73,30 @@ class TourRepository(BaseRepository[Tour, TourCreate, TourUpdate]):
                 slug=slugify(item.title),
             )
 
+            # Unknown hotels/activities fail before anything is written
+            if item.itinerary:
+                self._check_itinerary(db, item.itinerary)
+
+            if audit_user_id:
+                db_tour.updated_by = audit_user_id
+
             db.add(db_tour)
             db.flush()
 
             # Create itinerary
             if item.itinerary:
-                for day in item.itinerary:
-                    tour_day = models.TourDay(
-                        tour_id=db_tour.id,
-                        day_number=day.day_number,
-                        title=day.title,
-                        description=day.description,
-                        meals=day.meals,
-                        hotel_id=day.hotel_id,
-                    )
-
-                    if day.activity_ids:
-                        tour_day.activities = (
-                            db.query(models.Activity)
-                            .filter(models.Activity.id.in_(day.activity_ids))
-                            .all()
-                        )
-
-                    db.add(tour_day)
+                self._insert_days(db, db_tour.id, item.itinerary, audit_user_id)
 
             db.commit()
-            db.refresh(db_tour)
-            return db_tour
+
+            self.log_audit(
+                AuditAction.CREATE, db_tour.id, audit_user_id, item.model_dump()
+            )
+            return self._reload(db, db_tour.id)
 
         except Exception as e:
-            self.logger(f"Error Creating tour {e}", exc_info=e)
+            db.rollback()
+            self.logger.error(f"Error Creating tour {e}", exc_info=e)
             self._handle_error(e)
 
     def update(
@@ -81,40 +111,232 @@ class TourRepository(BaseRepository[Tour, TourCreate, TourUpdate]):
             update_data = item_in.model_dump(exclude_unset=True, exclude={"itinerary"})
             for field, value in update_data.items():
                 if hasattr(current_item, field) and value is not None:
-                    print(current_item, field, value)
                     setattr(current_item, field, value)
 
             if audit_user_id:
                 current_item.updated_by = audit_user_id
 
-            if item_in.itinerary:
-                for day_in in item_in.itinerary:
-                    existing_days = {d.id: d for d in current_item.itinerary}
-                    day_in.tour_id = current_item.id
-                    if getattr(day_in, "id", None):
-                        db_day = existing_days.get(day_in.id)
-                        updated_day = tour_day_repository.update(
-                            db=db,
-                            current_item=db_day,
-                            item_in=day_in,
-                            audit_user_id=audit_user_id,
-                        )
-                    else:
-                        new_day = tour_day_repository.create(
-                            db=db,
-                            item=day_in,
-                            audit_user_id=audit_user_id,
-                        )
+            if item_in.itinerary is not None:
+                update_data["itinerary"] = self._sync_itinerary(
+                    db, current_item, item_in.itinerary, audit_user_id
+                )
 
             db.commit()
-            db.refresh(current_item)
 
-            return current_item
+            self.log_audit(
+                AuditAction.UPDATE, current_item.id, audit_user_id, update_data
+            )
+
+            return self._reload(db, current_item.id)
         except Exception as e:
-            self.logger.error(f"Error Creating tour {e}", exc_info=e)
+            db.rollback()
+            self.logger.error(f"Error updating tour {e}", exc_info=e)
             self._handle_error(e)
 
-        return current_item
+    def _reload(self, db: Session, tour_id: int) -> Tour:
+        # Load the whole graph once, overwriting the stale identity map
+        return (
+            db.query(Tour)
+            .options(*self.loader_options(LoadProfile.DETAIL))
+            .populate_existing()
+            .filter_by(id=tour_id)
+            .one()
+        )
+
+    def _check_itinerary(
+        self, db: Session, days_in: List[TourDayCreate | TourDayUpdate]
+    ):
+        """
+        Resolve every hotel and activity referenced by the itinerary with one
+        query each and reject unknown ids or repeated day numbers.
+        """
+        errors = {}
+
+        numbers = [d.day_number for d in days_in if d.day_number is not None]
+        if len(numbers) != len(set(numbers)):
+            errors["day_number"] = {"message": "Day numbers must be unique"}
+
+        references = {
+            "hotel_id": (
+                models.Hotel,
+                {d.hotel_id for d in days_in if d.hotel_id is not None},
+            ),
+            "activity_ids": (
+                models.Activity,
+                {a for d in days_in for a in d.activity_ids or []},
+            ),
+        }
+        for field, (model, ids) in references.items():
+            if not ids:
+                continue
+            found = set(db.scalars(select(model.id).where(model.id.in_(ids))))
+            if missing := sorted(ids - found):
+                errors[field] = {
+                    "message": f"Unknown {model.__name__.lower()} ids: {missing}"
+                }
+
+        if errors:
+            raise _invalid_itinerary(errors)
+
+    @staticmethod
+    def _day_fields(
+        day_in: TourDayCreate | TourDayUpdate, audit_user_id: Optional[int] = None
+    ) -> dict:
+        fields = day_in.model_dump(
+            exclude_unset=True, exclude={"id", "tour_id", "activity_ids"}
+        )
+        if audit_user_id:
+            fields["updated_by"] = audit_user_id
+        return fields
+
+    def _insert_days(
+        self,
+        db: Session,
+        tour_id: int,
+        days_in: List[TourDayCreate | TourDayUpdate],
+        audit_user_id: Optional[int] = None,
+    ) -> int:
+        """Insert days and their activity links with one statement each"""
+        rows = [
+            {"tour_id": tour_id, **self._day_fields(day_in, audit_user_id)}
+            for day_in in days_in
+        ]
+        # Only the rows inserted here, keyed by their day numbers, which are
+        # unique within days_in. Not sort_by_parameter_order: without a
+        # sentinel column some dialects fall back to a statement per row
+        day_ids = dict(
+            db.execute(
+                insert(models.TourDay).returning(
+                    models.TourDay.day_number, models.TourDay.id
+                ),
+                rows,
+            ).all()
+        )
+
+        links = [
+            {"tour_day_id": day_ids[day_in.day_number], "activity_id": activity_id}
+            for day_in in days_in
+            for activity_id in set(day_in.activity_ids or [])
+        ]
+        if links:
+            db.execute(insert(tour_day_activities), links)
+
+        return len(links)
+
+    def _sync_itinerary(
+        self,
+        db: Session,
+        tour: Tour,
+        days_in: List[TourDayUpdate],
+        audit_user_id: Optional[int] = None,
+    ) -> Dict[str, int]:
+        """
+        Make the tour's itinerary match ``days_in``. Incoming days are matched
+        to existing ones by id, else by day_number; unmatched existing days
+        are deleted. The diff is computed once and applied with batched
+        statements in the caller's transaction, which commits it.
+        """
+        self._check_itinerary(db, days_in)
+
+        existing = {day.id: day for day in tour.itinerary}
+        claimed = {d.id for d in days_in if d.id is not None}
+        by_number = {
+            day.day_number: day for day in tour.itinerary if day.id not in claimed
+        }
+
+        updates, new_days, kept = [], [], set()
+        wanted_links: Dict[int, set] = {}
+
+        for day_in in days_in:
+            fields = self._day_fields(day_in, audit_user_id)
+            set_activities = "activity_ids" in day_in.model_fields_set
+            activity_ids = day_in.activity_ids or []
+
+            if day_in.id is not None:
+                day = existing.get(day_in.id)
+                if not day:
+                    raise HTTPException(
+                        status_code=status.HTTP_404_NOT_FOUND,
+                        detail={"message": f"Tour day {day_in.id} not found"},
+                    )
+            else:
+                day = by_number.get(day_in.day_number)
+
+            if day:
+                kept.add(day.id)
+                updates.append({"id": day.id, **fields})
+                if set_activities:
+                    wanted_links[day.id] = set(activity_ids)
+                continue
+
+            if day_in.day_number is None or not day_in.title:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail={"message": "New days need a day_number and a title"},
+                )
+            new_days.append(day_in)
+
+        # Kept days keep their numbers unless given new ones
+        numbers = [
+            row.get("day_number", existing[row["id"]].day_number) for row in updates
+        ] + [day_in.day_number for day_in in new_days]
+        if len(numbers) != len(set(numbers)):
+            raise _invalid_itinerary(
+                {"day_number": {"message": "Day numbers must be unique"}}
+            )
+
+        deleted = [id for id in existing if id not in kept]
+
+        # Association changes for kept days
+        added_links, removed_links = [], []
+        for day_id, wanted in wanted_links.items():
+            current = set(existing[day_id].activity_ids)
+            added_links += [(day_id, a) for a in wanted - current]
+            removed_links += [(day_id, a) for a in current - wanted]
+
+        if deleted:
+            db.execute(
+                delete(tour_day_activities).where(
+                    tour_day_activities.c.tour_day_id.in_(deleted)
+                )
+            )
+            db.execute(
+                delete(models.TourDay)
+                .where(models.TourDay.id.in_(deleted))
+                .execution_options(synchronize_session=False)
+            )
+
+        if removed_links:
+            db.execute(
+                delete(tour_day_activities).where(
+                    tuple_(
+                        tour_day_activities.c.tour_day_id,
+                        tour_day_activities.c.activity_id,
+                    ).in_(removed_links)
+                )
+            )
+
+        updates = [row for row in updates if len(row) > 1]
+        if updates:
+            db.execute(update(models.TourDay), updates)
+
+        if added_links:
+            db.execute(
+                insert(tour_day_activities),
+                [{"tour_day_id": d, "activity_id": a} for d, a in added_links],
+            )
+
+        linked = len(added_links)
+        if new_days:
+            linked += self._insert_days(db, tour.id, new_days, audit_user_id)
+
+        return {
+            "days_added": len(new_days),
+            "days_updated": len(kept),
+            "days_deleted": len(deleted),
+            "activities_linked": linked,
+            "activities_unlinked": len(removed_links),
+        }
 
     def _filter_search_query(
         self,
@@ -161,27 +383,13 @@ class TourRepository(BaseRepository[Tour, TourCreate, TourUpdate]):
                 )
 
         # Apply search query
-        if search and search.search_query:
-            search_filters = []
-            for field in search.search_fields:
-                if hasattr(self.model, field):
-                    col = getattr(self.model, field)
-                    search_filters.append(col.ilike(f"%{search.search_query}%"))
-            if search_filters:
-                conditions.append(or_(*search_filters))
+        search_condition, relevance = self._search(db, search)
+        if search_condition is not None:
+            conditions.append(search_condition)
 
         query = query.filter(*conditions)
 
-        # Apply sorting
-        if sort and hasattr(self.model, sort.sort):
-            column = getattr(self.model, sort.sort)
-            query = query.order_by(
-                column.desc() if sort.direction == SortOrder.desc else column.asc()
-            )
-        else:
-            query = query.order_by(self.model.id.desc())
-
-        return query
+        return self._apply_sort(query, sort, relevance)
 
 
 # Create singleton instance
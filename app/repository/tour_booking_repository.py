@@ -2,10 +2,10 @@ from typing import Optional
 
 from sqlalchemy.orm import Session
 
-from app import schema
+from app import schema, models
 from app.models.tour_booking import TourBooking
 from app.repository import BaseRepository
-from app.repository.base import Model
+from app.repository.base import Model, LoadProfile
 from app.schema import TourBookingCreate
 from app.schema.tour_booking import PaymentStatus, BookingStatus
 
@@ -13,6 +13,21 @@ from app.schema.tour_booking import PaymentStatus, BookingStatus
 class TourBookingRepository(
     BaseRepository[schema.TourBooking, TourBookingCreate, None]
 ):
+    # schema.TourBooking
+    load_profiles = {
+        profile: (
+            (
+                TourBooking.tour,
+                models.Tour.destination,
+                models.Destination.city,
+                models.City.country,
+            ),
+            (TourBooking.tour, models.Tour.media),
+            (TourBooking.tour, models.Tour.destination, models.Destination.media),
+            (TourBooking.country,),
+        )
+        for profile in LoadProfile
+    }
 
     def __init__(self):
         super().__init__(TourBooking)
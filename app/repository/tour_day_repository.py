@@ -4,11 +4,20 @@ from sqlalchemy.orm import Session
 
 from app import models
 from app.models.tour import TourDay
-from app.repository.base import BaseRepository, get_object_or_404
+from app.repository.base import BaseRepository, get_object_or_404, LoadProfile
 from app.schema import TourDayUpdate, TourDayCreate
 
 
 class TourDayRepository(BaseRepository[TourDay, TourDayCreate, TourDayUpdate]):
+    # schema.TourDay
+    load_profiles = {
+        profile: (
+            (TourDay.hotel, models.Hotel.city, models.City.country),
+            (TourDay.hotel, models.Hotel.media),
+            (TourDay.activities, models.Activity.media),
+        )
+        for profile in LoadProfile
+    }
 
     def __init__(self):
         super().__init__(TourDay)
@@ -107,7 +116,7 @@ class TourDayRepository(BaseRepository[TourDay, TourDayCreate, TourDayUpdate]):
 
             # Update fields
             for field, value in update_data.items():
-                if field not in ("activity_ids",):
+                if field not in ("id", "activity_ids"):
                     if hasattr(current_item, field):
                         setattr(current_item, field, value)
 
@@ -1,21 +1,86 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
 from fastapi import HTTPException, status
 from sqlalchemy.orm import Session
 
 from app import models
+from app.core.config import get_settings
 from app.core.security import (
     create_access_token,
     verify_password,
 )
 from app.repository.base import BaseRepository, CreateSchema
+from app.repository.versions import table_version
 from app.schema import AccessToken
 from app.utils.utils import tz_now
 
 
+class PrincipalCache:
+    """
+    Authenticated users by id, detached from any session. Entries are tied
+    to the users table's write version, so any committed change to a user
+    drops them. The TTL bounds staleness from writes made by other workers.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[int, Tuple[int, float, models.User]] = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Optional[models.User]:
+        table = models.User.__tablename__
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if not entry:
+                return None
+
+            version, expires_at, user = entry
+            if version != table_version(table) or expires_at < time.monotonic():
+                del self._entries[user_id]
+                return None
+
+            self._entries.move_to_end(user_id)
+            return user
+
+    def set(self, user_id: int, user: models.User, version: int):
+        ttl = get_settings().PRINCIPAL_CACHE_TTL_SECONDS
+        with self._lock:
+            self._entries[user_id] = (version, time.monotonic() + ttl, user)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+principal_cache = PrincipalCache()
+
+
 class UserRepository(BaseRepository[models.User, CreateSchema, CreateSchema]):
     def __init__(self):
         super().__init__(models.User)
 
-    async def authenticate_user(self, db: Session, email, password) -> AccessToken:
+    def get_principal(self, db: Session, id: int) -> Optional[models.User]:
+        """The user behind an access token, from the principal cache"""
+        if (user := principal_cache.get(id)) is None:
+            # Read first: a write committed during the load invalidates it
+            version = table_version(self.model.__tablename__)
+            if (user := self.get(db=db, id=id)) is None:
+                return None
+            db.expunge(user)
+            principal_cache.set(id, user, version)
+
+        # A per-session copy of the cached instance, without a query
+        return db.merge(user, load=False)
+
+    def authenticate_user(self, db: Session, email, password) -> AccessToken:
         try:
             # Find user by phone number
             user = db.query(models.User).filter_by(email=email).first()
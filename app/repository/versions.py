@@ -0,0 +1,67 @@
+"""Per-table write versions used to invalidate derived data (counts, caches)"""
+import threading
+from collections import defaultdict
+from itertools import chain
+from typing import Callable, Dict, Iterable, List, Set
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+_WRITTEN_TABLES = "written_tables"
+
+_lock = threading.Lock()
+_table_versions: Dict[str, int] = defaultdict(int)
+_listeners: List[Callable[[Set[str]], None]] = []
+
+
+def table_version(table: str) -> int:
+    return _table_versions[table]
+
+
+def bump_table_versions(tables: Iterable[str]):
+    tables = set(tables)
+    with _lock:
+        for table in tables:
+            _table_versions[table] += 1
+
+    for listener in _listeners:
+        listener(tables)
+
+
+def on_version_bump(listener: Callable[[Set[str]], None]):
+    """Call ``listener`` with the written tables after every bump"""
+    _listeners.append(listener)
+    return listener
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_written_tables(session: Session, _flush_context):
+    # new/dirty/deleted still describe the pre-flush state here
+    tables = session.info.setdefault(_WRITTEN_TABLES, set())
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if table := getattr(obj, "__tablename__", None):
+            tables.add(table)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_bulk_writes(state):
+    # Bulk INSERT/UPDATE/DELETE statements bypass the flush
+    if state.is_insert or state.is_update or state.is_delete:
+        if table := getattr(state.statement.table, "name", None):
+            tables = state.session.info.setdefault(_WRITTEN_TABLES, set())
+            tables.add(table)
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_written_tables(session: Session):
+    # Bumped only once the rows are visible to other sessions
+    if tables := session.info.pop(_WRITTEN_TABLES, None):
+        bump_table_versions(tables)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_written_tables(session: Session, _previous_transaction):
+    session.info.pop(_WRITTEN_TABLES, None)
+
+
+__all__ = ["table_version", "bump_table_versions", "on_version_bump"]
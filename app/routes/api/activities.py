@@ -1,35 +1,42 @@
-from typing import Optional
+from typing import List, Optional
 
 from fastapi import APIRouter, Depends, status, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.core.database import get_db
+from app.core.database import get_async_db, get_db
 from app.repository.activity import activity_repository
+from app.repository.base import LoadProfile
 from app.routes.deps import current_user
-from app.schema import Pagination
+from app.schema import Pagination, BulkResult
 from app.schema.activity import ActivityCreate, ActivityUpdate, Activity
 
 router = APIRouter(prefix="/activities", tags=["activities"])
 
 
 @router.get("/", response_model=Pagination[Activity])
-def list_activities(
-    db: Session = Depends(get_db),
+async def list_activities(
+    db: AsyncSession = Depends(get_async_db),
     page: int = Query(1, ge=1),
     limit: int = Query(100, ge=1, le=100),
     activity_type: Optional[str] = Query(None, pattern="^(included|optional)$"),
+    count: bool = Query(True, description="Set to false to skip the total count"),
 ):
     filters = {"is_active": True}
 
     if activity_type:
         filters["type"] = activity_type
 
-    return activity_repository.get_all_paginated(db, limit=limit, page=page, **filters)
+    return await activity_repository.aget_all_paginated(
+        db, limit=limit, page=page, with_count=count, cached=True, **filters
+    )
 
 
 @router.get("/{activity_id}", response_model=Activity)
-def get_activity(activity_id: int, db: Session = Depends(get_db)):
-    return activity_repository.get_object_or_404(db, id=activity_id)
+async def get_activity(activity_id: int, db: AsyncSession = Depends(get_async_db)):
+    return await activity_repository.aget_object_or_404(
+        db, profile=LoadProfile.DETAIL, cached=True, id=activity_id
+    )
 
 
 @router.post("/", response_model=Activity, status_code=status.HTTP_201_CREATED)
@@ -41,6 +48,18 @@ def create_activity(
     return activity_repository.create(db, activity_in, audit_user_id=user.id)
 
 
+@router.post(
+    "/batch", response_model=BulkResult, status_code=status.HTTP_201_CREATED
+)
+def create_activities(
+    activities_in: List[ActivityCreate],
+    db: Session = Depends(get_db),
+    user=Depends(current_user),
+):
+    ids = activity_repository.bulk_create(db, activities_in, audit_user_id=user.id)
+    return BulkResult(ids=ids, count=len(ids))
+
+
 @router.put("/{activity_id}", response_model=Activity)
 def update_activity(
     activity_id: int,
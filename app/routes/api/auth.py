@@ -9,9 +9,9 @@ router = APIRouter(prefix="/auth", tags=["auth"])
 
 
 @router.post("/login/", response_model=schema.AccessToken)
-async def login(
+def login(
     db: Session = SessionDep,
     email: str = Body(..., embed=True),
     password=Body(..., embed=True),
 ):
-    return await user_repository.authenticate_user(db, email=email, password=password)
+    return user_repository.authenticate_user(db, email=email, password=password)
@@ -1,12 +1,28 @@
 import json
 from typing import Optional
 
-from fastapi import APIRouter, Depends, Query, status, Form, UploadFile, File
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    Query,
+    Request,
+    Response,
+    status,
+    Form,
+    UploadFile,
+    File,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.core.database import get_db
+from app import models
+from app.core.database import get_async_db, get_db, get_session_factory
+from app.repository.base import SearchModel
 from app.repository.destination import destination_repository
+from app.repository.media import media_repository
 from app.routes.deps import current_user
+from app.routes.http_cache import json_response, not_modified, set_validators
 from app.schema import Pagination
 from app.schema.destination import (
     DestinationCreate,
@@ -14,18 +30,21 @@ from app.schema.destination import (
     Destination,
     DestinationDetailed,
 )
-from app.utils.utils import upload_image
 
 router = APIRouter(prefix="/destinations", tags=["destinations"])
 
 
 @router.get("/", response_model=Pagination[Destination])
-def list_destinations(
-    db: Session = Depends(get_db),
+async def list_destinations(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
     page: int = Query(1, ge=1),
     limit: int = Query(100, ge=1, le=100),
     city_id: Optional[int] = None,
     country_id: Optional[int] = None,
+    q: Optional[str] = Query(None),
+    count: bool = Query(True, description="Set to false to skip the total count"),
 ):
     filters = {}
     if city_id:
@@ -34,20 +53,42 @@ def list_destinations(
     if country_id:
         filters["country_id"] = country_id
 
-    return destination_repository.get_all_paginated(
-        db, page=page, limit=limit, **filters
-    )
+    search = None
+    if q:
+        search = SearchModel(
+            q, search_fields=list(models.Destination.__search_fields__)
+        )
+
+    params = dict(page=page, limit=limit, search=search, with_count=count, **filters)
+    version = await destination_repository.alist_version(db, **params)
+    if cached := not_modified(request, version):
+        return cached
+    set_validators(response, version)
+
+    return await destination_repository.aget_all_paginated(db, cached=True, **params)
 
 
 @router.get("/{slug}", response_model=DestinationDetailed)
-def get_destination(slug: str, db: Session = Depends(get_db)):
-    return destination_repository.get_object_or_404(db, slug=slug)
+async def get_destination(
+    slug: str, request: Request, db: AsyncSession = Depends(get_async_db)
+):
+    id, version = await destination_repository.adetail_version(
+        db, DestinationDetailed, slug=slug
+    )
+    if cached := not_modified(request, version):
+        return cached
+
+    body = await destination_repository.arender_detail(
+        db, DestinationDetailed, id, version
+    )
+    return json_response(body, version)
 
 
 @router.post(
     "/", response_model=DestinationDetailed, status_code=status.HTTP_201_CREATED
 )
 def create_destination(
+    background_tasks: BackgroundTasks,
     name: str = Form(...),
     description: Optional[str] = Form(None),
     city_id: int = Form(...),
@@ -57,9 +98,11 @@ def create_destination(
     image: Optional[UploadFile] = Form(None),
     hotel_ids: Optional[str] = Form(None),
     db: Session = Depends(get_db),
+    sessions=Depends(get_session_factory),
     user=Depends(current_user),
 ):
-
+    url = media_repository.upload(db, image)
+    background_tasks.add_task(media_repository.generate_variants, [url], sessions)
     data = DestinationCreate(
         name=name,
         description=description,
@@ -68,7 +111,7 @@ def create_destination(
         highlights=highlights.split(",") if highlights else None,
         visitor_info=json.loads(visitor_info) if visitor_info else None,
         hotel_ids=hotel_ids.split(",") if hotel_ids else None,
-        image=upload_image(image),
+        image=url,
     )
 
     return destination_repository.create(db, data, audit_user_id=user.id)
@@ -77,6 +120,7 @@ def create_destination(
 @router.put("/{destination_id}", response_model=DestinationDetailed)
 def update_destination(
     destination_id: int,
+    background_tasks: BackgroundTasks,
     name: Optional[str] = Form(None),
     description: Optional[str] = Form(None),
     city_id: Optional[int] = Form(None),
@@ -86,9 +130,11 @@ def update_destination(
     hotel_ids: Optional[str] = Form(None),
     image: Optional[UploadFile] = File(None),
     db: Session = Depends(get_db),
+    sessions=Depends(get_session_factory),
     user=Depends(current_user),
 ):
-
+    url = media_repository.upload(db, image)
+    background_tasks.add_task(media_repository.generate_variants, [url], sessions)
     data = DestinationUpdate(
         name=name,
         description=description,
@@ -97,7 +143,7 @@ def update_destination(
         highlights=highlights.split(",") if highlights else None,
         visitor_info=json.loads(visitor_info) if visitor_info else None,
         hotel_ids=hotel_ids.split(",") if hotel_ids else None,
-        image=upload_image(image),
+        image=url,
     )
 
     current = destination_repository.get_object_or_404(db, id=destination_id)
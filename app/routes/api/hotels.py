@@ -1,27 +1,55 @@
 from typing import Optional, List
 
-from fastapi import APIRouter, Depends, Query, status, Form, UploadFile, File
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    status,
+    Form,
+    UploadFile,
+    File,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.core.database import get_db
+from app import models
+from app.core.database import get_async_db, get_db, get_session_factory
+from app.repository.base import SearchModel
 from app.repository.hotel import hotel_repository
+from app.repository.media import media_repository, upload_repository
 from app.repository.setups import city_repository
 from app.routes.deps import current_user
-from app.schema import Pagination, HotelDetailed
+from app.routes.http_cache import json_response, not_modified
+from app.schema import Pagination, HotelDetailed, BulkResult
 from app.schema.hotel import Hotel, HotelCreate, HotelUpdate
-from app.utils.utils import upload_image
 
 router = APIRouter(prefix="/hotels", tags=["hotels"])
 
 
+def parse_upload_ids(value: str) -> List[int]:
+    try:
+        return [int(id) for id in value.split(",")]
+    except ValueError:
+        raise HTTPException(
+            status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail={"message": "upload_ids must be comma separated upload ids"},
+        )
+
+
 @router.get("/", response_model=Pagination[Hotel])
-def list_hotels(
-    db: Session = Depends(get_db),
+async def list_hotels(
+    db: AsyncSession = Depends(get_async_db),
     page: int = Query(1, ge=1),
     limit: int = Query(100, ge=1, le=100),
     city_id: Optional[int] = Query(None),
     country_id: Optional[int] = Query(None),
     is_active: Optional[bool] = Query(None),
+    q: Optional[str] = Query(None),
+    after: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    count: bool = Query(True, description="Set to false to skip the total count"),
 ):
     filters = {}
 
@@ -33,16 +61,39 @@ def list_hotels(
     if is_active is not None:
         filters["is_active"] = is_active
 
-    return hotel_repository.get_all_paginated(db, page=page, limit=limit, **filters)
+    search = None
+    if q:
+        search = SearchModel(q, search_fields=list(models.Hotel.__search_fields__))
+
+    return await hotel_repository.aget_all_paginated(
+        db,
+        page=page,
+        limit=limit,
+        search=search,
+        after=after,
+        with_count=count,
+        cached=True,
+        **filters,
+    )
 
 
 @router.get("/{hotel_id}", response_model=HotelDetailed)
-def get_hotel(hotel_id: int, db: Session = Depends(get_db)):
-    return hotel_repository.get_object_or_404(db, id=hotel_id)
+async def get_hotel(
+    hotel_id: int, request: Request, db: AsyncSession = Depends(get_async_db)
+):
+    id, version = await hotel_repository.adetail_version(
+        db, HotelDetailed, id=hotel_id
+    )
+    if cached := not_modified(request, version):
+        return cached
+
+    body = await hotel_repository.arender_detail(db, HotelDetailed, id, version)
+    return json_response(body, version)
 
 
 @router.post("/", response_model=HotelDetailed, status_code=status.HTTP_201_CREATED)
-async def create_hotel(
+def create_hotel(
+    background_tasks: BackgroundTasks,
     name: str = Form(...),
     price_per_night: Optional[str] = Form(None),
     category: Optional[str] = Form(None),
@@ -53,13 +104,20 @@ async def create_hotel(
     max_guests: Optional[int] = Form(2),
     amenities: Optional[str] = Form(None),
     files: List[UploadFile] = File(default=[]),
+    # Completed chunked uploads (/uploads), comma separated
+    upload_ids: Optional[str] = Form(None),
     db: Session = Depends(get_db),
+    sessions=Depends(get_session_factory),
     city_id: int = Form(None),
     user=Depends(current_user),
 ):
     urls = None
     if files:
-        urls = [upload_image(i, is_public=True) for i in files]
+        urls = media_repository.upload_many(db, files)
+        background_tasks.add_task(media_repository.generate_variants, urls, sessions)
+    if upload_ids:
+        ids = parse_upload_ids(upload_ids)
+        urls = (urls or []) + upload_repository.completed_urls(db, ids, user.id)
 
     city = city_repository.get_object_or_404(db, id=city_id)
     hotel_data = HotelCreate(
@@ -80,9 +138,22 @@ async def create_hotel(
     return hotel_repository.create(db, hotel_data, audit_user_id=user.id)
 
 
+@router.post(
+    "/batch", response_model=BulkResult, status_code=status.HTTP_201_CREATED
+)
+def create_hotels(
+    hotels: List[HotelCreate],
+    db: Session = Depends(get_db),
+    user=Depends(current_user),
+):
+    ids = hotel_repository.bulk_create(db, hotels, audit_user_id=user.id)
+    return BulkResult(ids=ids, count=len(ids))
+
+
 @router.put("/{hotel_id}", response_model=HotelDetailed)
-async def update_hotel(
+def update_hotel(
     hotel_id: int,
+    background_tasks: BackgroundTasks,
     name: Optional[str] = Form(None),
     category: Optional[str] = Form(None),
     rating: Optional[float] = Form(None),
@@ -93,14 +164,21 @@ async def update_hotel(
     max_guests: Optional[int] = Form(None),
     amenities: Optional[str] = Form(None),
     files: List[UploadFile] = File(default=[]),
+    # Completed chunked uploads (/uploads), comma separated
+    upload_ids: Optional[str] = Form(None),
     is_active: Optional[bool] = Form(None),
     db: Session = Depends(get_db),
+    sessions=Depends(get_session_factory),
     user=Depends(current_user),
     city_id: Optional[int] = Form(None),
 ):
     urls = None
     if files:
-        urls = [upload_image(i, is_public=True) for i in files]
+        urls = media_repository.upload_many(db, files)
+        background_tasks.add_task(media_repository.generate_variants, urls, sessions)
+    if upload_ids:
+        ids = parse_upload_ids(upload_ids)
+        urls = (urls or []) + upload_repository.completed_urls(db, ids, user.id)
 
     country_id = None
     if city_id:
@@ -1,23 +1,28 @@
 from typing import List, Optional
 
-from fastapi import APIRouter, Body
+from fastapi import APIRouter, Body, Request, Response
 from fastapi.params import Query, Depends
 
 from app import schema
 from app.models import User
 from app.repository.base import SearchModel
 from app.repository.setups import country_repository, city_repository
-from app.routes.deps import SessionDep, current_user
+from app.routes.deps import AsyncSessionDep, SessionDep, current_user
+from app.routes.http_cache import not_modified, set_validators
 from app.schema import SortModel
 
 router = APIRouter(prefix="/setups", tags=["setups"])
 
 
 @router.get("/countries/", response_model=List[schema.Country])
-def countries(db=SessionDep):
-    return country_repository.get_all(
-        db=db, sort=SortModel(sort="name", direction="asc")
-    )
+async def countries(request: Request, response: Response, db=AsyncSessionDep):
+    sort = SortModel(sort="name", direction="asc")
+    version = await country_repository.alist_version(db, sort=sort)
+    if cached := not_modified(request, version):
+        return cached
+    set_validators(response, version)
+
+    return await country_repository.aget_all(db, sort=sort)
 
 
 @router.post("/countries/", response_model=schema.Country)
@@ -62,8 +67,8 @@ def delete_country(
 
 
 @router.get("/cities/", response_model=List[schema.City])
-def cities(
-    db=SessionDep,
+async def cities(
+    db=AsyncSessionDep,
     q: Optional[str] = Query(None),
     country_id: Optional[int] = Query(None),
 ):
@@ -76,8 +81,8 @@ def cities(
     if q:
         search = SearchModel(search_query=q, search_fields=["name"])
 
-    return city_repository.get_all(
-        db=db, search=search, sort=SortModel(sort="name", direction="asc"), **filters
+    return await city_repository.aget_all(
+        db, search=search, sort=SortModel(sort="name", direction="asc"), **filters
     )
 
 
@@ -88,6 +93,16 @@ def create_cities(
     return city_repository.create(db=db, item=city, audit_user_id=user.id)
 
 
+@router.post("/cities/batch", response_model=schema.BulkResult, status_code=201)
+def create_cities_batch(
+    db=SessionDep,
+    cities: List[schema.CityCreate] = Body(),
+    user: User = Depends(current_user),
+):
+    ids = city_repository.bulk_create(db=db, items=cities, audit_user_id=user.id)
+    return schema.BulkResult(ids=ids, count=len(ids))
+
+
 @router.put("/cities/{id}", response_model=schema.City)
 def update_cities(
     id: int,
@@ -1,13 +1,25 @@
 from typing import Optional
 
-from fastapi import APIRouter, Depends, status, UploadFile
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    Request,
+    Response,
+    status,
+    UploadFile,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.core.database import get_db
+from app import models
+from app.core.database import get_async_db, get_db, get_session_factory
+from app.repository.base import SearchModel
+from app.repository.media import media_repository
 from app.repository.tour import tour_repository
 from app.routes.deps import current_user
+from app.routes.http_cache import json_response, not_modified, set_validators
 from app.schema import TourCreate, TourUpdate, Pagination, Tour, TourDetailed
-from app.utils.utils import upload_image
 
 router = APIRouter(prefix="/tours", tags=["tours"])
 
@@ -22,14 +34,18 @@ def create_tour(
 
 
 @router.get("/", response_model=Pagination[Tour])
-def list_tours(
+async def list_tours(
+    request: Request,
+    response: Response,
     page: int = 1,
     limit: int = 100,
     destination_id: Optional[int] = None,
     city_id: Optional[int] = None,
     country_id: Optional[int] = None,
     is_active: Optional[bool] = None,
-    db: Session = Depends(get_db),
+    q: Optional[str] = None,
+    count: bool = True,
+    db: AsyncSession = Depends(get_async_db),
 ):
 
     filters = {}
@@ -42,15 +58,31 @@ def list_tours(
     if is_active is not None:
         filters["is_active"] = is_active
 
-    return tour_repository.get_all_paginated(db, page=page, limit=limit, **filters)
+    search = None
+    if q:
+        search = SearchModel(q, search_fields=list(models.Tour.__search_fields__))
+
+    params = dict(page=page, limit=limit, search=search, with_count=count, **filters)
+    version = await tour_repository.alist_version(db, **params)
+    if cached := not_modified(request, version):
+        return cached
+    set_validators(response, version)
+
+    return await tour_repository.aget_all_paginated(db, cached=True, **params)
 
 
 @router.get("/{slug}", response_model=TourDetailed)
-def get_tour(
+async def get_tour(
     slug: str,
-    db: Session = Depends(get_db),
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
 ):
-    return tour_repository.get_object_or_404(db, slug=slug)
+    id, version = await tour_repository.adetail_version(db, TourDetailed, slug=slug)
+    if cached := not_modified(request, version):
+        return cached
+
+    body = await tour_repository.arender_detail(db, TourDetailed, id, version)
+    return json_response(body, version)
 
 
 @router.put("/{tour_id}", response_model=TourDetailed)
@@ -71,8 +103,17 @@ def update_tour(
 
 
 @router.post("/upload/file", response_model=str)
-def upload_file(file: UploadFile, _user=Depends(current_user)):
-    return upload_image(file)
+def upload_file(
+    file: UploadFile,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    sessions=Depends(get_session_factory),
+    _user=Depends(current_user),
+):
+    url = media_repository.upload(db, file)
+    db.commit()
+    background_tasks.add_task(media_repository.generate_variants, [url], sessions)
+    return url
 
 
 @router.delete("/{tour_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -31,6 +31,8 @@ def list_bookings(
     limit: int = Query(100, ge=1, le=100),
     status: Optional[str] = Query(None),
     payment_status: Optional[str] = Query(None),
+    after: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    count: bool = Query(True, description="Set to false to skip the total count"),
     _user=Depends(current_user),
 ):
     filters = {}
@@ -42,7 +44,9 @@ def list_bookings(
     if payment_status:
         filters["payment_status"] = payment_status
 
-    return tour_booking.get_all_paginated(db, page=page, limit=limit, **filters)
+    return tour_booking.get_all_paginated(
+        db, page=page, limit=limit, after=after, with_count=count, **filters
+    )
 
 
 @router.put("/{booking_id}", response_model=TourBooking)
@@ -1,7 +1,9 @@
 from fastapi import APIRouter, Depends, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.core.database import get_db
+from app.core.database import get_async_db, get_db
+from app.repository.base import LoadProfile
 from app.repository.tour_day_repository import tour_day_repository
 from app.routes.deps import current_user
 from app.schema import TourDayCreate, TourDayUpdate, TourDay
@@ -19,8 +21,10 @@ def create_tour_day(
 
 
 @router.get("/{day_id}", response_model=TourDay)
-def get_tour_day(day_id: int, db: Session = Depends(get_db)):
-    return tour_day_repository.get_object_or_404(db, id=day_id)
+async def get_tour_day(day_id: int, db: AsyncSession = Depends(get_async_db)):
+    return await tour_day_repository.aget_object_or_404(
+        db, profile=LoadProfile.DETAIL, id=day_id
+    )
 
 
 @router.put("/{day_id}", response_model=TourDay)
@@ -0,0 +1,57 @@
+from fastapi import APIRouter, BackgroundTasks, Body, Depends, Header, status
+from sqlalchemy.orm import Session
+
+from app.core.database import get_db, get_session_factory
+from app.repository.media import media_repository, upload_repository
+from app.routes.deps import current_user
+from app.schema.media import MediaUpload, MediaUploadCreate
+
+router = APIRouter(prefix="/uploads", tags=["uploads"])
+
+
+@router.post("/", response_model=MediaUpload, status_code=status.HTTP_201_CREATED)
+def start_upload(
+    upload_in: MediaUploadCreate,
+    db: Session = Depends(get_db),
+    user=Depends(current_user),
+):
+    return upload_repository.start(db, upload_in, user_id=user.id)
+
+
+@router.get("/{upload_id}", response_model=MediaUpload)
+def get_upload(
+    upload_id: int,
+    db: Session = Depends(get_db),
+    user=Depends(current_user),
+):
+    """Where to resume: the next part to send is ``received``"""
+    return upload_repository.get_object_or_404(db, id=upload_id, user_id=user.id)
+
+
+@router.put("/{upload_id}/parts/{index}", response_model=MediaUpload)
+def upload_part(
+    upload_id: int,
+    index: int,
+    data: bytes = Body(..., media_type="application/octet-stream"),
+    checksum: str = Header(..., alias="X-Chunk-SHA256"),
+    db: Session = Depends(get_db),
+    user=Depends(current_user),
+):
+    upload = upload_repository.get_object_or_404(db, id=upload_id, user_id=user.id)
+    return upload_repository.put_part(db, upload, index, data, checksum.lower())
+
+
+@router.post("/{upload_id}/complete", response_model=MediaUpload)
+def complete_upload(
+    upload_id: int,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    sessions=Depends(get_session_factory),
+    user=Depends(current_user),
+):
+    upload = upload_repository.get_object_or_404(db, id=upload_id, user_id=user.id)
+    upload = MediaUpload.model_validate(upload_repository.complete(db, upload))
+    background_tasks.add_task(
+        media_repository.generate_variants, [upload.url], sessions
+    )
+    return upload
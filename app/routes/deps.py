@@ -2,11 +2,12 @@ from logging import getLogger
 
 from fastapi import Depends, Security, HTTPException, Request
 from fastapi.security import HTTPBearer, HTTPBasicCredentials
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app import models
 from app.core.config import Settings, get_settings
-from app.core.database import get_db
+from app.core.database import get_async_db, get_db
 from app.core.security import decode_access_token
 from app.repository.user import user_repository
 
@@ -15,6 +16,7 @@ logger = getLogger()
 auth_token_bearer = HTTPBearer(auto_error=True)
 
 SessionDep: Session = Depends(get_db)
+AsyncSessionDep: AsyncSession = Depends(get_async_db)
 
 
 def current_user(
@@ -30,7 +32,7 @@ def current_user(
     if not credentials:
         raise credentials_exception
     if access_token := decode_access_token(credentials.credentials, settings=settings):
-        if user := user_repository.get(db=db, id=int(access_token.sub)):
+        if user := user_repository.get_principal(db=db, id=int(access_token.sub)):
             return user
 
     raise credentials_exception
@@ -38,12 +40,12 @@ def current_user(
 
 def validate_auth_cookie(
     request: Request,
+    db: Session = SessionDep,
     settings: Settings = Depends(get_settings),
 ):
     authorization_cookie = request.cookies.get("authorization")
     if authorization_cookie:
         if access_token := decode_access_token(authorization_cookie, settings=settings):
-            db = next(get_db())
-            if user := user_repository.get(db=db, id=int(access_token.sub)):
+            if user := user_repository.get_principal(db, id=int(access_token.sub)):
                 return user
     return None
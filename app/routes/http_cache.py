@@ -0,0 +1,80 @@
+"""Conditional GET support (ETag / If-None-Match) for public catalog routes"""
+import hashlib
+import os
+from typing import Dict, Optional
+
+from fastapi import Request, Response, status
+from starlette.staticfiles import StaticFiles
+
+from app.core.config import get_settings
+from app.utils.storage import BLOB_PREFIX, IMMUTABLE_CACHE_CONTROL
+
+
+def make_etag(version: str) -> str:
+    """Strong ETag for a repository version string"""
+    return f'"{hashlib.sha1(version.encode()).hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+
+    # If-None-Match uses weak comparison, so W/ prefixes are ignored
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in [t[2:] if t.startswith("W/") else t for t in tags]
+
+
+def cache_headers(etag: str) -> Dict[str, str]:
+    settings = get_settings()
+    return {
+        "ETag": etag,
+        "Cache-Control": (
+            f"public, max-age={settings.HTTP_CACHE_MAX_AGE}, "
+            f"stale-while-revalidate={settings.HTTP_CACHE_STALE_WHILE_REVALIDATE}"
+        ),
+        "Vary": "Accept-Encoding",
+    }
+
+
+def not_modified(request: Request, version: str) -> Optional[Response]:
+    """A 304 response when the client already has ``version``, else None"""
+    etag = make_etag(version)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers(etag)
+        )
+    return None
+
+
+def json_response(body: bytes, version: str) -> Response:
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers=cache_headers(make_etag(version)),
+    )
+
+
+def set_validators(response: Response, version: str):
+    """Add the validators to a response FastAPI will render"""
+    response.headers.update(cache_headers(make_etag(version)))
+
+
+class MediaFiles(StaticFiles):
+    """The media/ folder; content-addressed blobs are cached for good"""
+
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        if self.get_path(scope).startswith(BLOB_PREFIX + os.sep):
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
+
+
+__all__ = [
+    "make_etag",
+    "etag_matches",
+    "cache_headers",
+    "not_modified",
+    "json_response",
+    "set_validators",
+    "MediaFiles",
+]
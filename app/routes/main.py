@@ -9,6 +9,7 @@ from .api import (
     tour,
     tour_day,
     tour_booking,
+    uploads,
 )
 
 router = APIRouter()
@@ -21,3 +22,4 @@ router.include_router(hotels.router)
 router.include_router(tour.router)
 router.include_router(tour_day.router)
 router.include_router(tour_booking.router)
+router.include_router(uploads.router)
@@ -45,7 +45,7 @@ async def get_redoc_documentation(
     "/docs/login", response_class=HTMLResponse, include_in_schema=False
 )
 @swagger_router.get("/docs/login", response_class=HTMLResponse, include_in_schema=False)
-async def auth_login(
+def auth_login(
     request: Request,
     next_url: Optional[str] = None,
     email: Optional[str] = Form(None),
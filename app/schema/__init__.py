@@ -53,6 +53,11 @@ class MessageResponse(BaseModel):
     ]
 
 
+class BulkResult(BaseModel):
+    ids: List[int]
+    count: int
+
+
 class ErrorResponse(BaseModel):
     message: str
     detail: Annotated[
@@ -66,8 +71,12 @@ DataSchema = TypeVar("DataSchema", bound=BaseModel)
 class Pagination(BaseModel, Generic[DataSchema]):
     data: List[DataSchema]
     page: int
-    pages: int
+    pages: Optional[int] = None
     count: Optional[int] = None
+    count_strategy: Optional[str] = Field(
+        None, description="How count was obtained: exact, cached, estimated, skipped"
+    )
+    next_cursor: Optional[str] = None
 
     class Config:
         from_attributes = True
@@ -1,6 +1,8 @@
-from typing import Optional
+from typing import List, Optional
 
-from pydantic import Field, BaseModel
+from pydantic import Field, BaseModel, computed_field
+
+from app.schema.media import MediaBlob, ResponsiveImage, responsive_image
 
 
 class ActivityBase(BaseModel):
@@ -25,6 +27,12 @@ class ActivityUpdate(BaseModel):
 
 class Activity(ActivityBase):
     id: int
+    media: List[MediaBlob] = Field([], exclude=True)
+
+    @computed_field
+    @property
+    def responsive_image(self) -> Optional[ResponsiveImage]:
+        return responsive_image(self.image, self.media)
 
     class Config:
         from_attributes = True
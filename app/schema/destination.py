@@ -1,8 +1,9 @@
 from typing import Optional, List, Dict
 
-from pydantic import Field, BaseModel
+from pydantic import Field, BaseModel, computed_field
 
 from app.schema.hotel import Hotel
+from app.schema.media import MediaBlob, ResponsiveImage, responsive_image
 from app.schema.setups import City
 
 
@@ -37,6 +38,12 @@ class Destination(DestinationBase):
     is_active: bool
     hotels: List[Hotel]
     city: City
+    media: List[MediaBlob] = Field([], exclude=True)
+
+    @computed_field
+    @property
+    def responsive_image(self) -> Optional[ResponsiveImage]:
+        return responsive_image(self.image, self.media)
 
     class Config:
         from_attributes = True
@@ -1,7 +1,8 @@
 from typing import Optional, List
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, computed_field
 
+from app.schema.media import MediaBlob, ResponsiveImage, responsive_image
 from app.schema.setups import City
 
 
@@ -44,6 +45,13 @@ class Hotel(HotelBase):
     id: int
     amenities: Optional[List[str]] = Field([])
     city: City
+    media: List[MediaBlob] = Field([], exclude=True)
+
+    @computed_field
+    @property
+    def responsive_images(self) -> List[Optional[ResponsiveImage]]:
+        """One per entry of ``images``, None where there are no derivatives"""
+        return [responsive_image(url, self.media) for url in self.images or []]
 
     class Config:
         from_attributes = True
@@ -0,0 +1,105 @@
+from typing import List, Optional, Sequence
+
+from pydantic import BaseModel, Field, computed_field
+
+from app.utils.images import (
+    FORMATS,
+    PLACEHOLDER,
+    image_processor,
+    is_image,
+    variant_key,
+    variant_name,
+)
+from app.utils.storage import get_storage
+
+
+class ImageSource(BaseModel):
+    type: str
+    srcset: str
+
+
+class ResponsiveImage(BaseModel):
+    """An uploaded image's derivatives, shaped like ``<picture>`` sources"""
+
+    src: str
+    placeholder: str
+    sources: List[ImageSource]
+
+
+class MediaBlob(BaseModel):
+    """A stored blob, as loaded with a row through its ``media``"""
+
+    key: str
+    variants_ready: bool = False
+    variant_widths: Optional[List[int]] = None
+
+    class Config:
+        from_attributes = True
+
+
+def responsive_image(
+    url: Optional[str], media: Sequence[MediaBlob] = ()
+) -> Optional[ResponsiveImage]:
+    """
+    Derivatives of an image uploaded to storage, among the row's ``media``;
+    None for other URLs and until its derivatives are all stored
+    """
+    if not url or not image_processor.available:
+        return None
+
+    backend = get_storage()
+    key = backend.key_for(url)
+    if key is None or not is_image(key):
+        return None
+    blob = next((blob for blob in media if blob.key == key), None)
+    if blob is None or not blob.variants_ready or not blob.variant_widths:
+        return None
+
+    sources = []
+    for ext, (_, content_type) in FORMATS.items():
+        srcset = ", ".join(
+            f"{backend.url(variant_key(key, variant_name(width, ext)), True)} {width}w"
+            for width in blob.variant_widths
+        )
+        sources.append(ImageSource(type=content_type, srcset=srcset))
+
+    placeholder = backend.url(variant_key(key, PLACEHOLDER), True)
+    return ResponsiveImage(src=url, placeholder=placeholder, sources=sources)
+
+
+class MediaUploadCreate(BaseModel):
+    filename: str = Field(..., max_length=255)
+    content_type: Optional[str] = Field(None, max_length=255)
+    size: int = Field(..., gt=0)
+    sha256: str = Field(..., pattern="^[0-9a-f]{64}$")
+
+
+class MediaUpload(BaseModel):
+    """A chunked upload: send parts ``received`` to ``parts - 1``, then complete"""
+
+    id: int
+    filename: str
+    size: int
+    chunk_size: int
+    parts: int
+    received: int
+    blob: Optional[MediaBlob] = Field(None, exclude=True)
+
+    @computed_field
+    @property
+    def url(self) -> Optional[str]:
+        """Set once the upload is complete"""
+        return get_storage().url(self.blob.key, True) if self.blob else None
+
+    class Config:
+        from_attributes = True
+
+
+__all__ = [
+    "ImageSource",
+    "ResponsiveImage",
+    "MediaBlob",
+    "responsive_image",
+    "MediaUploadCreate",
+    "MediaUpload",
+]
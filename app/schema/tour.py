@@ -1,10 +1,11 @@
 from typing import Optional, List, Dict
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, computed_field
 
 from app.schema.activity import Activity
 from app.schema.destination import DestinationDetailed
 from app.schema.hotel import Hotel
+from app.schema.media import MediaBlob, ResponsiveImage, responsive_image
 from app.schema.setups import City
 
 
@@ -24,6 +25,8 @@ class TourDayCreate(TourDayBase):
 
 
 class TourDayUpdate(BaseModel):
+    # Only used to match days when syncing a tour's itinerary
+    id: Optional[int] = None
     day_number: Optional[int] = None
     title: Optional[str] = None
     description: Optional[str] = None
@@ -98,6 +101,12 @@ class _Destination(BaseModel):
     city_id: int
     slug: Optional[str] = None
     city: City
+    media: List[MediaBlob] = Field([], exclude=True)
+
+    @computed_field
+    @property
+    def responsive_image(self) -> Optional[ResponsiveImage]:
+        return responsive_image(self.image, self.media)
 
     class Config:
         from_attributes = True
@@ -106,6 +115,12 @@ class _Destination(BaseModel):
 class Tour(TourBase):
     id: int
     destination: _Destination
+    media: List[MediaBlob] = Field([], exclude=True)
+
+    @computed_field
+    @property
+    def responsive_image(self) -> Optional[ResponsiveImage]:
+        return responsive_image(self.image_url, self.media)
 
     class Config:
         from_attributes = True
@@ -1,7 +1,11 @@
+from sqlalchemy import event
 from starlette.testclient import TestClient
 
+from app.core import database
 from app.core.config import Settings
+from app.core.hashing import password_hasher
 from app.models import User
+from app.repository.user import principal_cache
 
 
 def test_login(settings: Settings, get_user: User, client: TestClient):
@@ -13,3 +17,77 @@ def test_login(settings: Settings, get_user: User, client: TestClient):
         },
     )
     assert response.status_code == 200
+
+
+def test_login_saturated(settings: Settings, get_user: User, client: TestClient):
+    # Every hashing slot taken by logins already in progress
+    for _ in range(password_hasher.max_pending):
+        password_hasher._slots.acquire()
+    try:
+        response = client.post(
+            "/auth/login/",
+            json={
+                "password": settings.TEST_USER_PASSWORD,
+                "email": settings.TEST_USER_EMAIL,
+            },
+        )
+    finally:
+        for _ in range(password_hasher.max_pending):
+            password_hasher._slots.release()
+
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "1"
+
+
+def test_current_user_cached(get_test_db, get_user: User, client, auth_headers):
+    engine = get_test_db.get_bind()
+    statements = []
+
+    def user_lookups(*payloads):
+        statements.clear()
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            for name, code in payloads:
+                response = client.post(
+                    "/setups/countries/",
+                    json={"name": name, "code": code},
+                    headers=auth_headers,
+                )
+                assert response.status_code == 200
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+        return [s for s in statements if "FROM users" in s]
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    user_lookups(("Principal One", "P1"))
+    assert user_lookups(("Principal Two", "P2"), ("Principal Three", "P3")) == []
+
+    # Committed changes to users drop the cached principals
+    get_user.full_name = "Jane Doe"
+    get_test_db.commit()
+    assert len(user_lookups(("Principal Four", "P4"))) == 1
+
+
+def test_docs_cookie_shares_request_session(client, auth_headers):
+    principal_cache.clear()
+    token = auth_headers["Authorization"].split()[1]
+    outside_checkouts = []
+
+    def record(*args):
+        outside_checkouts.append(args)
+
+    # Any session but the request's (overridden) one would use this engine
+    event.listen(database.engine, "checkout", record)
+    client.cookies.set("authorization", token)
+    try:
+        response = client.get("/openapi.json")
+    finally:
+        client.cookies.clear()
+        event.remove(database.engine, "checkout", record)
+
+    assert response.status_code == 200
+    assert outside_checkouts == []
+    # One session for the request, one checkout for the user lookup
+    assert 'db-checkouts;desc="1"' in response.headers["server-timing"]
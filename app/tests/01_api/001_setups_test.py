@@ -1,3 +1,6 @@
+from app.models import Country
+from app.repository.setups import country_repository
+from app.schema import CountryCreate
 from app.tests.conftest import get_test_db, get_country
 
 
@@ -48,3 +51,15 @@ def test_update_city(client, get_test_db, get_country, get_city, auth_headers):
 
     data = response.json()
     assert data["name"] == "Mombase"
+
+
+def test_upsert_countries(get_test_db):
+    ids = country_repository.bulk_upsert(
+        get_test_db,
+        [CountryCreate(name="Tanzania", code="TZ"), CountryCreate(name="Uganda")],
+    )
+    again = country_repository.bulk_upsert(
+        get_test_db, [CountryCreate(name="Uganda", code="UG")]
+    )
+    assert again == ids[1:]
+    assert get_test_db.get(Country, ids[1]).code == "UG"
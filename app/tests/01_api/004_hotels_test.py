@@ -1,6 +1,17 @@
+import asyncio
+import base64
 import io
+import pickle
+
+from sqlalchemy.dialects import postgresql
 
 from app.models.hotel import Hotel
+from app.models.search import search_document
+from app.repository.base import SearchModel
+from app.repository.cache import KEY_PREFIX, RedisQueryCache, get_query_cache
+from app.repository.hotel import hotel_repository
+from app.schema import SortModel, SortOrder
+from app.repository.search import PostgresSearchBackend
 
 
 def test_create_hotel(
@@ -93,3 +104,229 @@ def test_delete_hotel(client, get_test_db, auth_headers):
     # Ensure deleted
     response2 = client.get(f"/hotels/{hotel.id}")
     assert response2.status_code == 404
+
+
+def test_list_hotels_cursor(client, get_test_db):
+    for i in range(5):
+        get_test_db.add(Hotel(name=f"Cursor Hotel {i}", city_id=1, country_id=1))
+    get_test_db.commit()
+
+    first = client.get("/hotels/?limit=2").json()
+    assert first["next_cursor"]
+
+    seen = [h["id"] for h in first["data"]]
+    cursor = first["next_cursor"]
+    while cursor:
+        response = client.get(f"/hotels/?limit=2&after={cursor}")
+        assert response.status_code == 200
+        body = response.json()
+        seen += [h["id"] for h in body["data"]]
+        cursor = body["next_cursor"]
+
+    offset = client.get("/hotels/?limit=100").json()
+    assert seen == [h["id"] for h in offset["data"]]
+
+    response = client.get("/hotels/?limit=2&after=not-a-cursor")
+    assert response.status_code == 400
+    not_a_pair = base64.urlsafe_b64encode(b"[1]").decode()
+    response = client.get(f"/hotels/?limit=2&after={not_a_pair}")
+    assert response.status_code == 400
+
+    # Cursor pages are not numbered, their total is not counted
+    body = client.get(f"/hotels/?limit=2&after={first['next_cursor']}").json()
+    assert body["count_strategy"] == "skipped"
+
+
+def test_cursor_pages_keep_rows_sorted_by_a_null(get_test_db):
+    for category in ["Lodge", None, "Camp", None]:
+        get_test_db.add(
+            Hotel(name="Null Sorted", category=category, city_id=1, country_id=1)
+        )
+    get_test_db.commit()
+
+    for direction in SortOrder:
+        sort = SortModel(sort="category", direction=direction)
+        expected = [
+            h.id
+            for h in hotel_repository.get_all_paginated(
+                get_test_db, limit=100, sort=sort
+            )["data"]
+        ]
+        seen, after = [], None
+        while True:
+            page = hotel_repository.get_all_paginated(
+                get_test_db, limit=2, sort=sort, after=after
+            )
+            seen += [h.id for h in page["data"]]
+            if not (after := page["next_cursor"]):
+                break
+        assert seen == expected
+
+
+def test_list_hotels_count_strategy(client, get_test_db):
+    body = client.get("/hotels/?count=false").json()
+    assert body["count"] is None
+    assert body["count_strategy"] == "skipped"
+
+    first = client.get("/hotels/?is_active=true").json()
+    second = client.get("/hotels/?is_active=true").json()
+    assert second["count_strategy"] == "cached"
+    assert second["count"] == first["count"]
+
+    # Any committed write to the table invalidates the cached count
+    get_test_db.add(Hotel(name="Counted Hotel", city_id=1, country_id=1))
+    get_test_db.commit()
+
+    third = client.get("/hotels/?is_active=true").json()
+    assert third["count_strategy"] == "exact"
+    assert third["count"] == first["count"] + 1
+
+
+def test_forged_cache_entries_are_not_unpickled(client):
+    first = client.get("/hotels/?limit=5").json()
+
+    # Someone with access to Redis replaces the cached page
+    cache = get_query_cache()
+    forged = pickle.dumps({"forged": True})
+    for key in cache.entries:
+        if key.startswith(KEY_PREFIX):
+            cache.entries[key] = forged
+
+    response = client.get("/hotels/?limit=5")
+    assert response.status_code == 200
+    assert response.json()["data"] == first["data"]
+
+
+class _Redis:
+    """Just the commands RedisQueryCache sends, pipelined or not"""
+
+    def __init__(self):
+        self.data = {}
+        self.results = []
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def set(self, key, value, nx=False):
+        if not (nx and key in self.data):
+            self.data[key] = str(value).encode()
+        self.results.append(True)
+
+    def get(self, key):
+        self.results.append(self.data.get(key))
+
+    def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, 0)) + 1).encode()
+        self.results.append(int(self.data[key]))
+
+    def execute(self):
+        results, self.results = self.results, []
+        return results
+
+
+def test_evicted_cache_versions_never_go_back():
+    cache = RedisQueryCache(_Redis())
+    [first] = cache.versions(["hotels"])
+    cache.bump({"hotels"})
+    [bumped] = cache.versions(["hotels"])
+    assert bumped == first + 1
+
+    # Evicted, then bumped or read again: past every version it had
+    del cache.client.data[cache.version_key("hotels")]
+    cache.bump({"hotels"})
+    assert cache.versions(["hotels"])[0] > bumped
+    del cache.client.data[cache.version_key("hotels")]
+    assert cache.versions(["hotels"])[0] > bumped
+
+
+def test_async_reads_keep_cache_io_off_the_loop(client, get_test_db, monkeypatch):
+    cache = get_query_cache()
+    on_loop = []
+
+    def recording(method):
+        def call(*args, **kwargs):
+            try:
+                asyncio.get_running_loop()
+                on_loop.append(method.__name__)
+            except RuntimeError:
+                pass
+            return method(*args, **kwargs)
+
+        return call
+
+    # Redis calls block, the event loop must never make them
+    for name in ("get", "set", "versions"):
+        monkeypatch.setattr(cache, name, recording(getattr(cache, name)))
+
+    hotel = get_test_db.query(Hotel).first()
+    for url in ("/hotels/?limit=5", f"/hotels/{hotel.id}", "/tours/?limit=5"):
+        assert client.get(url).status_code == 200
+    assert not on_loop
+
+
+def test_search_hotels(client, get_test_db):
+    get_test_db.add_all(
+        [
+            Hotel(
+                name="Serena Beach Resort",
+                description="Ocean view rooms on the coast",
+                city_id=1,
+                country_id=1,
+            ),
+            Hotel(
+                name="Ocean Breeze Lodge",
+                description="Ocean views, ocean sounds",
+                city_id=1,
+                country_id=1,
+            ),
+        ]
+    )
+    get_test_db.commit()
+
+    body = client.get("/hotels/?q=seren").json()
+    assert [h["name"] for h in body["data"]] == ["Serena Beach Resort"]
+
+    body = client.get("/hotels/?q=ocean").json()
+    names = [h["name"] for h in body["data"]]
+    assert set(names) == {"Serena Beach Resort", "Ocean Breeze Lodge"}
+    assert names[0] == "Ocean Breeze Lodge"
+
+    # Updates are reflected in the index
+    hotel = get_test_db.query(Hotel).filter_by(name="Serena Beach Resort").first()
+    hotel.name = "Serena Safari Camp"
+    get_test_db.commit()
+    assert client.get("/hotels/?q=safari").json()["count"] == 1
+
+
+def test_postgres_search_on_some_fields_uses_the_index():
+    def sql(expression):
+        return str(expression.compile(dialect=postgresql.dialect()))
+
+    search = SearchModel("ocean", search_fields=["name"])
+    condition, _ = PostgresSearchBackend().match(Hotel, search)
+    # The indexed document of every search field, narrowed down to the name
+    assert sql(search_document(Hotel, Hotel.__search_fields__)) in sql(condition)
+    assert sql(search_document(Hotel, ["name"])) in sql(condition)
+
+
+def test_create_hotels_batch(client, get_test_db, auth_headers):
+    payload = [
+        {"name": f"Batch Hotel {i}", "city_id": 1, "country_id": 1}
+        for i in range(50)
+    ]
+
+    response = client.post("/hotels/batch", json=payload, headers=auth_headers)
+    assert response.status_code == 201
+    body = response.json()
+    assert body["count"] == 50
+
+    hotels = get_test_db.query(Hotel).filter(Hotel.id.in_(body["ids"])).all()
+    assert {h.id: h.name for h in hotels} == {
+        id: item["name"] for id, item in zip(body["ids"], payload)
+    }
@@ -1,4 +1,6 @@
-from app.models import Hotel, Destination
+from sqlalchemy import event, text
+
+from app.models import City, Hotel, Destination
 from app.models.activity import Activity
 from app.models.tour import Tour, TourDay
 from app.utils.utils import slugify
@@ -48,6 +50,77 @@ def test_create_tour(get_test_db, client, auth_headers):
     assert body["count"] > 0
 
 
+def test_tour_counts_follow_joined_tables(get_test_db, client):
+    destination = get_test_db.query(Destination).join(Tour).first()
+    tours = get_test_db.query(Tour).filter_by(destination_id=destination.id).count()
+    url = f"/tours/?city_id={destination.city_id}"
+
+    first = client.get(url).json()
+    assert client.get(url).json()["count_strategy"] == "cached"
+
+    # Moving the destination writes destinations only, which the filter joins
+    city = City(name="Elsewhere", country_id=destination.city.country_id)
+    get_test_db.add(city)
+    get_test_db.flush()
+    destination.city_id = city.id
+    get_test_db.commit()
+
+    assert client.get(url).json()["count"] == first["count"] - tours
+    assert client.get(f"/tours/?city_id={city.id}").json()["count"] == tours
+
+
+def test_create_tour_itinerary_round_trips(get_test_db, client, auth_headers):
+    destination = get_test_db.query(Destination).first()
+    activity_ids = [a.id for a in get_test_db.query(Activity).all()]
+    hotel = get_test_db.query(Hotel).first()
+    engine = get_test_db.get_bind()
+
+    def create(days):
+        payload = {
+            "title": f"{days} Day Tour",
+            "duration": f"{days} days",
+            "price": 100.0 * days,
+            "destination_id": destination.id,
+            "itinerary": [
+                {
+                    "day_number": n,
+                    "title": f"Day {n}",
+                    "hotel_id": hotel.id,
+                    "activity_ids": activity_ids,
+                }
+                for n in range(1, days + 1)
+            ],
+        }
+        statements = []
+
+        def count_statement(*args):
+            statements.append(args[2])
+
+        event.listen(engine, "before_cursor_execute", count_statement)
+        try:
+            response = client.post("/tours/", json=payload, headers=auth_headers)
+        finally:
+            event.remove(engine, "before_cursor_execute", count_statement)
+
+        assert response.status_code == 201
+        assert len(response.json()["itinerary"]) == days
+        return [s for s in statements if "users" not in s]
+
+    assert len(create(21)) == len(create(3))
+
+    payload = {
+        "title": "Broken Tour",
+        "duration": "1 day",
+        "price": 10.0,
+        "destination_id": destination.id,
+        "itinerary": [{"day_number": 1, "title": "Day", "activity_ids": [999999]}],
+    }
+    response = client.post("/tours/", json=payload, headers=auth_headers)
+    assert response.status_code == 422
+    assert "activity_ids" in response.json()["detail"]
+    assert get_test_db.query(Tour).filter_by(title="Broken Tour").first() is None
+
+
 def test_list_tours(client):
     response = client.get("/tours/?page=1&limit=10")
     assert response.status_code == 200
@@ -57,6 +130,28 @@ def test_list_tours(client):
     assert isinstance(body["data"], list)
 
 
+def test_list_tours_query_count(get_test_db, client, query_budget):
+    tour = get_test_db.query(Tour).first()
+    for i in range(5):
+        get_test_db.add(
+            Tour(
+                title=f"Eager Tour {i}",
+                duration="1 day",
+                price=10.0,
+                destination_id=tour.destination_id,
+                slug=slugify(f"Eager Tour {i}"),
+            )
+        )
+    get_test_db.commit()
+
+    response = client.get("/tours/?page=1&limit=100")
+
+    assert response.status_code == 200
+    assert len(response.json()["data"]) >= 6
+    # The ETag aggregate (which also yields the count) plus one joined SELECT
+    query_budget(response, 2)
+
+
 def test_get_tour(client, get_test_db):
     tour = get_test_db.query(Tour).first()
     response = client.get(f"/tours/{tour.slug}")
@@ -64,6 +159,73 @@ def test_get_tour(client, get_test_db):
     assert response.status_code in (200, 404)
 
 
+def test_get_tour_cached(client, get_test_db, auth_headers, query_budget):
+    tour = get_test_db.query(Tour).first()
+    first = client.get(f"/tours/{tour.slug}")
+    second = client.get(f"/tours/{tour.slug}")
+
+    assert second.json() == first.json()
+    # Only the graph stamp lookup; the body itself comes from the cache
+    query_budget(second, 1)
+
+    # Writes through the API and to related tables both invalidate it
+    response = client.put(
+        f"/tours/{tour.id}", json={"title": "Cached Tour"}, headers=auth_headers
+    )
+    assert response.status_code == 200
+    assert client.get(f"/tours/{tour.slug}").json()["title"] == "Cached Tour"
+
+    destination = get_test_db.get(Destination, tour.destination_id)
+    destination.name = "Renamed Destination"
+    get_test_db.commit()
+    body = client.get(f"/tours/{tour.slug}").json()
+    assert body["destination"]["name"] == "Renamed Destination"
+
+    # Writes that bypass the ORM are caught by the graph's max(updated_at)
+    get_test_db.execute(
+        text(
+            "UPDATE destinations SET name = 'Raw Destination', "
+            "updated_at = '2999-01-01 00:00:00' WHERE id = :id"
+        ),
+        {"id": tour.destination_id},
+    )
+    get_test_db.commit()
+    body = client.get(f"/tours/{tour.slug}").json()
+    assert body["destination"]["name"] == "Raw Destination"
+
+
+def test_get_tour_conditional(client, get_test_db, auth_headers):
+    tour = get_test_db.query(Tour).first()
+
+    etags = {}
+    for url in (f"/tours/{tour.slug}", "/tours/?page=1&limit=10"):
+        response = client.get(url)
+        etags[url] = response.headers["etag"]
+        assert "max-age" in response.headers["cache-control"]
+
+        cached = client.get(url, headers={"If-None-Match": etags[url]})
+        assert cached.status_code == 304
+        assert cached.content == b""
+        assert cached.headers["etag"] == etags[url]
+
+    response = client.put(
+        f"/tours/{tour.id}", json={"title": "Conditional Tour"}, headers=auth_headers
+    )
+    assert response.status_code == 200
+
+    for url, etag in etags.items():
+        response = client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["etag"] != etag
+
+    # Another page, page size or count setting is another representation
+    list_etag = client.get("/tours/?page=1&limit=10").headers["etag"]
+    for url in ("/tours/?page=2&limit=10", "/tours/?limit=5", "/tours/?count=false"):
+        response = client.get(url, headers={"If-None-Match": list_etag})
+        assert response.status_code == 200
+        assert response.headers["etag"] != list_etag
+
+
 def test_update_tour(get_test_db, client, auth_headers):
     tour = get_test_db.query(Tour).first()
 
@@ -74,6 +236,94 @@ def test_update_tour(get_test_db, client, auth_headers):
     assert response.json()["title"] == "Updated Tour Title"
 
 
+def test_update_tour_itinerary(get_test_db, client, auth_headers):
+    destination = get_test_db.query(Destination).first()
+    activities = get_test_db.query(Activity).all()
+    payload = {
+        "title": "Sync Tour",
+        "duration": "3 days",
+        "price": 300.0,
+        "destination_id": destination.id,
+        "itinerary": [
+            {"day_number": n, "title": f"Day {n}", "activity_ids": [activities[0].id]}
+            for n in (1, 2, 3)
+        ],
+    }
+    tour = client.post("/tours/", json=payload, headers=auth_headers).json()
+    day_ids = {d["day_number"]: d["id"] for d in tour["itinerary"]}
+
+    update = {
+        "itinerary": [
+            # matched by id, activities replaced
+            {
+                "id": day_ids[1],
+                "title": "Arrival",
+                "activity_ids": [a.id for a in activities],
+            },
+            # matched by day number, activities untouched
+            {"day_number": 2, "title": "Safari"},
+            # new day; day 3 is dropped
+            {"day_number": 4, "title": "Departure", "activity_ids": []},
+        ]
+    }
+    response = client.put(f"/tours/{tour['id']}", json=update, headers=auth_headers)
+    assert response.status_code == 200
+
+    itinerary = response.json()["itinerary"]
+    assert [(d["day_number"], d["title"]) for d in itinerary] == [
+        (1, "Arrival"),
+        (2, "Safari"),
+        (4, "Departure"),
+    ]
+    assert itinerary[0]["id"] == day_ids[1]
+    assert itinerary[0]["activity_ids"] == sorted(a.id for a in activities)
+    assert itinerary[1]["activity_ids"] == [activities[0].id]
+    assert itinerary[2]["activity_ids"] == []
+    day_3 = get_test_db.query(TourDay).filter_by(tour_id=tour["id"], day_number=3)
+    assert day_3.first() is None
+
+    response = client.put(
+        f"/tours/{tour['id']}",
+        json={"itinerary": [{"id": 999999, "title": "Missing"}]},
+        headers=auth_headers,
+    )
+    assert response.status_code == 404
+
+
+def test_new_day_reusing_a_kept_days_number(get_test_db, client, auth_headers):
+    destination = get_test_db.query(Destination).first()
+    activity = get_test_db.query(Activity).first()
+    payload = {
+        "title": "Renumbered Tour",
+        "duration": "2 days",
+        "price": 200.0,
+        "destination_id": destination.id,
+        "itinerary": [{"day_number": 1, "title": "Arrival"}],
+    }
+    tour = client.post("/tours/", json=payload, headers=auth_headers).json()
+    kept_id = tour["itinerary"][0]["id"]
+
+    # The kept day still has number 1: two "day 1"s
+    update = {
+        "itinerary": [
+            {"id": kept_id, "title": "Arrival"},
+            {"day_number": 1, "title": "Extra", "activity_ids": [activity.id]},
+        ]
+    }
+    response = client.put(f"/tours/{tour['id']}", json=update, headers=auth_headers)
+    assert response.status_code == 422
+    assert "day_number" in response.json()["detail"]
+
+    # Renumbered, the new day takes its number and keeps its own activities
+    update["itinerary"][0]["day_number"] = 2
+    response = client.put(f"/tours/{tour['id']}", json=update, headers=auth_headers)
+    assert response.status_code == 200
+    days = {d["title"]: d for d in response.json()["itinerary"]}
+    assert (days["Arrival"]["day_number"], days["Extra"]["day_number"]) == (2, 1)
+    assert days["Arrival"]["activity_ids"] == []
+    assert days["Extra"]["activity_ids"] == [activity.id]
+
+
 def test_delete_tour(get_test_db, client, auth_headers):
     tour = Tour(
         title="Delete Tour",
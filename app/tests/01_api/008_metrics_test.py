@@ -0,0 +1,115 @@
+import time
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.core.config import get_settings
+from app.core.metrics import (
+    Histogram,
+    Registry,
+    outbound_request_duration_seconds,
+    track_outbound,
+)
+from app.main import app
+from app.models.tour import Tour
+
+
+def test_metrics_endpoint(client, get_test_db):
+    assert client.get("/tours/?page=1&limit=10").status_code == 200
+    assert client.get("/tours/no-such-tour").status_code == 404
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+
+    body = response.text
+    assert 'http_requests_total{method="GET",route="/tours/",status="200"}' in body
+    # Path parameters are reported by template, not value
+    assert 'route="/tours/{slug}",status="404"' in body
+    assert "no-such-tour" not in body
+    assert 'http_request_duration_seconds_count{method="GET",route="/tours/"}' in body
+    assert 'db_pool_connections{pool="primary",state="size"}' in body
+    assert 'threadpool_threads{state="limit"} 40.0' in body
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    histogram = Histogram(
+        "outbound_test_seconds", "Test", ["service"], buckets=(1, 5), registry=registry
+    )
+    for value in (0.5, 1, 3, 10):
+        histogram.observe(value, service="gcs")
+
+    lines = set(registry.render().splitlines())
+    assert 'outbound_test_seconds_bucket{service="gcs",le="1.0"} 2' in lines
+    assert 'outbound_test_seconds_bucket{service="gcs",le="5.0"} 3' in lines
+    assert 'outbound_test_seconds_bucket{service="gcs",le="+Inf"} 4' in lines
+    assert 'outbound_test_seconds_sum{service="gcs"} 14.5' in lines
+    assert 'outbound_test_seconds_count{service="gcs"} 4' in lines
+
+
+def test_track_outbound_records_failures():
+    with pytest.raises(ConnectionError):
+        with track_outbound("sms"):
+            raise ConnectionError
+
+    sample = 'outbound_request_duration_seconds_count{service="sms",outcome="error"} 1'
+    assert sample in outbound_request_duration_seconds.samples()
+
+
+def test_failed_statement_keeps_its_error(get_test_db):
+    # The instrumented engine's error hook must not replace the DB error
+    with pytest.raises(OperationalError):
+        get_test_db.execute(text("SELECT * FROM missing_table"))
+    get_test_db.rollback()
+    assert get_test_db.execute(text("SELECT 1")).scalar() == 1
+
+
+def test_profile_request(client, get_test_db, get_user, auth_headers, monkeypatch):
+    tour = get_test_db.query(Tour).first()
+    url, payload = f"/tours/{tour.id}", {"title": "Profiled Tour"}
+    headers = {**auth_headers, "X-Profile": "1"}
+
+    # Not allowed to profile: the request is served as usual
+    response = client.put(url, json=payload, headers=headers)
+    assert response.json()["title"] == "Profiled Tour"
+
+    monkeypatch.setattr(get_settings(), "PROFILER_USER_IDS", [get_user.id])
+    response = client.put(url, json=payload, headers=headers)
+    assert response.status_code == 200
+    assert response.headers["x-profiled"] == "1"
+
+    report = response.text
+    assert report.startswith("PUT /tours/{tour_id} -> 200")
+    assert "SQL:" in report
+    # The sync route body, run in the threadpool, is sampled
+    assert "workers;" in report and "TourRepository.update" in report
+
+    response = client.put(url, json=payload, headers=auth_headers)
+    assert "x-profiled" not in response.headers
+
+
+def test_loop_monitor_reports_blocking_route(client, loop_stalls):
+    async def blocking_route():
+        time.sleep(0.3)
+        return {}
+
+    app.add_api_route("/blocking-route", blocking_route)
+    try:
+        assert client.get("/blocking-route").status_code == 200
+    finally:
+        app.router.routes.pop()
+
+    # Reported once the heartbeat gets to run again
+    deadline = time.monotonic() + 1
+    while not loop_stalls and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    stall = loop_stalls.pop()
+    assert stall.route == "GET /blocking-route"
+    assert stall.duration >= 0.25
+    assert "in blocking_route" in "".join(stall.stack)
+    assert 'event_loop_stalls_total{route="GET /blocking-route"}' in client.get(
+        "/metrics"
+    ).text
@@ -0,0 +1,95 @@
+import sqlite3
+
+import pytest
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from app import models
+from app.core.admission import AdmissionController, admission, route_class
+from app.core.database import get_db
+from app.core.metrics import TimedQueuePool
+
+
+def make_pool(capacity: int) -> TimedQueuePool:
+    return TimedQueuePool(
+        lambda: sqlite3.connect(":memory:", check_same_thread=False),
+        pool_size=capacity // 2,
+        max_overflow=capacity - capacity // 2,
+        timeout=0.1,
+    )
+
+
+def test_route_classes():
+    assert route_class("GET", "/tours/") == "public"
+    assert route_class("POST", "/bookings/") == "bookings"
+    assert route_class("PUT", "/bookings/1") == "admin"
+    assert route_class("POST", "/tours/") == "admin"
+    assert route_class("GET", "/metrics") is None
+    # Uploads spend their time receiving the body, not holding a connection
+    assert route_class("PUT", "/uploads/1/parts/0", "application/octet-stream") is None
+    assert route_class("POST", "/hotels/", "multipart/form-data; boundary=x") is None
+    assert route_class("POST", "/tours/", "application/json") == "admin"
+
+
+def test_shares_reserve_capacity_for_bookings():
+    pool = make_pool(10)
+    controller = AdmissionController(
+        10, {"public": 0.5, "bookings": 1.0}, lambda: [pool]
+    )
+    # Reads that hold no connection (served from the cache) are not shed
+    assert all(controller.admit("public") for _ in range(50))
+
+    connections = [pool.connect() for _ in range(5)]
+    assert not controller.admit("public")
+    # Public reads are shed, bookings still get the rest of the capacity
+    assert controller.admit("bookings")
+
+    connections += [pool.connect() for _ in range(5)]
+    assert not controller.admit("bookings")
+    # Waiting for a connection counts as holding one
+    pool.waiting += 1
+    assert controller.pressure() == 1.1
+    pool.waiting -= 1
+
+    for connection in connections[4:]:
+        connection.close()
+    assert controller.admit("public")
+    pool.dispose()
+
+
+def test_read_storm_is_shed_but_bookings_go_through(
+    client, get_test_db, monkeypatch
+):
+    # A storm of reads holding 70% of the connections
+    pool = make_pool(admission.capacity)
+    connections = [pool.connect() for _ in range(int(admission.capacity * 0.7))]
+    monkeypatch.setattr(admission, "pools", lambda: [pool])
+
+    response = client.get("/tours/")
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    assert response.json()["message"]
+
+    payload = {
+        "full_name": "Jane Doe",
+        "phone": "0712345678",
+        "email": "jane@example.com",
+        "tour_id": 1,
+        "number_of_people": 2,
+        "preferred_date": "2025-01-16T10:00:00",
+        "country_id": get_test_db.query(models.Country).first().id,
+    }
+    assert client.post("/bookings/", json=payload).status_code == 201
+
+    for connection in connections:
+        connection.close()
+    pool.dispose()
+
+
+def test_pool_timeout_is_a_503():
+    db = get_db()
+    next(db)
+    with pytest.raises(Exception) as exc_info:
+        db.throw(PoolTimeoutError())
+
+    assert exc_info.value.status_code == 503
+    assert exc_info.value.headers == {"Retry-After": "1"}
@@ -0,0 +1,220 @@
+import hashlib
+import io
+import os
+
+import anyio
+import pytest
+from fastapi import HTTPException, UploadFile
+
+from app.core.config import get_settings
+from app.models import Hotel, MediaBlob, MediaReference
+from app.repository.media import media_repository
+from app.utils.storage import (
+    CHUNK_SIZE,
+    GCSStorage,
+    LocalStorage,
+    MemoryStorage,
+    StoredFile,
+    get_storage,
+    save,
+    upload,
+)
+
+
+def test_storage_backend_from_settings(monkeypatch):
+    assert isinstance(get_storage(), MemoryStorage)
+
+    monkeypatch.setattr(get_settings(), "STORAGE_BACKEND", "gcs")
+    monkeypatch.setattr(get_settings(), "GCP_SERVICE_ACCOUNT_FILE", "missing.json")
+    get_storage.cache_clear()
+    try:
+        storage = get_storage()
+        # No client, and no service account file, until something is written
+        assert isinstance(storage, GCSStorage) and storage._client is None
+        assert storage.url("hotels/a.jpg", True) == (
+            f"https://storage.googleapis.com/{get_settings().GCP_PUBLIC_BUCKET}"
+            "/hotels/a.jpg"
+        )
+    finally:
+        get_storage.cache_clear()
+
+
+def test_hotel_images_uploaded_concurrently(client, auth_headers):
+    storage = get_storage()
+    big = os.urandom(CHUNK_SIZE * 2 + 1)
+    files = [
+        ("files", ("front.jpg", io.BytesIO(big), "image/jpeg")),
+        ("files", ("pool.jpg", io.BytesIO(b"pool"), "image/jpeg")),
+    ]
+
+    response = client.post(
+        "/hotels/",
+        data={"name": "Lakeside Lodge", "city_id": 1},
+        files=files,
+        headers=auth_headers,
+    )
+
+    assert response.status_code == 201
+    keys = [f"blobs/{hashlib.sha256(d).hexdigest()}.jpg" for d in (big, b"pool")]
+    assert response.json()["images"] == [f"memory://{key}" for key in keys]
+    assert storage.objects[keys[0]] == big
+    assert storage.objects[keys[1]] == b"pool"
+
+
+def test_identical_uploads_stored_once(client, auth_headers, get_test_db):
+    storage = get_storage()
+    photo = os.urandom(1024)
+    key = f"blobs/{hashlib.sha256(photo).hexdigest()}.jpg"
+
+    def create(name):
+        response = client.post(
+            "/hotels/",
+            data={"name": name, "city_id": 1},
+            # Same name as another hotel's photo, different content
+            files={"files": ("IMG_0001.JPG", io.BytesIO(photo), "image/jpeg")},
+            headers=auth_headers,
+        )
+        assert response.status_code == 201
+        return response.json()
+
+    first, second = create("Hilltop Inn"), create("Riverside Inn")
+    assert first["images"] == second["images"] == [f"memory://{key}"]
+    assert storage.objects[key] == photo
+
+    blob = get_test_db.query(MediaBlob).filter_by(key=key).one()
+    assert blob.size == len(photo)
+    owners = get_test_db.query(MediaReference.owner_id).filter_by(blob_id=blob.id)
+    assert sorted(id for id, in owners) == sorted([first["id"], second["id"]])
+
+    # Replacing the first hotel's images moves its reference
+    response = client.put(
+        f"/hotels/{first['id']}",
+        files={"files": ("other.jpg", io.BytesIO(b"other"), "image/jpeg")},
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+    owners = get_test_db.query(MediaReference).filter_by(owner_id=first["id"])
+    owners = owners.filter_by(owner_table=Hotel.__tablename__)
+    assert [ref.blob_id for ref in owners] != [blob.id]
+    assert owners.count() == 1
+
+
+def test_batch_created_rows_reference_their_media(client, auth_headers, get_test_db):
+    response = client.post(
+        "/tours/upload/file",
+        files={"file": ("batch.jpg", io.BytesIO(b"batch photo"), "image/jpeg")},
+        headers=auth_headers,
+    )
+    url = response.json()
+
+    hotel = {"name": "Batch Lodge", "city_id": 1, "country_id": 1, "images": [url]}
+    response = client.post("/hotels/batch", json=[hotel], headers=auth_headers)
+    assert response.status_code == 201
+
+    blob = get_test_db.query(MediaBlob).filter_by(key=url[len("memory://") :]).one()
+    owners = get_test_db.query(MediaReference.owner_id).filter_by(blob_id=blob.id)
+    assert [id for id, in owners] == response.json()["ids"]
+
+
+def test_recorded_blob_joins_the_route_transaction(get_test_db):
+    hotel = get_test_db.query(Hotel).first()
+    name, hotel.name = hotel.name, "Renamed"
+    stored = StoredFile("blobs/pending.jpg", "", "0" * 64, 1, "image/jpeg", True)
+    media_repository.record(get_test_db, stored)
+
+    # The route failed: neither its change nor the blob row was committed
+    get_test_db.rollback()
+    assert get_test_db.get(Hotel, hotel.id).name == name
+    assert not get_test_db.query(MediaBlob).filter_by(key=stored.key).count()
+
+
+def test_failed_upload_leaves_no_partial_file(tmp_path):
+    class BrokenFile(io.BytesIO):
+        """Hashes fine, then breaks part way through the transfer"""
+
+        passes = 0
+
+        def seek(self, *args):
+            self.passes += 1
+            return super().seek(*args)
+
+        def read(self, size=-1):
+            if self.passes > 1 and self.tell():
+                raise OSError("connection reset")
+            return super().read(size)
+
+    storage = LocalStorage(
+        str(tmp_path), "http://testserver/media", str(tmp_path / "private")
+    )
+    file = UploadFile(BrokenFile(os.urandom(CHUNK_SIZE * 2)), filename="big.jpg")
+
+    with pytest.raises(HTTPException):
+        anyio.run(upload, storage, file)
+    assert not list((tmp_path / "blobs").iterdir())
+
+
+def test_private_objects_kept_out_of_served_root(tmp_path):
+    storage = LocalStorage(
+        str(tmp_path / "media"), "http://testserver/media", str(tmp_path / "private")
+    )
+    anyio.run(save, storage, "uploads/1/0-abc", io.BytesIO(b"part"), None, False)
+
+    assert not (tmp_path / "media").exists()
+    with storage.reader("uploads/1/0-abc", False) as reader:
+        assert reader.read() == b"part"
+
+
+def test_image_derivatives_rendered_after_upload(client, auth_headers, get_test_db):
+    Image = pytest.importorskip("PIL.Image")
+    buffer = io.BytesIO()
+    Image.new("RGB", (800, 600), "green").save(buffer, "JPEG")
+    buffer.seek(0)
+
+    response = client.post(
+        "/hotels/",
+        data={"name": "Savannah Camp", "city_id": 1},
+        files={"files": ("safari.jpg", buffer, "image/jpeg")},
+        headers=auth_headers,
+    )
+    assert response.status_code == 201
+    # Not rendered yet: nothing is advertised
+    assert response.json()["responsive_images"] == [None]
+
+    # Rendered by the background task, once the response was sent
+    key = f"blobs/{hashlib.sha256(buffer.getvalue()).hexdigest()}.jpg"
+    objects = get_storage().objects
+    for name in ("320w.webp", "800w.jpg", "placeholder.webp"):
+        assert f"{key}@{name}" in objects
+    with Image.open(io.BytesIO(objects[f"{key}@320w.jpg"])) as small:
+        assert small.size == (320, 240)
+    # Never upscaled: the widest derivative is the original's width
+    assert f"{key}@1024w.jpg" not in objects
+    blob = get_test_db.query(MediaBlob).filter_by(key=key).one()
+    assert (blob.variants_ready, blob.variant_widths) == (True, [320, 640, 800])
+
+    response = client.get(f"/hotels/{response.json()['id']}")
+    image = response.json()["responsive_images"][0]
+    assert image["placeholder"] == f"memory://{key}@placeholder.webp"
+    webp = image["sources"][0]
+    assert webp["type"] == "image/webp"
+    assert webp["srcset"].startswith(f"memory://{key}@320w.webp 320w, ")
+    assert webp["srcset"].endswith(f"memory://{key}@800w.webp 800w")
+
+
+def test_failed_derivatives_not_advertised(client, auth_headers, get_test_db):
+    pytest.importorskip("PIL.Image")
+    data = b"not really a jpeg" + os.urandom(16)
+    response = client.post(
+        "/hotels/",
+        data={"name": "Dune Lodge", "city_id": 1},
+        files={"files": ("dune.jpg", io.BytesIO(data), "image/jpeg")},
+        headers=auth_headers,
+    )
+    assert response.status_code == 201
+
+    response = client.get(f"/hotels/{response.json()['id']}")
+    assert response.json()["responsive_images"] == [None]
+    # Left to be rendered again
+    key = f"blobs/{hashlib.sha256(data).hexdigest()}.jpg"
+    missing = media_repository.missing_variants(get_test_db)
+    assert key in [blob.key for blob in missing]
@@ -0,0 +1,110 @@
+import hashlib
+import os
+
+import pytest
+
+from app.core.config import get_settings
+from app.utils.storage import get_storage
+
+
+def sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(get_settings(), "UPLOAD_CHUNK_SIZE", 1024)
+
+
+def start(client, auth_headers, data: bytes, **fields):
+    body = {"filename": "IMG_0042.JPG", "size": len(data), "sha256": sha256(data)}
+    response = client.post("/uploads/", json={**body, **fields}, headers=auth_headers)
+    assert response.status_code == 201
+    return response.json()
+
+
+def put_part(client, auth_headers, upload, index, data, checksum=None):
+    return client.put(
+        f"/uploads/{upload['id']}/parts/{index}",
+        content=data,
+        headers={
+            **auth_headers,
+            "Content-Type": "application/octet-stream",
+            "X-Chunk-SHA256": checksum or sha256(data),
+        },
+    )
+
+
+def test_chunked_upload_resumes(client, auth_headers, small_chunks):
+    data = os.urandom(2500)
+    parts = [data[:1024], data[1024:2048], data[2048:]]
+    upload = start(client, auth_headers, data, content_type="image/jpeg")
+    assert (upload["parts"], upload["received"], upload["url"]) == (3, 0, None)
+
+    assert put_part(client, auth_headers, upload, 0, parts[0]).json()["received"] == 1
+    # Corrupted on the way
+    response = put_part(client, auth_headers, upload, 1, parts[1], sha256(b"x"))
+    assert response.status_code == 422
+    # Out of order
+    response = put_part(client, auth_headers, upload, 2, parts[2])
+    assert response.status_code == 409
+    assert response.json()["detail"]["received"] == 1
+
+    # The connection dropped: ask where to resume, and resend the last part
+    resumed = client.get(f"/uploads/{upload['id']}", headers=auth_headers).json()
+    assert resumed["received"] == 1
+    assert put_part(client, auth_headers, upload, 0, parts[0]).status_code == 200
+    for index in (1, 2):
+        response = put_part(client, auth_headers, upload, index, parts[index])
+        assert response.json()["received"] == index + 1
+
+    response = client.post(f"/uploads/{upload['id']}/complete", headers=auth_headers)
+    assert response.status_code == 200
+    key = f"blobs/{sha256(data)}.jpg"
+    assert response.json()["url"] == f"memory://{key}"
+    objects = get_storage().objects
+    assert objects[key] == data
+    assert not [k for k in objects if k.startswith(f"uploads/{upload['id']}/")]
+
+    # Attached like any other image
+    response = client.post(
+        "/hotels/",
+        data={"name": "Crater View", "city_id": 1, "upload_ids": str(upload["id"])},
+        headers=auth_headers,
+    )
+    assert response.status_code == 201
+    assert response.json()["images"] == [f"memory://{key}"]
+
+    response = client.post(
+        "/hotels/",
+        data={"name": "Crater View", "city_id": 1, "upload_ids": "1,abc"},
+        headers=auth_headers,
+    )
+    assert response.status_code == 422
+
+    # Content already stored is not sent again
+    again = start(client, auth_headers, data)
+    assert again["received"] == again["parts"]
+    assert again["url"] == f"memory://{key}"
+    # A client that sends it anyway is told there is nothing left to do
+    response = put_part(client, auth_headers, again, 0, parts[0])
+    assert response.status_code == 200
+    assert response.json()["url"] == f"memory://{key}"
+
+
+def test_chunked_upload_checks_whole_file(client, auth_headers, small_chunks):
+    data = os.urandom(1500)
+    upload = start(client, auth_headers, data)
+    response = client.post(f"/uploads/{upload['id']}/complete", headers=auth_headers)
+    assert response.status_code == 409
+
+    # Parts that match their own checksums, but not the announced file
+    other = os.urandom(1500)
+    put_part(client, auth_headers, upload, 0, other[:1024])
+    put_part(client, auth_headers, upload, 1, other[1024:])
+    response = client.post(f"/uploads/{upload['id']}/complete", headers=auth_headers)
+    assert response.status_code == 422
+
+    resumed = client.get(f"/uploads/{upload['id']}", headers=auth_headers).json()
+    assert resumed["received"] == 0
+    assert f"blobs/{sha256(data)}.jpg" not in get_storage().objects
@@ -5,18 +5,27 @@ if get_settings().ENVIRONMENT == Environment.local:
     get_settings().REDIS_HOST = "localhost"
 
 get_settings().ENVIRONMENT = Environment.test
+# query_budget reads statement counts from the Server-Timing header
+get_settings().SERVER_TIMING_ENABLED = True
 
 
 # content of conftest.py
-from typing import Dict
+from typing import Dict, Optional
 import pytest
+from fastapi import Request
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
+from app.core.loop_monitor import loop_monitor
 from app.core.security import hash_password
 from app.models import User, City, Country
-from app.routes.deps import get_db
+from app.routes.deps import get_async_db, get_db
+from app.core.database import get_session_factory
 from app.main import app
-from app.tests.db_session import TestingSessionLocal, engine
+from app.tests.db_session import (
+    TestingAsyncSessionLocal,
+    TestingSessionLocal,
+    engine,
+)
 from sqlalchemy.exc import SQLAlchemyError
 from psycopg2 import errors as psycopg2_errors
 
@@ -27,8 +36,9 @@ setup()
 BaseDBModel.metadata.create_all(bind=engine)
 
 
-def get_db_override():
+def get_db_override(request: Request):
     db = TestingSessionLocal()
+    request.state.db = db
     try:
         yield db
     except (SQLAlchemyError, psycopg2_errors.DatabaseError):
@@ -38,7 +48,18 @@ def get_db_override():
         db.close()
 
 
+async def get_async_db_override(request: Request):
+    db = TestingAsyncSessionLocal()
+    request.state.async_db = db
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
 app.dependency_overrides[get_db] = get_db_override
+app.dependency_overrides[get_async_db] = get_async_db_override
+app.dependency_overrides[get_session_factory] = lambda: TestingSessionLocal
 
 
 @pytest.fixture(scope="module")
@@ -47,6 +68,45 @@ def client():
         yield c
 
 
+@pytest.fixture(autouse=True)
+def loop_stalls():
+    """
+    Fail any test during which a route blocked the event loop, or a sync
+    route starved it by holding the GIL
+    """
+    loop_monitor.stalls.clear()
+    yield loop_monitor.stalls
+    blocking = [
+        stall
+        for stall in loop_monitor.stalls
+        if stall.blocking or stall.cause == "gil"
+    ]
+    assert not blocking, "\n".join(map(str, blocking))
+
+
+@pytest.fixture(scope="session")
+def query_budget():
+    """
+    Check a response against a statement budget, read from the Server-Timing
+    header: at most ``max_queries`` statements and, unless ``max_repeats``
+    is None, no statement shape run more than ``max_repeats`` times.
+    """
+
+    def check(response, max_queries: int, max_repeats: Optional[int] = 1):
+        timings = {}
+        for metric in response.headers["server-timing"].split(","):
+            name, *params = [p.strip() for p in metric.split(";")]
+            timings[name] = dict(p.split("=", 1) for p in params)
+
+        count = int(timings["db"]["desc"].strip('"').split()[0])
+        repeats = int(timings["db-repeats"]["desc"].strip('"'))
+        assert count <= max_queries, f"{count} statements, budget {max_queries}"
+        if max_repeats is not None:
+            assert repeats <= max_repeats, f"a statement ran {repeats}x"
+
+    return check
+
+
 @pytest.fixture(scope="module")
 def settings():
     yield get_settings()
@@ -0,0 +1,197 @@
+"""
+Responsive image derivatives.
+
+After an image is uploaded, a background task reads it back from storage
+and renders WebP and JPEG copies at each of ``IMAGE_VARIANT_WIDTHS``, or
+the image's own width where it is narrower (never upscaled), plus a tiny
+WebP placeholder, in a process pool so neither the
+request nor the event loop waits on Pillow. The derivatives are stored
+next to the original under predictable keys, see ``variant_key``, which
+is how the schemas build their ``srcset`` from the widths recorded on the
+blob. They are only advertised for blobs marked ``variants_ready`` once
+every derivative is stored, see ``MediaRepository.generate_variants``.
+
+Pillow is optional: without it uploads keep working and no derivatives
+are rendered or advertised.
+"""
+import asyncio
+import io
+import logging
+import multiprocessing
+import os
+import threading
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.core.config import get_settings
+from app.utils.storage import StorageBackend, get_storage, read, save
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - Pillow is optional
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp"}
+FORMATS = {"webp": ("WEBP", "image/webp"), "jpg": ("JPEG", "image/jpeg")}
+PLACEHOLDER = "placeholder.webp"
+
+
+def variant_key(key: str, name: str) -> str:
+    """``blobs/<sha>.jpg`` -> ``blobs/<sha>.jpg@640w.webp``"""
+    return f"{key}@{name}"
+
+
+def variant_name(width: int, ext: str) -> str:
+    return f"{width}w.{ext}"
+
+
+def is_image(key: str) -> bool:
+    return os.path.splitext(key)[1].lower() in IMAGE_EXTENSIONS
+
+
+def image_keys(urls: Iterable[Optional[str]]) -> List[str]:
+    """Storage keys of the images among ``urls``"""
+    backend = get_storage()
+    keys = (backend.key_for(url) for url in filter(None, urls))
+    return [key for key in keys if key is not None and is_image(key)]
+
+
+def render_variants(
+    data: bytes, widths: Sequence[int], quality: int, placeholder_width: int
+) -> Tuple[List[int], Dict[str, bytes]]:
+    """
+    The widths the image ``data`` is rendered at and every derivative, by
+    name; runs in the pool
+    """
+
+    def encode(image, fmt: str, **options) -> bytes:
+        buffer = io.BytesIO()
+        image.save(buffer, fmt, **options)
+        return buffer.getvalue()
+
+    with Image.open(io.BytesIO(data)) as original:
+        # Phone photos are stored sideways with an EXIF orientation tag
+        image = ImageOps.exif_transpose(original).convert("RGB")
+
+    # Narrower images get one derivative at their own width instead
+    widths = sorted({min(width, image.width) for width in widths})
+    variants = {}
+    for width in widths:
+        resized = image
+        if image.width > width:
+            height = max(1, round(image.height * width / image.width))
+            resized = image.resize((width, height), Image.LANCZOS)
+        for ext, (fmt, _) in FORMATS.items():
+            variants[variant_name(width, ext)] = encode(resized, fmt, quality=quality)
+
+    placeholder = image.copy()
+    placeholder.thumbnail((placeholder_width, placeholder_width))
+    variants[PLACEHOLDER] = encode(placeholder, "WEBP", quality=50)
+    return widths, variants
+
+
+class ImageProcessor:
+    """
+    Renders derivatives in ``workers`` processes, started on first use.
+    At most ``max_pending`` images are held in memory at a time, see
+    ``slot``; the rest wait for one with nothing but their key.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._slots = weakref.WeakKeyDictionary()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        return Image is not None and self.workers > 0
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # Not fork: the parent has threads (threadpool, watchdogs)
+                self._pool = ProcessPoolExecutor(
+                    self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._pool
+
+    def slot(self) -> asyncio.Semaphore:
+        """Hold from reading an image until its derivatives are saved"""
+        # One per event loop: a semaphore is bound to the loop it waits on
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if loop not in self._slots:
+                self._slots[loop] = asyncio.Semaphore(self.max_pending)
+            return self._slots[loop]
+
+    async def render(self, data: bytes) -> Tuple[List[int], Dict[str, bytes]]:
+        settings = get_settings()
+        future = self._executor().submit(
+            render_variants,
+            data,
+            settings.IMAGE_VARIANT_WIDTHS,
+            settings.IMAGE_VARIANT_QUALITY,
+            settings.IMAGE_PLACEHOLDER_WIDTH,
+        )
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(cancel_futures=True)
+                self._pool = None
+
+
+image_processor = ImageProcessor(
+    get_settings().IMAGE_WORKERS, get_settings().IMAGE_MAX_PENDING
+)
+
+
+async def _generate(backend: StorageBackend, key: str) -> List[int]:
+    async with image_processor.slot():
+        widths, variants = await image_processor.render(await read(backend, key))
+        for name, data in variants.items():
+            content_type = FORMATS[name.rsplit(".", 1)[1]][1]
+            await save(
+                backend, variant_key(key, name), io.BytesIO(data), content_type
+            )
+    return widths
+
+
+async def generate_variants(keys: Iterable[str]) -> Dict[str, List[int]]:
+    """
+    Render the derivatives of the uploaded images at ``keys``; the widths
+    of those whose derivatives are all stored now, by key. A failed image
+    is logged and left to be rendered again, see
+    ``MediaRepository.missing_variants``.
+    """
+    if not image_processor.available:
+        return {}
+
+    backend = get_storage()
+    rendered = {}
+    for key in keys:
+        try:
+            rendered[key] = await _generate(backend, key)
+        except Exception as e:
+            logger.error(f"Failed to render derivatives of {key}: {e}", exc_info=True)
+    return rendered
+
+
+__all__ = [
+    "FORMATS",
+    "PLACEHOLDER",
+    "variant_key",
+    "variant_name",
+    "is_image",
+    "image_keys",
+    "render_variants",
+    "ImageProcessor",
+    "image_processor",
+    "generate_variants",
+]
@@ -6,6 +6,8 @@ from email.mime.text import MIMEText
 from email.utils import formatdate, formataddr
 from typing import List, Optional, Union
 
+from app.core.metrics import track_outbound
+
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
@@ -124,7 +126,7 @@ def send_email(
                     logger.warning(f"Could not attach file {filepath}: {e}")
 
         # Connect via Google Workspace SMTP relay
-        with smtplib.SMTP(smtp_server, port) as server:
+        with track_outbound("smtp"), smtplib.SMTP(smtp_server, port) as server:
             server.starttls()
             server.send_message(mimemsg)
 
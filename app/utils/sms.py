@@ -4,6 +4,7 @@ import logging
 import requests
 
 from app.core.config import get_setting
+from app.core.metrics import track_outbound
 
 
 def send_text_message(
@@ -33,7 +34,8 @@ def send_text_message(
         data["dlt_template_id"] = dlt_template_id
 
     try:
-        response = requests.post(url, headers=headers, data=json.dumps(data))
+        with track_outbound("sms"):
+            response = requests.post(url, headers=headers, data=json.dumps(data))
         response_data = response.json()
 
         if response.status_code == 200 and response_data.get("status") == "success":
@@ -0,0 +1,483 @@
+"""
+Media storage backends and the upload pipeline.
+
+An upload is streamed from the request's ``UploadFile`` to the backend in
+``CHUNK_SIZE`` pieces, without a copy on local disk, and the files of one
+request are uploaded concurrently, ``MEDIA_UPLOAD_CONCURRENCY`` at a time.
+Public objects get their ACL as part of the upload, not in a second call.
+
+Backends are file-like writers, their blocking calls run in worker
+threads under the upload's own limiter: an upload started from a sync
+route (itself holding a threadpool token) never waits for another token.
+
+Uploads are content-addressed: the file is hashed first (it is already
+spooled by the request) and stored as ``blobs/<sha256><ext>``, so an
+identical upload is not transferred again, two files with the same name
+do not overwrite each other and the URL can be cached as immutable.
+
+Chunked uploads stage their parts as private ``uploads/<id>/`` objects;
+``assemble`` streams them back, in order, into the blob, checking the
+whole file's hash on the way.
+
+``get_storage`` picks the process's backend from ``STORAGE_BACKEND`` on
+first use; the GCS SDK is only imported, and the service account read,
+when the first object is written to a bucket.
+"""
+import hashlib
+import io
+import logging
+import os
+import threading
+from contextlib import nullcontext
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import BinaryIO, Dict, List, Optional, Sequence, Tuple
+
+import anyio
+from fastapi import HTTPException, UploadFile
+
+from app.core.config import Environment, get_settings
+from app.core.metrics import track_outbound
+
+logger = logging.getLogger(__name__)
+
+# A multiple of 256 KiB, as GCS resumable uploads require
+CHUNK_SIZE = 1024 * 1024
+
+BLOB_PREFIX = "blobs"
+UPLOAD_PREFIX = "uploads"
+# Blob keys name their content, so a URL never changes what it serves
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+@dataclass
+class StoredFile:
+    key: str
+    url: str
+    sha256: str
+    size: int
+    content_type: Optional[str]
+    # False when the same content was already stored
+    transferred: bool
+
+
+def content_key(sha256: str, filename: Optional[str]) -> str:
+    extension = os.path.splitext(filename or "")[1].lower()
+    return f"{BLOB_PREFIX}/{sha256}{extension}"
+
+
+def is_blob(key: str) -> bool:
+    return key.startswith(f"{BLOB_PREFIX}/")
+
+
+class ChecksumMismatch(Exception):
+    pass
+
+
+class StorageBackend:
+    # Label for outbound_request_duration_seconds, None for local backends
+    outbound: Optional[str] = None
+
+    def writer(self, key: str, content_type: Optional[str], public: bool) -> BinaryIO:
+        """A writable file for ``key``; the object exists once it is closed"""
+        raise NotImplementedError
+
+    def discard(self, key: str, writer: BinaryIO):
+        """Drop a write that failed part way, without closing it into an object"""
+
+    def reader(self, key: str, public: bool = True) -> BinaryIO:
+        """A readable file for the object ``key``"""
+        raise NotImplementedError
+
+    def exists(self, key: str, public: bool) -> bool:
+        raise NotImplementedError
+
+    def delete(self, key: str, public: bool):
+        raise NotImplementedError
+
+    def url(self, key: str, public: bool) -> str:
+        raise NotImplementedError
+
+    def key_for(self, url: str) -> Optional[str]:
+        """The key of a public object from its URL, None if not stored here"""
+        prefix = self.url("", True)
+        return url[len(prefix) :] if url.startswith(prefix) else None
+
+
+class LocalStorage(StorageBackend):
+    """
+    Public files under ``root``, served by the app at ``base_url``, and
+    private ones under ``private_root``, which must not be served.
+    """
+
+    def __init__(self, root: str, base_url: str, private_root: str):
+        self.root = root
+        self.base_url = base_url.rstrip("/")
+        self.private_root = private_root
+
+    def _path(self, key: str, public: bool) -> str:
+        return os.path.join(self.root if public else self.private_root, *key.split("/"))
+
+    def writer(self, key: str, content_type: Optional[str], public: bool) -> BinaryIO:
+        path = self._path(key, public)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return open(path, "wb")
+
+    def discard(self, key: str, writer: BinaryIO):
+        writer.close()
+        os.remove(writer.name)
+
+    def reader(self, key: str, public: bool = True) -> BinaryIO:
+        return open(self._path(key, public), "rb")
+
+    def exists(self, key: str, public: bool) -> bool:
+        return os.path.exists(self._path(key, public))
+
+    def delete(self, key: str, public: bool):
+        if os.path.exists(path := self._path(key, public)):
+            os.remove(path)
+
+    def url(self, key: str, public: bool) -> str:
+        return f"{self.base_url}/{key}"
+
+
+class _MemoryWriter(io.BytesIO):
+    def __init__(self, objects: Dict[str, bytes], key: str):
+        super().__init__()
+        self._objects = objects
+        self._key = key
+
+    def close(self):
+        if not self.closed:
+            self._objects[self._key] = self.getvalue()
+        super().close()
+
+    def discard(self):
+        # Closed without storing, also when garbage-collected later
+        super().close()
+
+
+class MemoryStorage(StorageBackend):
+    """Objects kept in ``objects``, for tests"""
+
+    def __init__(self):
+        self.objects: Dict[str, bytes] = {}
+
+    def writer(self, key: str, content_type: Optional[str], public: bool) -> BinaryIO:
+        return _MemoryWriter(self.objects, key)
+
+    def discard(self, key: str, writer: BinaryIO):
+        writer.discard()
+
+    def reader(self, key: str, public: bool = True) -> BinaryIO:
+        return io.BytesIO(self.objects[key])
+
+    def exists(self, key: str, public: bool) -> bool:
+        return key in self.objects
+
+    def delete(self, key: str, public: bool):
+        self.objects.pop(key, None)
+
+    def url(self, key: str, public: bool) -> str:
+        return f"memory://{key}"
+
+
+class GCSStorage(StorageBackend):
+    """
+    Public and private Cloud Storage buckets. Writes are resumable uploads,
+    sent ``CHUNK_SIZE`` at a time as the request body is read.
+    """
+
+    outbound = "gcs"
+
+    def __init__(
+        self, service_account_file: str, public_bucket: str, private_bucket: str
+    ):
+        self.service_account_file = service_account_file
+        self.public_bucket = public_bucket
+        self.private_bucket = private_bucket
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                from google.cloud import storage
+
+                self._client = storage.Client.from_service_account_json(
+                    self.service_account_file
+                )
+            return self._client
+
+    def _bucket(self, public: bool) -> str:
+        return self.public_bucket if public else self.private_bucket
+
+    def writer(self, key: str, content_type: Optional[str], public: bool) -> BinaryIO:
+        blob = self.client.bucket(self._bucket(public)).blob(key)
+        if is_blob(key):
+            blob.cache_control = IMMUTABLE_CACHE_CONTROL
+        return blob.open(
+            "wb",
+            chunk_size=CHUNK_SIZE,
+            ignore_flush=True,
+            content_type=content_type,
+            predefined_acl="publicRead" if public else None,
+        )
+
+    def reader(self, key: str, public: bool = True) -> BinaryIO:
+        blob = self.client.bucket(self._bucket(public)).blob(key)
+        return blob.open("rb", chunk_size=CHUNK_SIZE)
+
+    def exists(self, key: str, public: bool) -> bool:
+        return self.client.bucket(self._bucket(public)).blob(key).exists()
+
+    def delete(self, key: str, public: bool):
+        from google.api_core.exceptions import NotFound
+
+        try:
+            self.client.bucket(self._bucket(public)).blob(key).delete()
+        except NotFound:
+            pass
+
+    def url(self, key: str, public: bool) -> str:
+        return f"https://storage.googleapis.com/{self._bucket(public)}/{key}"
+
+
+def media_storage() -> LocalStorage:
+    """The media/ folder, mounted by the app at /media"""
+    settings = get_settings()
+    return LocalStorage(
+        os.path.join(os.getcwd(), settings.MEDIA_BASE),
+        f"{settings.BASE_API_URL.strip('/')}/media",
+        os.path.join(os.getcwd(), settings.MEDIA_PRIVATE_BASE),
+    )
+
+
+@lru_cache()
+def get_storage() -> StorageBackend:
+    settings = get_settings()
+    name = settings.STORAGE_BACKEND
+    if name is None:
+        if settings.ENVIRONMENT == Environment.test:
+            name = "memory"
+        elif settings.ENVIRONMENT == Environment.local:
+            name = "local"
+        else:
+            name = "gcs"
+
+    if name == "gcs":
+        return GCSStorage(
+            os.path.join(os.getcwd(), settings.GCP_SERVICE_ACCOUNT_FILE),
+            settings.GCP_PUBLIC_BUCKET,
+            settings.GCP_PRIVATE_BUCKET,
+        )
+    if name == "memory":
+        return MemoryStorage()
+    return media_storage()
+
+
+def _outbound(backend: StorageBackend):
+    return track_outbound(backend.outbound) if backend.outbound else nullcontext()
+
+
+async def _stream(
+    backend: StorageBackend,
+    source: BinaryIO,
+    key: str,
+    content_type: Optional[str],
+    public: bool,
+    limiter: anyio.CapacityLimiter,
+):
+    def run(fn, *args):
+        return anyio.to_thread.run_sync(fn, *args, limiter=limiter)
+
+    await run(source.seek, 0)
+    writer = await run(backend.writer, key, content_type, public)
+    try:
+        while chunk := await run(source.read, CHUNK_SIZE):
+            await run(writer.write, chunk)
+    except BaseException:
+        # Also when cancelled because another file of the request failed
+        with anyio.CancelScope(shield=True):
+            await run(backend.discard, key, writer)
+        raise
+    await run(writer.close)
+
+
+async def save(
+    backend: StorageBackend,
+    key: str,
+    source: BinaryIO,
+    content_type: Optional[str],
+    public: bool = True,
+    limiter: Optional[anyio.CapacityLimiter] = None,
+):
+    """Stream the file ``source`` to ``key``"""
+    limiter = limiter or anyio.CapacityLimiter(1)
+    with _outbound(backend):
+        await _stream(backend, source, key, content_type, public, limiter)
+
+
+async def read(backend: StorageBackend, key: str) -> bytes:
+    """The whole public object ``key``"""
+
+    def read_all() -> bytes:
+        with backend.reader(key) as reader:
+            return reader.read()
+
+    with _outbound(backend):
+        return await anyio.to_thread.run_sync(read_all)
+
+
+async def exists(
+    backend: StorageBackend,
+    key: str,
+    public: bool = True,
+    limiter: Optional[anyio.CapacityLimiter] = None,
+) -> bool:
+    with _outbound(backend):
+        return await anyio.to_thread.run_sync(
+            backend.exists, key, public, limiter=limiter
+        )
+
+
+async def delete(backend: StorageBackend, key: str, public: bool = True):
+    with _outbound(backend):
+        await anyio.to_thread.run_sync(backend.delete, key, public)
+
+
+def _digest(source: BinaryIO) -> Tuple[str, int]:
+    source.seek(0)
+    sha256, size = hashlib.sha256(), 0
+    while chunk := source.read(CHUNK_SIZE):
+        sha256.update(chunk)
+        size += len(chunk)
+    return sha256.hexdigest(), size
+
+
+async def upload(
+    backend: StorageBackend,
+    file: Optional[UploadFile],
+    is_public: bool = True,
+    limiter: Optional[anyio.CapacityLimiter] = None,
+) -> Optional[StoredFile]:
+    """Store ``file`` under its content hash, unless it is already there"""
+    if not file:
+        return None
+
+    limiter = limiter or anyio.CapacityLimiter(1)
+    try:
+        sha256, size = await anyio.to_thread.run_sync(
+            _digest, file.file, limiter=limiter
+        )
+        key = content_key(sha256, file.filename)
+        transferred = not await exists(backend, key, is_public, limiter)
+        if transferred:
+            await save(backend, key, file.file, file.content_type, is_public, limiter)
+    except Exception as e:
+        logger.error(f"Error uploading file {file.filename}: {e}", exc_info=True)
+        raise HTTPException(
+            500, detail={"message": "Internal server error uploading file"}
+        )
+
+    url = backend.url(key, is_public)
+    return StoredFile(key, url, sha256, size, file.content_type, transferred)
+
+
+async def upload_many(
+    backend: StorageBackend,
+    files: Sequence[UploadFile],
+    is_public: bool = True,
+) -> List[StoredFile]:
+    """Upload ``files`` concurrently; results are in the same order"""
+    concurrency = get_settings().MEDIA_UPLOAD_CONCURRENCY
+    limiter = anyio.CapacityLimiter(concurrency)
+    semaphore = anyio.Semaphore(concurrency)
+    stored: List[Optional[StoredFile]] = [None] * len(files)
+
+    async def upload_one(i: int, file: UploadFile):
+        async with semaphore:
+            stored[i] = await upload(backend, file, is_public, limiter)
+
+    async with anyio.create_task_group() as tg:
+        for i, file in enumerate(files):
+            tg.start_soon(upload_one, i, file)
+    return stored
+
+
+class _Parts:
+    """Private objects read back to back as one file, checked against ``sha256``"""
+
+    def __init__(self, backend: StorageBackend, keys: Sequence[str], sha256: str):
+        self._backend = backend
+        self._keys = list(keys)
+        self._sha256 = sha256
+        self._digest = hashlib.sha256()
+        self._reader: Optional[BinaryIO] = None
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        # Only rewound by _stream, before the first read
+        return 0
+
+    def read(self, size: int = -1) -> bytes:
+        while True:
+            if self._reader is None:
+                if not self._keys:
+                    # Raised before the writer is closed, so nothing is stored
+                    if self._digest.hexdigest() != self._sha256:
+                        raise ChecksumMismatch(self._sha256)
+                    return b""
+                self._reader = self._backend.reader(self._keys.pop(0), False)
+            if chunk := self._reader.read(size):
+                self._digest.update(chunk)
+                return chunk
+            self._reader.close()
+            self._reader = None
+
+
+async def assemble(
+    backend: StorageBackend,
+    part_keys: Sequence[str],
+    sha256: str,
+    size: int,
+    filename: str,
+    content_type: Optional[str],
+    is_public: bool = True,
+) -> StoredFile:
+    """
+    Store the staged parts of a chunked upload as one blob. Raises
+    ``ChecksumMismatch`` when they do not add up to ``sha256``.
+    """
+    key = content_key(sha256, filename)
+    transferred = not await exists(backend, key, is_public)
+    if transferred:
+        parts = _Parts(backend, part_keys, sha256)
+        await save(backend, key, parts, content_type, is_public)
+    url = backend.url(key, is_public)
+    return StoredFile(key, url, sha256, size, content_type, transferred)
+
+
+__all__ = [
+    "CHUNK_SIZE",
+    "BLOB_PREFIX",
+    "UPLOAD_PREFIX",
+    "IMMUTABLE_CACHE_CONTROL",
+    "StoredFile",
+    "content_key",
+    "is_blob",
+    "ChecksumMismatch",
+    "StorageBackend",
+    "LocalStorage",
+    "MemoryStorage",
+    "GCSStorage",
+    "media_storage",
+    "get_storage",
+    "save",
+    "read",
+    "exists",
+    "delete",
+    "upload",
+    "upload_many",
+    "assemble",
+]
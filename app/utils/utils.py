@@ -1,31 +1,16 @@
-import logging
 import math
 import os
 import random
 import re
-import shutil
 from datetime import datetime
 from random import randint
 from string import ascii_lowercase, digits
-from typing import Optional
 
-from fastapi import UploadFile, HTTPException
 from fastapi.templating import Jinja2Templates
-from google.cloud import storage
-
-from app.core.config import get_settings
 
 PHONE_REGEX = re.compile(r"^\+?\d{8,13}$")
 
 
-google_storage_client = storage.Client.from_service_account_json(
-    os.path.join(
-        os.getcwd(),
-        "service-account.json",
-    )
-)
-
-
 def random_string(len=10) -> str:
     s = ascii_lowercase + digits
     return "".join(
@@ -49,93 +34,6 @@ def sanitize_filename(filename: str) -> str:
     return os.path.basename(filename)
 
 
-def upload_image(
-    file: UploadFile | None,
-    path_prefix: str = "test",
-    use_gcp: bool = True,
-    is_public: bool = True,
-) -> Optional[str]:
-    settings = get_settings()
-
-    if not file:
-        return None
-
-    try:
-        # Prepare directories
-        media_root = os.path.join(os.getcwd(), settings.MEDIA_BASE)
-        os.makedirs(media_root, exist_ok=True)
-
-        # Clean filename
-        filename = sanitize_filename(file.filename)
-
-        # Use forward slashes for GCP
-        blob_path = f"{path_prefix.strip('/')}/{filename}"
-
-        # Local storage (always stored first)
-        local_file_path = os.path.join(media_root, filename)
-
-        # Save locally
-        with open(local_file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-
-        # Google Cloud Upload
-        if use_gcp and settings.ENVIRONMENT not in ("local", "test"):
-            bucket_name = (
-                settings.GCP_PUBLIC_BUCKET if is_public else settings.GCP_PRIVATE_BUCKET
-            )
-
-            bucket = google_storage_client.bucket(bucket_name)
-            blob = bucket.blob(blob_path)
-            blob.upload_from_filename(local_file_path)
-
-            # Make file public if required
-            if is_public:
-                blob.make_public()
-                url = blob.public_url.rstrip("/")
-            else:
-                url = f"https://storage.googleapis.com/{bucket_name}/{blob_path}"
-
-            # Remove local copy
-            if os.path.exists(local_file_path):
-                os.remove(local_file_path)
-
-            return url
-
-        # Local fallback URL
-        return f"{settings.BASE_API_URL.strip('/')}/media/{filename}"
-
-    except Exception as e:
-        logging.error(f"Error uploading file {file.filename}: {e}", exc_info=True)
-        raise HTTPException(
-            500, detail={"message": "Internal server error uploading file"}
-        )
-
-
-def get_image_url(
-    file: UploadFile | None,
-    path_prefix: str = "test",
-    use_gcp: bool = True,
-    is_public: bool = True,
-) -> Optional[str]:
-    settings = get_settings()
-
-    if not file:
-        return None
-
-    filename = sanitize_filename(file.filename)
-    if use_gcp and settings.ENVIRONMENT not in ("local", "test"):
-
-        blob_path = f"{path_prefix.strip('/')}/{filename}"
-
-        bucket_name = (
-            settings.GCP_PUBLIC_BUCKET if is_public else settings.GCP_PRIVATE_BUCKET
-        )
-
-        return f"https://storage.googleapis.com/{bucket_name}/{blob_path}"
-    else:
-        return f"{settings.BASE_API_URL.strip('/')}/media/{filename}"
-
-
 def normalize_phone_number(
     phone_number: str | None, country_code: str = "254"
 ) -> str | None: